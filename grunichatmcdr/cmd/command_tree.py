@@ -1,6 +1,19 @@
-from mcdreforged.api.all import *
+from mcdreforged.api.command import Integer, Literal, Number, Text
 from grunichatmcdr.state.plugin_state import plugin_state
+from grunichatmcdr.state.message_trace import message_trace
+from grunichatmcdr.state.player_index import player_index
+from grunichatmcdr.state.presence_roster import presence_roster
 import json
+import os
+import re
+import time
+
+# 会写文件或读取跨服数据的命令所需的MCDR权限等级（3为admin）
+ADMIN_PERMISSION = 3
+
+
+def _is_admin(src):
+    return src.has_permission(ADMIN_PERMISSION)
 
 
 def register_grunichat_command(server, ws_service, config):
@@ -27,6 +40,47 @@ def register_grunichat_command(server, ws_service, config):
     
     # !!grunichat test <message> - 测试发送消息
     test_branch = Literal('test').then(Text('message').runs(lambda src, ctx: test_send_message(src, ctx['message'])))
+    
+    # !!grunichat trace <totalId|last [N]|export> - 查看消息追踪
+    trace_branch = (
+        Literal('trace')
+        .runs(lambda src, ctx: show_trace_last(src, 5))
+        .then(
+            Literal('last')
+            .runs(lambda src, ctx: show_trace_last(src, 10))
+            .then(Integer('count').at_min(1).runs(lambda src, ctx: show_trace_last(src, ctx['count'])))
+        )
+        # 导出会写文件，需要管理员权限
+        .then(Literal('export').requires(_is_admin).runs(lambda src, ctx: export_trace(src, server)))
+        .then(Text('total_id').runs(lambda src, ctx: show_trace(src, ctx['total_id'])))
+    )
+
+    # !!grunichat profile <seconds> - 采样插件线程，结果写入插件数据目录，需要管理员权限
+    profile_branch = Literal('profile').requires(_is_admin).then(
+        Number('seconds').at_min(0.1).runs(lambda src, ctx: start_profile(src, server, ctx['seconds']))
+    )
+
+    # !!grunichat history [player] [since] - 查询历史记录，包含其它服务器的聊天，需要管理员权限
+    history_branch = (
+        Literal('history')
+        .requires(_is_admin)
+        .runs(lambda src, ctx: show_history(src, None, None))
+        .then(
+            Text('player')
+            .runs(lambda src, ctx: show_history(src, ctx['player'], None))
+            .then(Text('since').runs(lambda src, ctx: show_history(src, ctx['player'], ctx['since'])))
+        )
+    )
+
+    # !!grunichat history-more - 历史记录翻页；不放在history下，避免与名为more的玩家冲突
+    history_more_branch = Literal('history-more').requires(_is_admin).runs(lambda src, ctx: show_history_more(src))
+
+    # !!grunichat online [player] - 查看各服务器在线玩家
+    online_branch = (
+        Literal('online')
+        .runs(lambda src, ctx: show_online(src))
+        .then(Text('player').runs(lambda src, ctx: show_player_location(src, ctx['player'])))
+    )
 
     tree = (
         Literal('!!grunichat')
@@ -39,6 +93,11 @@ def register_grunichat_command(server, ws_service, config):
         .then(stats_branch)
         .then(reload_branch)
         .then(test_branch)
+        .then(trace_branch)
+        .then(profile_branch)
+        .then(history_branch)
+        .then(history_more_branch)
+        .then(online_branch)
     )
     server.register_command(tree)
 
@@ -55,6 +114,11 @@ def show_help(src):
         '§7!!grunichat connect <url> §f- 连接到指定WebSocket服务器',
         '§7!!grunichat reload §f- 重载插件配置',
         '§7!!grunichat test <message> §f- 测试发送消息',
+        '§7!!grunichat trace <totalId|last [N]|export> §f- 查看或导出消息追踪（导出需管理员）',
+        '§7!!grunichat profile <seconds> §f- 采样插件线程并输出火焰图数据（管理员）',
+        '§7!!grunichat history [player|*] [since] §f- 查询聊天历史（since如30m、2h、7d、2024-01-31，管理员）',
+        '§7!!grunichat history-more §f- 查看下一页历史记录（管理员）',
+        '§7!!grunichat online [player] §f- 查看各服务器在线玩家或某个玩家所在的服务器',
         '§a============================='
     ]
     for line in help_msg:
@@ -85,9 +149,103 @@ def show_stats(src):
             f'§7发送消息: §f{stats.get("messages_sent", 0)}条',
             f'§7失败消息: §f{stats.get("messages_failed", 0)}条',
             f'§7处理事件: §f{stats.get("events_processed", 0)}个',
-            '§a========================'
         ]
         
+        # 出站队列各优先级的排队与丢弃情况
+        for name, queue_stats in stats.get('outbound', {}).items():
+            stats_msg.append(
+                f'§7出站[{name}]: §f排队{queue_stats["queued"]} / '
+                f'入队{queue_stats["enqueued"]} / 丢弃{queue_stats["dropped"]}'
+            )
+        
+        # 各通道健康状态
+        for name, health in stats.get('channels', {}).items():
+            state = '§a已连接' if health['connected'] else '§c未连接'
+            stats_msg.append(
+                f'§7通道[{name}]: {state} §f排队{health["queued"]} / '
+                f'断线{health["disconnects"]}次 / 写失败{health["write_failures"]}'
+            )
+        
+        inbound = stats.get('inbound')
+        if inbound:
+            stats_msg.append(
+                f'§7入站过滤: §f超长帧{inbound["oversized_frame"]} / 超长字段{inbound["oversized_field"]} / '
+                f'忽略{inbound["ignored"]} / 格式错误{inbound["malformed"]} / '
+                f'聊天拆分{inbound["split"]} / 截断{inbound["truncated"]}'
+            )
+            render = inbound.get('render')
+            if render:
+                stats_msg.append(
+                    f'§7富文本缓存: §f命中{render["hits"]}/{render["hits"] + render["misses"]} / 条目{render["cached"]}'
+                )
+        
+        connector = stats.get('connector')
+        if connector:
+            stats_msg.append(
+                f'§7快速重连: §fDNS命中{connector["dns_hits"]}/{connector["dns_hits"] + connector["dns_misses"]} / '
+                f'TLS复用{connector["tls_resumed"]}/{connector["tls_handshakes"]} / '
+                f'备用就绪{connector["standby_ready"]} / 已提升{connector["standby_promoted"]}'
+            )
+        
+        clock = stats.get('clock')
+        if clock and clock['ready']:
+            stats_msg.append(
+                f'§7广播器时钟: §f偏差{clock["offset"]:+.1f}ms / 往返{clock["rtt"]:.1f}ms / '
+                f'抖动{clock["jitter"]:.1f}ms ({clock["accepted"]}样本)'
+            )
+        
+        # 滚动窗口速率与延迟（uplink/downlink为按时钟偏差校正后的单向延迟）
+        for key, (rate_1m, rate_5m, rate_15m) in stats.get('rates', {}).items():
+            stats_msg.append(f'§7速率[{key}]: §f{rate_1m:.2f} / {rate_5m:.2f} / {rate_15m:.2f} 条/秒 (1m/5m/15m)')
+        for name, latency in stats.get('latencies', {}).items():
+            if latency['count']:
+                stats_msg.append(
+                    f'§7延迟[{name}]: §fp50 {latency["p50"]:.1f}ms / p90 {latency["p90"]:.1f}ms / '
+                    f'p99 {latency["p99"]:.1f}ms / max {latency["max"]:.1f}ms ({latency["count"]}次)'
+                )
+        
+        commands = stats.get('commands')
+        if commands and commands['enabled']:
+            denied = commands['denied']
+            audit = stats.get('audit')
+            stats_msg.append(
+                f'§7命令授权: §f允许{commands["allowed"]} / 拒绝{sum(denied.values())} '
+                f'(未授权{denied.get("not_allowed", 0) + denied.get("no_policy", 0)} / '
+                f'并发{denied.get("concurrency", 0)} / 限速{denied.get("rate_limited", 0)})'
+                + (f' / 审计写入{audit["written"]}' if audit else '')
+            )
+        
+        throttle = stats.get('throttle')
+        if throttle:
+            stats_msg.append(
+                f'§7聊天限流: §f玩家{throttle["senders"]} / 合并{throttle["collapsed"]} / '
+                f'暂存{throttle["held"]} / 限流丢弃{throttle["throttled"]}'
+            )
+        
+        presence = stats.get('presence')
+        if presence:
+            stats_msg.append(
+                f'§7在线名单: §f服务器{presence["servers"]} / 玩家{presence["players"]} / '
+                f'增量{presence["applied"]} / 快照{presence["snapshots"]} / 缺口{presence["gaps"]} / '
+                f'请求快照{presence["resyncs_requested"]}'
+            )
+        
+        relay = stats.get('relay')
+        if relay:
+            stats_msg.append(
+                f'§7本地中继: §f成员{len(relay["members"])} / 上游{"§a已连接" if relay["upstream_connected"] else "§c未连接"}§f / '
+                f'本地投递{relay["local_delivered"]} / 上传{relay["upstream_sent"]} / '
+                f'下发{relay["upstream_received"]} / 回显去重{relay["echo_suppressed"]} / 上游丢弃{relay["upstream_dropped"]}'
+            )
+        
+        history = stats.get('history')
+        if history:
+            stats_msg.append(
+                f'§7历史记录: §f已写入{history["written"]} / 排队{history["queued"]} / '
+                f'丢弃{history["dropped"]} / 已清理{history["purged"]}'
+            )
+        stats_msg.append('§a========================')
+        
         for line in stats_msg:
             src.reply(line)
             
@@ -125,3 +283,197 @@ def test_send_message(src, message):
             
     except Exception as e:
         src.reply(f'§c[GRUniChat] 测试发送消息出错: {e}')
+
+
+_profiler = None
+
+
+def start_profile(src, server, seconds):
+    """在后台采样插件线程，完成后写出折叠栈与函数排行"""
+    global _profiler
+    config = plugin_state.get_config()
+    if _profiler is None:
+        # 采样器只在第一次使用时导入
+        from grunichatmcdr.diagnostics.sampling_profiler import SamplingProfiler
+        _profiler = SamplingProfiler(config.profile_rate if config else 100)
+    if _profiler.running:
+        src.reply('§e[GRUniChat] 已有采样正在进行')
+        return
+
+    def on_done(result):
+        try:
+            base = os.path.join(server.get_data_folder(), f'profile-{time.strftime("%Y%m%d-%H%M%S")}')
+            result.write_collapsed(base + '.collapsed')
+            result.write_summary(base + '.txt')
+            src.reply(f'§a[GRUniChat] 采样完成: {result.ticks}次 / {result.effective_rate:.0f}Hz / '
+                      f'开销{result.overhead * 100:.2f}%')
+            for name, self_count, total_count in result.top_functions(5):
+                src.reply(f'§7  {self_count:>5} / {total_count:>5}  §f{name}')
+            src.reply(f'§a[GRUniChat] 结果已写入: {base}.collapsed / .txt')
+        except Exception as e:
+            src.reply(f'§c[GRUniChat] 写出采样结果失败: {e}')
+
+    _profiler.start(seconds, on_done)
+    src.reply(f'§a[GRUniChat] 开始采样 {seconds} 秒...')
+
+
+# 每个命令来源的历史查询游标: key -> (player, since, last_id)
+_history_cursors = {}
+_SINCE_PATTERN = re.compile(r'^(\d+)([smhd])$')
+_SINCE_UNITS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def _parse_since(text):
+    """解析相对时间（30m、2h、7d）或日期（2024-01-31），无法解析时返回None"""
+    match = _SINCE_PATTERN.match(text)
+    if match:
+        return time.time() - int(match.group(1)) * _SINCE_UNITS[match.group(2)]
+    try:
+        return time.mktime(time.strptime(text, '%Y-%m-%d'))
+    except ValueError:
+        return None
+
+
+def _history_key(src):
+    return src.player if src.is_player else '#console'
+
+
+def _reply_history_page(src, player, since, before_id):
+    history_store = plugin_state.get_history_store()
+    if not history_store:
+        src.reply('§e[GRUniChat] 历史记录未启用（配置项 history_enabled）')
+        return
+    config = plugin_state.get_config()
+    page_size = config.history_page_size if config else 10
+    try:
+        records = history_store.query(player, since, before_id, page_size)
+    except Exception as e:
+        src.reply(f'§c[GRUniChat] 查询历史记录失败: {e}')
+        return
+    if not records:
+        _history_cursors.pop(_history_key(src), None)
+        src.reply('§e[GRUniChat] 没有更多历史记录')
+        return
+
+    # 查询结果按时间倒序，显示时翻转为正序
+    for record in reversed(records):
+        arrow = '→' if record.direction == 'out' else '←'
+        stamp = time.strftime('%m-%d %H:%M', time.localtime(record.ts))
+        sender = f'<{record.sender}> ' if record.sender else ''
+        src.reply(f'§7[{stamp}] {arrow} §b[{record.source}] §f{sender}{record.content}')
+    _history_cursors[_history_key(src)] = (player, since, records[-1].id)
+    if len(records) == page_size:
+        src.reply('§7使用 !!grunichat history-more 查看更早的记录')
+
+
+def _presence_enabled(src):
+    config = plugin_state.get_config()
+    if config and config.presence_enabled:
+        return True
+    src.reply('§e[GRUniChat] 在线名单同步未启用（presence_enabled）')
+    return False
+
+
+def show_online(src):
+    """显示本服与其它服务器的在线玩家，数据来自内存中的在线名单"""
+    if not _presence_enabled(src):
+        return
+    config = plugin_state.get_config()
+    local = player_index.names()
+    remote = presence_roster.servers()
+    total = len(local) + sum(len(players) for _, players, _ in remote)
+    lines = [
+        f'§a=== 在线玩家（{len(remote) + 1}个服务器，共{total}人）===',
+        f'§7[{config.plugin_id}] §8(本服) §f({len(local)}) {", ".join(local) or "-"}',
+    ]
+    for server, players, synced in remote:
+        lines.append(f'§7[{server}] §f({len(players)}) {", ".join(players) or "-"}' + ('' if synced else ' §e(同步中)'))
+    for line in lines:
+        src.reply(line)
+
+
+def show_player_location(src, player):
+    """显示玩家所在的服务器"""
+    if not _presence_enabled(src):
+        return
+    found = presence_roster.find(player)
+    servers = [server for server, _ in found]
+    name = player_index.get(player)
+    if name:
+        servers.insert(0, plugin_state.get_config().plugin_id)
+    if servers:
+        src.reply(f'§a[GRUniChat] {name or found[0][1]} 在线: §f{", ".join(servers)}')
+    else:
+        src.reply(f'§e[GRUniChat] {player} 不在任何已知服务器上')
+
+
+def show_history(src, player, since_text):
+    """显示历史记录第一页"""
+    since = None
+    if since_text:
+        since = _parse_since(since_text)
+        if since is None:
+            src.reply(f'§c[GRUniChat] 无法解析时间: {since_text}')
+            return
+    if player == '*':
+        player = None
+    _reply_history_page(src, player, since, None)
+
+
+def show_history_more(src):
+    """显示下一页历史记录"""
+    cursor = _history_cursors.get(_history_key(src))
+    if not cursor:
+        src.reply('§e[GRUniChat] 请先使用 !!grunichat history 查询')
+        return
+    player, since, last_id = cursor
+    _reply_history_page(src, player, since, last_id)
+
+
+def _format_trace(record):
+    """格式化一条追踪记录"""
+    latency = record.total_latency()
+    total = f'{latency:.2f}ms' if latency is not None else '-'
+    stages = ' '.join(f'{to_stage}+{ms:.2f}' for _, to_stage, ms in record.stage_latencies())
+    return [
+        f'§7[{record.kind}] §f{record.total_id or "未编码"} §7最后阶段: §f{record.last_stage} §7总耗时: §f{total}',
+        f'§8  {record.summary}',
+        f'§8  {stages}' if stages else '§8  (仅received)',
+    ]
+
+
+def show_trace(src, total_id):
+    """按totalId显示追踪记录"""
+    if not message_trace.enabled:
+        src.reply('§e[GRUniChat] 消息追踪未启用（配置项 trace_enabled）')
+        return
+    record = message_trace.find(total_id)
+    if not record:
+        src.reply(f'§c[GRUniChat] 未找到追踪记录: {total_id}')
+        return
+    for line in _format_trace(record):
+        src.reply(line)
+
+
+def show_trace_last(src, count):
+    """显示最近N条追踪记录"""
+    if not message_trace.enabled:
+        src.reply('§e[GRUniChat] 消息追踪未启用（配置项 trace_enabled）')
+        return
+    records = message_trace.last(count)
+    if not records:
+        src.reply('§e[GRUniChat] 暂无追踪记录')
+        return
+    for record in records:
+        for line in _format_trace(record):
+            src.reply(line)
+
+
+def export_trace(src, server):
+    """将追踪记录导出为JSON Lines文件"""
+    try:
+        path = os.path.join(server.get_data_folder(), f'trace-{time.strftime("%Y%m%d-%H%M%S")}.jsonl')
+        count = message_trace.export_jsonl(path)
+        src.reply(f'§a[GRUniChat] 已导出{count}条追踪记录: {path}')
+    except Exception as e:
+        src.reply(f'§c[GRUniChat] 导出追踪记录失败: {e}')
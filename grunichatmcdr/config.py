@@ -1,8 +1,73 @@
+from typing import Dict, List
+
 from mcdreforged.api.utils.serializer import Serializable
 
+
+class CommandPolicyConfig(Serializable):
+    prefixes: List[str] = []                # 允许的命令前缀（不含/，按单词边界匹配），"*" 表示允许全部
+    patterns: List[str] = []                # 允许的命令正则（对去掉/并转为小写的命令整体匹配）
+    max_concurrent: int = 0                 # 同时等待输出捕获的命令数上限，0表示不限制；依赖输出捕获，command_result_enabled为false时不生效
+    rate_limit: int = 0                     # 滑动窗口内最多执行的命令数，0表示不限制
+    rate_window: float = 60.0               # 命令限速的窗口长度（秒）
+
 class GRUniChatConfig(Serializable):
     ws_url: str = 'ws://127.0.0.1:8765/ws'  # WebSocket广播器地址
     plugin_id: str = 'minecraft'                     # 插件唯一标识（对应广播器中的from字段）
     forward_mc_to_ws: bool = True           # 是否转发MC消息到WebSocket
     forward_ws_to_mc: bool = True           # 是否转发WebSocket消息到MC
+    forward_game_events: bool = True        # 是否转发死亡、进度、/me、卡顿警告等游戏日志事件
+    outbound_queue_size: int = 1024         # 出站队列总容量（各优先级按比例分配）
+    outbound_shed_delay: float = 5.0        # 积压持续超过该秒数后开始丢弃低优先级消息
+    dual_channel: bool = False              # 是否启用双通道模式（控制通道 + 聊天批量通道）
+    bulk_ws_url: str = ''                   # 批量通道地址，留空则与ws_url相同
+    command_result_enabled: bool = False    # 是否捕获远程命令的输出并以command_result回复；控制台没有请求标识，窗口内的其它服务端输出也会计入
+    command_result_timeout: float = 3.0     # 命令输出捕获的最长时间（秒）
+    command_result_idle: float = 0.5        # 收到输出后静默超过该秒数即结束捕获
+    command_result_max_chars: int = 2000    # 命令输出的最大字符数，超出部分截断
+    command_result_end_pattern: str = ''    # 匹配到该正则的输出行时立即结束捕获，留空不启用
+    flow_control: bool = False              # 是否启用基于信用额度的流量控制
+    flow_window: int = 64                   # 本端声明的可接受未确认消息数
+    flow_ack_timeout: float = 10.0          # 未确认消息占用额度的最长时间（秒）
+    trace_enabled: bool = False             # 是否记录出站消息各阶段的时间戳
+    trace_capacity: int = 1024              # 追踪环形缓冲区容量
+    profile_rate: int = 100                 # !!grunichat profile 的采样频率（Hz）
+    history_enabled: bool = False           # 是否将双向聊天/事件持久化到SQLite
+    history_file: str = 'history.db'        # 历史数据库文件名（位于插件数据目录）
+    history_retention_days: float = 30      # 历史记录保留天数，0表示不清理
+    history_batch_size: int = 200           # 单次提交的最大记录数
+    history_flush_interval: float = 1.0     # 批量提交的最长等待时间（秒）
+    history_page_size: int = 10             # !!grunichat history 每页条数
+    stats_snapshot_interval: float = 60.0   # 速率统计快照写入插件数据目录的间隔（秒）
+    relay_mode: str = 'off'                 # 本地中继模式: off 直连 / client 接入已有中继 / host 本实例运行中继（随本插件卸载停止并断开所有成员，生产环境建议用 python -m grunichatmcdr.relay 独立运行，各实例用client）
+    relay_socket: str = ''                  # 本地中继的Unix域套接字路径，留空为插件数据目录下的relay.sock；client模式填写host实例的路径
+    relay_id: str = 'relay'                 # host模式下中继在上游hello中使用的标识
+    dns_cache_ttl: float = 300.0            # 广播器地址解析结果的缓存时间（秒），0表示不缓存
+    tls_session_reuse: bool = True          # wss连接重连时是否复用TLS会话以跳过完整握手
+    standby_socket: bool = False            # 是否保持一条预连接的备用套接字，断线时立即提升并自动重连
+    standby_max_age: float = 30.0           # 备用套接字的最长保留时间（秒），超过后重新建立
+    chat_collapse_window: float = 0.0       # 同一玩家在该秒数内重复发送的相同消息合并为一条 "消息 (xN)"，0表示不合并
+    chat_rate_limit: int = 0                # 每个玩家在限流窗口内最多转发的聊天条数，0表示不限流；超出的消息被丢弃，计入 !!grunichat stats
+    chat_rate_window: float = 10.0          # 聊天限流的滑动窗口长度（秒）
+    chat_throttle_players: int = 1024       # 限流状态最多保留的玩家数，超出时淘汰最久未发言的玩家
+    chat_mentions: bool = True              # 是否高亮入站聊天中的 @玩家名 并提醒被提及的玩家
+    chat_mention_sound: str = 'minecraft:entity.experience_orb.pickup'  # 被提及时播放的音效，留空不播放
+    chat_direct_messages: bool = True       # 以 @@玩家名 开头的入站聊天是否只发送给该玩家
+    shutdown_timeout: float = 3.0           # 卸载时等待队列排空、确认到达和线程退出的最长时间（秒）
+    inbound_max_frame_size: int = 65536     # 入站帧的最大字符数，超出的帧不解析直接丢弃
+    inbound_max_field_size: int = 4096      # 入站聊天/命令/事件字段的最大字符数，超长命令被拒绝，聊天与事件被截断
+    inbound_chat_line_chars: int = 256      # 入站聊天每行最多字符数，超出时拆成多行，0表示不拆分
+    inbound_chat_max_lines: int = 4         # 单条入站聊天最多显示的行数，超出部分截断，0表示不限制
+    clock_probe_interval: float = 0.0       # 时钟探测（probe消息）的发送间隔（秒），需要广播器支持；0表示只用hello与消息确认估计时钟偏差
+    chat_rich_text: bool = False            # 是否将入站聊天中的Markdown、网址和表情渲染为可点击、带样式的文本组件，关闭时以纯文本say
+    chat_format_codes: bool = False         # 是否保留入站聊天中的§格式代码，否则去除以防伪造样式
+    chat_source_colors: Dict[str, str] = {}  # 各消息来源前缀的颜色（如 {"qq": "aqua"}），未配置的来源按名称自动分配
+    chat_render_cache_size: int = 1024      # 富文本渲染结果缓存的条目数，0表示不缓存
+    command_auth_enabled: bool = False      # 是否按来源授权远程命令；启用后未配置策略的来源一律拒绝
+    command_policies: Dict[str, CommandPolicyConfig] = {}  # 各来源的命令策略，键为消息的from，"*" 为未单独配置来源的默认策略
+    command_deny_reply: bool = True         # 拒绝命令时是否以status为denied的command_result回复来源
+    command_audit_enabled: bool = True      # 是否将每次命令授权结果写入审计日志
+    command_audit_file: str = 'command_audit.log'  # 审计日志文件名（位于插件数据目录，JSON Lines格式）
+    presence_enabled: bool = False          # 是否与其它GRUniChat实例交换在线玩家名单（presence消息），供 !!grunichat online 查询；需要广播器转发presence消息
+    presence_snapshot_interval: float = 60.0  # 发送本服完整在线名单快照的间隔（秒），0表示只在连接建立和对端请求时发送
+    presence_ttl: float = 180.0             # 超过该秒数未收到某服务器的presence消息时移除其名单
     # 可扩展更多配置项，如消息过滤、平台映射等
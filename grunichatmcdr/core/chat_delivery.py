@@ -0,0 +1,132 @@
+"""
+入站聊天投递模块
+将来自WebSocket的聊天投递到游戏内：启用富文本时经RichTextRenderer转换为文本组件，@玩家名 高亮并为被提及的玩家播放提示音，
+以 @@玩家名 开头的私信只发送给目标玩家
+"""
+from typing import List, Tuple
+
+from mcdreforged.api.rtext import RColor, RText, RTextList
+
+from .rich_text import RichTextRenderer, Span
+from grunichatmcdr.state.player_index import MENTION_MARK, PlayerIndex
+
+# 私信前缀
+DIRECT_MARK = '@@'
+# 超出行数上限时追加的截断标记
+TRUNCATED_MARK = '…'
+
+
+def split_chat(text: str, line_chars: int, max_lines: int) -> Tuple[List[str], bool]:
+    """按换行和每行字符数把聊天切分为多行，超过max_lines的部分截断，返回 (行列表, 是否截断)"""
+    lines = []
+    for raw_line in text.splitlines() or ['']:
+        if line_chars > 0:
+            lines.extend(raw_line[i:i + line_chars] for i in range(0, max(len(raw_line), 1), line_chars))
+        else:
+            lines.append(raw_line)
+        if max_lines > 0 and len(lines) > max_lines:
+            lines = lines[:max_lines]
+            lines[-1] += TRUNCATED_MARK
+            return lines, True
+    return lines, False
+
+
+class ChatDelivery:
+    """入站聊天的游戏内投递"""
+
+    def __init__(self, server, config, index: PlayerIndex):
+        self.server = server
+        self.config = config
+        self.index = index
+        self.renderer = RichTextRenderer(config) if config.chat_rich_text else None
+        # 统计
+        self.split = 0
+        self.truncated = 0
+
+    def _split(self, text: str) -> List[str]:
+        lines, truncated = split_chat(text, self.config.inbound_chat_line_chars, self.config.inbound_chat_max_lines)
+        if len(lines) > 1:
+            self.split += 1
+        if truncated:
+            self.truncated += 1
+        return lines
+
+    def deliver(self, source: str, sender: str, text: str) -> str:
+        """投递一条聊天，过长时拆成多行，返回投递方式: direct / mention / broadcast / dropped"""
+        display_sender = f"[{source}] {sender}" if source else sender
+        if self.config.chat_direct_messages and text.startswith(DIRECT_MARK):
+            return self._deliver_direct(display_sender, text)
+
+        mode = 'broadcast'
+        notified = set()
+        for line in self._split(text):
+            body, mentioned = self._render(line)
+            if self.renderer:
+                self.server.say(RTextList(self.renderer.render_prefix(source, sender), *body))
+            elif mentioned:
+                self.server.say(RTextList(f"<{display_sender}> ", *body))
+            else:
+                self.server.say(f"<{display_sender}> {line}")
+            if mentioned:
+                mode = 'mention'
+            for name in mentioned:
+                if name not in notified:
+                    notified.add(name)
+                    self._notify(name)
+        return mode
+
+    def _deliver_direct(self, display_sender: str, text: str) -> str:
+        match = self.index.match_at(text, len(DIRECT_MARK))
+        if match is None:
+            self.server.logger.info(f"[{self.config.plugin_id}] 私信目标不在线，已丢弃: {text}")
+            return 'dropped'
+        end, name = match
+        if self.renderer:
+            display_sender = self.renderer.strip_formatting(display_sender)
+        for line in self._split(text[end:].lstrip()):
+            self.server.tell(name, RTextList(
+                RText(f"[{display_sender} -> {name}] ", color=RColor.light_purple),
+                *(self.renderer.render_line(line).components if self.renderer else (line,))
+            ))
+        self._notify(name)
+        return 'direct'
+
+    def _render(self, line: str) -> Tuple[list, List[str]]:
+        """渲染一行正文并高亮其中的提及，返回 (文本组件列表, 被提及的玩家)
+        没有提及时直接复用缓存的组件"""
+        rendered = self.renderer.render_line(line) if self.renderer else None
+        spans = rendered.spans if rendered else (Span(line),)
+        parts = []
+        mentioned = []
+        for span in spans:
+            mentions = self.index.scan_mentions(span.text) \
+                if self.config.chat_mentions and span.url is None and MENTION_MARK in span.text else None
+            if mentions:
+                parts.extend(self._highlight(span, mentions))
+                mentioned.extend(name for _, _, name in mentions)
+            else:
+                parts.append(span)
+        if not mentioned:
+            return (rendered.components if rendered else [line]), mentioned
+        return [part.to_rtext() for part in parts], mentioned
+
+    @staticmethod
+    def _highlight(span: Span, mentions) -> List[Span]:
+        """按扫描结果切分片段，提及部分加粗高亮"""
+        text = span.text
+        parts = []
+        cursor = 0
+        for start, end, name in mentions:
+            if start > cursor:
+                parts.append(Span(text[cursor:start], span.color, span.styles, hover=span.hover))
+            parts.append(Span(f"{MENTION_MARK}{name}", 'yellow', span.styles | {'bold'}))
+            cursor = end
+        if cursor < len(text):
+            parts.append(Span(text[cursor:], span.color, span.styles, hover=span.hover))
+        return parts
+
+    def _notify(self, name: str):
+        """为被提及的玩家播放提示音"""
+        sound = self.config.chat_mention_sound
+        if sound:
+            self.server.execute(f"execute as {name} at @s run playsound {sound} player @s")
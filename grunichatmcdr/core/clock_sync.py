@@ -0,0 +1,110 @@
+"""
+时钟偏差估计模块
+按NTP的四时间戳方法，从 (本地发送, 广播器接收, 广播器回复, 本地接收) 计算广播器相对本地时钟的偏差与往返时延
+最近若干个样本中取往返时延最小的一个（排队影响最小、路径最对称），再做指数平滑，得到稳定的偏差估计
+"""
+import math
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+# 时钟过滤器保留的样本数
+_FILTER_SIZE = 8
+# 偏差与往返时延的平滑增益
+_OFFSET_GAIN = 0.25
+_RTT_GAIN = 0.125
+
+
+def parse_timestamp(value: Any) -> Optional[float]:
+    """解析协议中的毫秒时间戳（字符串或数字），无效时返回None"""
+    if value is None or value == '':
+        return None
+    try:
+        result = float(value)
+    except (TypeError, ValueError):
+        return None
+    return result if math.isfinite(result) and result > 0 else None
+
+
+class _Sample:
+    __slots__ = ('offset', 'delay', 'taken')
+
+    def __init__(self, offset: float, delay: float, taken: float):
+        self.offset = offset
+        self.delay = delay
+        self.taken = taken
+
+
+class ClockEstimator:
+    """广播器时钟相对本地时钟的偏差估计（毫秒，正值表示广播器时钟较快）"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._samples: Deque[_Sample] = deque(maxlen=_FILTER_SIZE)
+        self._selected: Optional[_Sample] = None
+        self._offset: Optional[float] = None
+        self._rtt: Optional[float] = None
+        self._jitter = 0.0
+        self.accepted = 0
+        self.rejected = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._offset is not None
+
+    @property
+    def offset(self) -> float:
+        """当前偏差估计，尚无样本时为0"""
+        offset = self._offset
+        return 0.0 if offset is None else offset
+
+    def add_sample(self, t0: float, t1: float, t2: float, t3: float) -> bool:
+        """加入一组时间戳（毫秒）：t0本地发送、t1广播器接收、t2广播器回复、t3本地接收"""
+        delay = (t3 - t0) - (t2 - t1)
+        if delay < 0 or t2 < t1:
+            # 广播器处理时间大于本地测得的往返时间，时间戳不可信
+            with self._lock:
+                self.rejected += 1
+            return False
+        sample = _Sample(((t1 - t0) + (t2 - t3)) / 2, delay, time.monotonic())
+        with self._lock:
+            self.accepted += 1
+            self._samples.append(sample)
+            self._rtt = delay if self._rtt is None else self._rtt + (delay - self._rtt) * _RTT_GAIN
+            best = min(self._samples, key=lambda item: item.delay)
+            # 只在选出新的样本时更新，避免同一个样本被反复计入
+            if best is not self._selected:
+                self._selected = best
+                if self._offset is None:
+                    self._offset = best.offset
+                else:
+                    self._offset += (best.offset - self._offset) * _OFFSET_GAIN
+            self._jitter = math.sqrt(
+                sum((item.offset - best.offset) ** 2 for item in self._samples) / len(self._samples)
+            )
+        return True
+
+    def to_local(self, broker_time: float) -> float:
+        """把广播器时间戳换算为本地时钟"""
+        return broker_time - self.offset
+
+    def reset(self):
+        """更换广播器时丢弃全部样本"""
+        with self._lock:
+            self._samples.clear()
+            self._selected = None
+            self._offset = None
+            self._rtt = None
+            self._jitter = 0.0
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'ready': self._offset is not None,
+                'offset': self._offset,
+                'rtt': self._rtt,
+                'jitter': self._jitter,
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+            }
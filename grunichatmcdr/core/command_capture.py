@@ -0,0 +1,156 @@
+"""
+命令输出捕获模块
+在执行来自WebSocket的命令后收集随后的控制台输出，超时、输出达到上限或出现结束行时交给回调发送结果
+捕获只登记状态，不阻塞读线程；到期判断由独立的守护线程完成
+"""
+import re
+import threading
+import time
+from typing import Callable, List, Optional
+
+# 结果状态
+STATUS_SUCCESS = 'success'      # 捕获到输出
+STATUS_TIMEOUT = 'timeout'      # 窗口内没有任何输出
+
+
+class PendingCapture:
+    """一次进行中的命令输出捕获"""
+    __slots__ = ('total_id', 'command', 'source', 'started', 'deadline', 'last_output',
+                 'lines', 'size', 'truncated', 'matched')
+
+    def __init__(self, total_id: str, command: str, source: str, timeout: float):
+        self.total_id = total_id
+        self.command = command
+        self.source = source
+        self.started = time.monotonic()
+        self.deadline = self.started + timeout
+        self.last_output: Optional[float] = None
+        self.lines: List[str] = []
+        self.size = 0
+        self.truncated = False
+        self.matched = False
+
+    @property
+    def output(self) -> str:
+        return '\n'.join(self.lines)
+
+    @property
+    def status(self) -> str:
+        return STATUS_SUCCESS if self.lines else STATUS_TIMEOUT
+
+
+class CommandOutputCapture:
+    """命令输出捕获器"""
+
+    def __init__(self, on_complete: Callable[[PendingCapture], None], logger,
+                 timeout: float = 3.0, idle: float = 0.5, max_chars: int = 2000, end_pattern: str = ''):
+        self._on_complete = on_complete
+        self._logger = logger
+        self._timeout = timeout
+        self._idle = idle
+        self._max_chars = max_chars
+        self._end_pattern = re.compile(end_pattern) if end_pattern else None
+        self._pending: List[PendingCapture] = []
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+
+    def begin(self, total_id: str, command: str, source: str) -> PendingCapture:
+        """登记一次捕获，立即返回"""
+        capture = PendingCapture(total_id, command, source, self._timeout)
+        with self._cond:
+            self._pending.append(capture)
+            self._ensure_thread()
+            self._cond.notify()
+        return capture
+
+    def has_pending(self) -> bool:
+        """是否有进行中的捕获（无锁快速判断）"""
+        return bool(self._pending)
+
+    def pending_count(self, source: Optional[str] = None) -> int:
+        """进行中的捕获数量，可按来源过滤"""
+        with self._cond:
+            if source is None:
+                return len(self._pending)
+            return sum(1 for capture in self._pending if capture.source == source)
+
+    def feed(self, line: str):
+        """送入一行控制台输出，追加到所有进行中的捕获"""
+        if not self._pending:
+            return
+        now = time.monotonic()
+        finished = []
+        with self._cond:
+            for capture in self._pending:
+                remaining = self._max_chars - capture.size
+                if remaining <= 0:
+                    continue
+                if len(line) > remaining:
+                    line_part = line[:remaining]
+                    capture.truncated = True
+                else:
+                    line_part = line
+                capture.lines.append(line_part)
+                capture.size += len(line_part) + 1
+                capture.last_output = now
+                if capture.truncated or capture.size >= self._max_chars:
+                    capture.truncated = True
+                    finished.append(capture)
+                elif self._end_pattern and self._end_pattern.search(line):
+                    capture.matched = True
+                    finished.append(capture)
+            for capture in finished:
+                self._pending.remove(capture)
+        for capture in finished:
+            self._complete(capture)
+
+    def stop(self):
+        """停止捕获线程，丢弃未完成的捕获"""
+        with self._cond:
+            self._running = False
+            self._pending.clear()
+            self._cond.notify_all()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        self._thread = None
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._reap_loop, name='GRUniChat-command-capture', daemon=True)
+            self._thread.start()
+
+    def _expires_at(self, capture: PendingCapture) -> float:
+        if capture.last_output is not None:
+            return min(capture.deadline, capture.last_output + self._idle)
+        return capture.deadline
+
+    def _reap_loop(self):
+        """等待最近的到期时间，完成超时或输出已静默的捕获"""
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                if not self._pending:
+                    # 空闲时退出，下次begin时按需重新启动
+                    if self._thread is threading.current_thread():
+                        self._thread = None
+                    return
+                now = time.monotonic()
+                expired = [c for c in self._pending if self._expires_at(c) <= now]
+                if not expired:
+                    nearest = min(self._expires_at(c) for c in self._pending)
+                    self._cond.wait(max(0.0, nearest - now))
+                    continue
+                for capture in expired:
+                    self._pending.remove(capture)
+            for capture in expired:
+                self._complete(capture)
+
+    def _complete(self, capture: PendingCapture):
+        try:
+            self._on_complete(capture)
+        except Exception as e:
+            self._logger.error(f"发送命令结果失败 [ID: {capture.total_id}]: {e}")
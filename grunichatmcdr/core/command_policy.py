@@ -0,0 +1,172 @@
+"""
+远程命令授权模块
+按消息来源配置允许的命令前缀与正则，加载时编译为前缀树和逐条编译的正则；
+同时限制每个来源同时执行（等待输出捕获）的命令数和滑动窗口内的命令数
+"""
+import re
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, NamedTuple, Optional, Pattern
+
+# 未单独配置的来源使用该键下的策略
+DEFAULT_SOURCE = '*'
+
+# 授权结果的原因
+REASON_ALLOWED = 'allowed'
+REASON_MALFORMED = 'malformed'          # 含有控制字符（换行等），会在服务端标准输入中拼出额外的命令
+REASON_NO_POLICY = 'no_policy'          # 来源没有任何策略
+REASON_NOT_ALLOWED = 'not_allowed'      # 不匹配任何允许的前缀或正则
+REASON_CONCURRENCY = 'concurrency'      # 同时执行的命令数达到上限
+REASON_RATE = 'rate_limited'            # 窗口内命令数达到上限
+
+
+# C0/C1控制字符与Unicode行分隔符；MCDR把命令原样加换行写入服务端标准输入，其中的换行会拆出第二条命令
+_CONTROL_CHARS = re.compile(r'[\x00-\x1f\x7f-\x9f\u2028\u2029]')
+
+
+class Decision(NamedTuple):
+    allowed: bool
+    reason: str
+    # 通过检查时实际应执行的命令，拒绝时为None
+    command: Optional[str] = None
+
+
+def canonical_command(command: str) -> Optional[str]:
+    """执行用的命令形式：去掉首尾空白并合并连续空格；含控制字符时返回None"""
+    if _CONTROL_CHARS.search(command):
+        return None
+    return ' '.join(command.split())
+
+
+def normalize_command(command: str) -> str:
+    """匹配用的命令形式：规范形式去掉开头的/并转为小写"""
+    command = ' '.join(command.split())
+    if command.startswith('/'):
+        command = command[1:].lstrip()
+    return command.lower()
+
+
+class PrefixTrie:
+    """命令前缀树；前缀只在单词边界处匹配，"tp" 允许 "tp" 和 "tp x" 而不允许 "tpa" """
+
+    def __init__(self, prefixes: List[str]):
+        self._root: Dict[str, dict] = {}
+        self.allow_all = False
+        for prefix in prefixes:
+            prefix = normalize_command(prefix)
+            if prefix in ('', '*'):
+                self.allow_all = True
+                continue
+            node = self._root
+            for ch in prefix:
+                node = node.setdefault(ch, {})
+            # 用空字符串键标记前缀结尾
+            node[''] = {}
+
+    def matches(self, command: str) -> bool:
+        if self.allow_all:
+            return True
+        node = self._root
+        for ch in command:
+            if ch == ' ' and '' in node:
+                return True
+            node = node.get(ch)
+            if node is None:
+                return False
+        return '' in node
+
+
+class SourcePolicy:
+    """单个来源编译后的策略"""
+
+    def __init__(self, prefixes: List[str], patterns: List[str], max_concurrent: int,
+                 rate_limit: int, rate_window: float, on_invalid: Callable[[str, Exception], None]):
+        self.trie = PrefixTrie(prefixes)
+        # 每条正则单独编译：合并成一个正则时，(?i)等全局标志不在开头会报错，反向引用的组号也会错位
+        self.patterns: List[Pattern[str]] = []
+        for pattern in patterns:
+            try:
+                self.patterns.append(re.compile(pattern, re.IGNORECASE))
+            except re.error as e:
+                on_invalid(pattern, e)
+        self.max_concurrent = max_concurrent
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        # 每个来源各自的速率窗口（"*" 策略由多个来源共用）
+        self.recent: Dict[str, Deque[float]] = {}
+
+    def permits(self, command: str) -> bool:
+        if self.trie.matches(command):
+            return True
+        return any(pattern.fullmatch(command) for pattern in self.patterns)
+
+
+class CommandPolicy:
+    """按来源检查远程命令"""
+
+    def __init__(self, config, logger, pending_count: Optional[Callable[[str], int]] = None):
+        self.enabled = config.command_auth_enabled
+        self._pending_count = pending_count
+        self._lock = threading.Lock()
+        self._policies: Dict[str, SourcePolicy] = {}
+        for source, policy in config.command_policies.items():
+            self._policies[source] = SourcePolicy(
+                policy.prefixes, policy.patterns, policy.max_concurrent, policy.rate_limit, policy.rate_window,
+                lambda pattern, e, source=source: logger.error(f'命令策略[{source}]的正则无效，已忽略: {pattern}: {e}')
+            )
+        if pending_count is None and self.enabled and \
+                any(policy.max_concurrent > 0 for policy in config.command_policies.values()):
+            logger.warning('未启用命令输出捕获(command_result_enabled)，命令策略中的max_concurrent不生效')
+        # 统计
+        self.allowed = 0
+        self.denied: Dict[str, int] = {}
+
+    def check(self, source: str, command: str, now: Optional[float] = None) -> Decision:
+        """检查来源是否可以执行该命令；通过时计入该来源的速率窗口，并给出应执行的命令：
+        启用授权时为检查过的规范形式，未启用时为原文
+        含控制字符的命令无论是否启用授权都拒绝"""
+        canonical = canonical_command(command)
+        if canonical is None:
+            return self._count(Decision(False, REASON_MALFORMED))
+        if not self.enabled:
+            return self._count(Decision(True, REASON_ALLOWED, command))
+        policy = self._policies.get(source) or self._policies.get(DEFAULT_SOURCE)
+        if policy is None:
+            return self._count(Decision(False, REASON_NO_POLICY))
+        if not policy.permits(normalize_command(canonical)):
+            return self._count(Decision(False, REASON_NOT_ALLOWED))
+        # 同时执行数以该来源仍在等待输出捕获的命令计
+        if policy.max_concurrent > 0 and self._pending_count \
+                and self._pending_count(source) >= policy.max_concurrent:
+            return self._count(Decision(False, REASON_CONCURRENCY))
+        if policy.rate_limit > 0 and not self._take_rate(policy, source, now):
+            return self._count(Decision(False, REASON_RATE))
+        return self._count(Decision(True, REASON_ALLOWED, canonical))
+
+    def get_stats(self) -> Dict[str, object]:
+        with self._lock:
+            return {'enabled': self.enabled, 'allowed': self.allowed, 'denied': dict(self.denied)}
+
+    def _take_rate(self, policy: SourcePolicy, source: str, now: Optional[float]) -> bool:
+        """滑动窗口限速：窗口内命令数未达上限时记入并返回True"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            recent = policy.recent.get(source)
+            if recent is None:
+                recent = policy.recent[source] = deque()
+            cutoff = now - policy.rate_window
+            while recent and recent[0] <= cutoff:
+                recent.popleft()
+            if len(recent) >= policy.rate_limit:
+                return False
+            recent.append(now)
+            return True
+
+    def _count(self, decision: Decision) -> Decision:
+        with self._lock:
+            if decision.allowed:
+                self.allowed += 1
+            else:
+                self.denied[decision.reason] = self.denied.get(decision.reason, 0) + 1
+        return decision
@@ -0,0 +1,278 @@
+"""
+快速连接模块
+为WebSocket连接预先建立底层套接字：缓存DNS解析结果、复用TLS会话，并可保持一条预连接的备用套接字，
+使重连时跳过解析和完整握手，只需完成WebSocket升级
+"""
+import select
+import socket
+import ssl
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+from urllib.request import getproxies_environment
+
+# 建立TCP连接的超时（秒）
+_CONNECT_TIMEOUT = 10.0
+# 备用套接字检查间隔的下限（秒）
+_MIN_STANDBY_CHECK = 1.0
+
+
+def parse_ws_url(url: str) -> Tuple[str, int, bool]:
+    """解析ws/wss地址，返回 (主机, 端口, 是否TLS)"""
+    parsed = urlparse(url)
+    if parsed.scheme not in ('ws', 'wss') or not parsed.hostname:
+        raise ValueError(f'不支持的WebSocket地址: {url}')
+    secure = parsed.scheme == 'wss'
+    return parsed.hostname, parsed.port or (443 if secure else 80), secure
+
+
+class DnsCache:
+    """带TTL的地址解析缓存"""
+
+    def __init__(self, ttl: float):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries: Dict[Tuple[str, int], Tuple[float, List[tuple]]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def resolve(self, host: str, port: int) -> List[tuple]:
+        key = (host, port)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] > now:
+                self.hits += 1
+                return entry[1]
+        infos = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM, socket.IPPROTO_TCP)
+        with self._lock:
+            self.misses += 1
+            if self.ttl > 0:
+                self._entries[key] = (now + self.ttl, infos)
+        return infos
+
+    def invalidate(self, host: str, port: int):
+        """缓存的地址全部连接失败时丢弃，下次重新解析"""
+        with self._lock:
+            self._entries.pop((host, port), None)
+
+
+class _Standby:
+    __slots__ = ('url', 'sock', 'created')
+
+    def __init__(self, url, sock):
+        self.url = url
+        self.sock = sock
+        self.created = time.monotonic()
+
+
+class Connector:
+    """为WebSocketApp准备已连接（及已完成TLS握手）的套接字"""
+
+    def __init__(self, logger, dns_ttl: float = 300.0, tls_session_reuse: bool = True,
+                 standby: bool = False, standby_max_age: float = 30.0):
+        self.logger = logger
+        self.dns = DnsCache(dns_ttl)
+        self.tls_session_reuse = tls_session_reuse
+        self.standby_enabled = standby
+        self.standby_max_age = standby_max_age
+        # 会话只能在创建它的上下文中恢复，因此整个连接器共用一个上下文；加载系统证书较慢，首次wss连接时才创建
+        self._ssl_context: Optional[ssl.SSLContext] = None
+        self._sessions: Dict[Tuple[str, int], ssl.SSLSession] = {}
+        self._lock = threading.Lock()
+        self._standby: Dict[str, _Standby] = {}
+        self._standby_urls = set()
+        self._standby_thread: Optional[threading.Thread] = None
+        self._wake = threading.Event()
+        self._closed = False
+        # 统计
+        self.tls_handshakes = 0
+        self.tls_resumed = 0
+        self.standby_promoted = 0
+        self.standby_discarded = 0
+
+    @staticmethod
+    def applies_to(url: str) -> bool:
+        """仅处理直连的ws/wss地址；环境变量配置了代理时交由websocket-client自行连接"""
+        if getproxies_environment().keys() & {'http', 'https', 'all'}:
+            return False
+        try:
+            parse_ws_url(url)
+        except ValueError:
+            return False
+        return True
+
+    def open(self, url: str) -> socket.socket:
+        """取得一条可用于该地址的套接字，优先提升备用套接字"""
+        sock = self._take_standby(url)
+        if sock is not None:
+            return sock
+        return self._connect(url)
+
+    def remember_session(self, url: str, sock):
+        """连接升级完成后再次保存TLS会话（TLS 1.3的会话票据在握手之后才到达）"""
+        if not self.tls_session_reuse or not isinstance(sock, ssl.SSLSocket):
+            return
+        try:
+            host, port, _ = parse_ws_url(url)
+        except ValueError:
+            return
+        session = sock.session
+        if session is not None:
+            with self._lock:
+                self._sessions[(host, port)] = session
+
+    def keep_standby(self, url: str):
+        """为该地址保持一条备用套接字，未启用时忽略"""
+        if not self.standby_enabled:
+            return
+        with self._lock:
+            self._standby_urls.add(url)
+            if self._standby_thread is None:
+                self._closed = False
+                self._standby_thread = threading.Thread(
+                    target=self._standby_loop, name='GRUniChat-standby', daemon=True
+                )
+                self._standby_thread.start()
+        self._wake.set()
+
+    def drop_standby(self, url: Optional[str] = None):
+        """不再为该地址（None表示全部）保持备用套接字"""
+        with self._lock:
+            urls = [url] if url is not None else list(self._standby_urls | set(self._standby))
+            for item in urls:
+                self._standby_urls.discard(item)
+                self._close_standby(self._standby.pop(item, None))
+
+    def close(self):
+        """关闭所有备用套接字并停止补充线程，之后调用keep_standby会重新启动"""
+        self._closed = True
+        self.drop_standby()
+        self._wake.set()
+        thread = self._standby_thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        self._standby_thread = None
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            standby = len(self._standby)
+        return {
+            'dns_hits': self.dns.hits,
+            'dns_misses': self.dns.misses,
+            'tls_handshakes': self.tls_handshakes,
+            'tls_resumed': self.tls_resumed,
+            'standby_ready': standby,
+            'standby_promoted': self.standby_promoted,
+            'standby_discarded': self.standby_discarded,
+        }
+
+    def _connect(self, url: str) -> socket.socket:
+        host, port, secure = parse_ws_url(url)
+        sock = self._open_tcp(host, port)
+        if secure:
+            sock = self._wrap_tls(sock, host, port)
+        # 交给websocket-client后由其设置读写超时
+        sock.settimeout(None)
+        return sock
+
+    def _open_tcp(self, host: str, port: int) -> socket.socket:
+        last_error: Optional[OSError] = None
+        for family, socktype, proto, _, address in self.dns.resolve(host, port):
+            sock = socket.socket(family, socktype, proto)
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.settimeout(_CONNECT_TIMEOUT)
+                sock.connect(address)
+                return sock
+            except OSError as e:
+                sock.close()
+                last_error = e
+        self.dns.invalidate(host, port)
+        raise last_error or OSError(f'无法解析 {host}:{port}')
+
+    def _wrap_tls(self, sock: socket.socket, host: str, port: int) -> ssl.SSLSocket:
+        session = None
+        if self.tls_session_reuse:
+            with self._lock:
+                session = self._sessions.get((host, port))
+        with self._lock:
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            context = self._ssl_context
+        try:
+            tls_sock = context.wrap_socket(sock, server_hostname=host, session=session)
+        except ssl.SSLError:
+            if session is None:
+                sock.close()
+                raise
+            # 缓存的会话失效时丢弃并进行完整握手
+            with self._lock:
+                self._sessions.pop((host, port), None)
+            sock.close()
+            return self._wrap_tls(self._open_tcp(host, port), host, port)
+        self.tls_handshakes += 1
+        if tls_sock.session_reused:
+            self.tls_resumed += 1
+        self.remember_session(f'wss://{host}:{port}', tls_sock)
+        return tls_sock
+
+    def _take_standby(self, url: str) -> Optional[socket.socket]:
+        with self._lock:
+            standby = self._standby.pop(url, None)
+        if standby is None:
+            return None
+        self._wake.set()
+        if not self._is_fresh(standby):
+            self._close_standby(standby)
+            return None
+        self.standby_promoted += 1
+        return standby.sock
+
+    def _is_fresh(self, standby: _Standby) -> bool:
+        """未超龄且对端未关闭；升级前对端不会发送数据，可读即意味着连接已断开"""
+        if time.monotonic() - standby.created > self.standby_max_age:
+            return False
+        try:
+            readable, _, _ = select.select([standby.sock], [], [], 0)
+        except (OSError, ValueError):
+            return False
+        return not readable
+
+    def _close_standby(self, standby: Optional[_Standby]):
+        if standby is None:
+            return
+        self.standby_discarded += 1
+        try:
+            standby.sock.close()
+        except OSError:
+            pass
+
+    def _standby_loop(self):
+        """补充缺失的备用套接字，并在超龄或失效前替换"""
+        interval = max(_MIN_STANDBY_CHECK, self.standby_max_age / 3)
+        while not self._closed:
+            self._wake.clear()
+            with self._lock:
+                urls = list(self._standby_urls)
+                stale = [standby for standby in self._standby.values() if not self._is_fresh(standby)]
+                for standby in stale:
+                    del self._standby[standby.url]
+            for standby in stale:
+                self._close_standby(standby)
+            for url in urls:
+                with self._lock:
+                    if url in self._standby or url not in self._standby_urls:
+                        continue
+                try:
+                    sock = self._connect(url)
+                except (OSError, ValueError) as e:
+                    self.logger.debug(f'[GRUniChat] 建立备用连接失败 {url}: {e}')
+                    continue
+                with self._lock:
+                    if self._closed or url not in self._standby_urls or url in self._standby:
+                        self._close_standby(_Standby(url, sock))
+                    else:
+                        self._standby[url] = _Standby(url, sock)
+            self._wake.wait(interval)
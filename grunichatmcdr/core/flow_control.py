@@ -0,0 +1,109 @@
+"""
+基于信用额度的流量控制
+对端在hello或ack中通过window字段声明可接受的未确认消息数，发送方额度用尽时暂停，收到ack后恢复
+"""
+import threading
+import time
+from typing import Dict, Optional
+
+# 对端未声明窗口时，未确认记录超过该数量即清理过期项，避免不回ack的对端导致记录无限增长
+_UNBOUNDED_TRACK_LIMIT = 1024
+
+
+class CreditWindow:
+    """单条连接的发送额度"""
+
+    def __init__(self, ack_timeout: float = 10.0):
+        self._cond = threading.Condition()
+        self._ack_timeout = ack_timeout
+        # None表示对端未声明窗口，不做限制
+        self._peer_window: Optional[int] = None
+        self._in_flight: Dict[str, float] = {}
+        self._closed = False
+        self.expired = 0
+        self.stalls = 0
+
+    @property
+    def peer_window(self) -> Optional[int]:
+        return self._peer_window
+
+    @property
+    def in_flight(self) -> int:
+        with self._cond:
+            return len(self._in_flight)
+
+    def update_window(self, window: int):
+        """对端声明新的窗口大小"""
+        with self._cond:
+            self._peer_window = max(1, int(window))
+            self._cond.notify_all()
+
+    def wait_for_credit(self, timeout: float) -> bool:
+        """等待直到有可用额度，超时或关闭时返回False"""
+        with self._cond:
+            if self._has_credit():
+                return True
+            self.stalls += 1
+            deadline = time.monotonic() + timeout
+            while not self._has_credit():
+                remaining = deadline - time.monotonic()
+                if self._closed or remaining <= 0:
+                    return False
+                self._cond.wait(remaining)
+            return True
+
+    def acquire(self, total_id: str):
+        """记录一条已发送、等待确认的消息"""
+        with self._cond:
+            self._in_flight[total_id] = time.monotonic()
+            if self._peer_window is None and len(self._in_flight) > _UNBOUNDED_TRACK_LIMIT:
+                self._expire()
+                # 仍然超出时按发送顺序丢弃最早的记录
+                while len(self._in_flight) > _UNBOUNDED_TRACK_LIMIT:
+                    del self._in_flight[next(iter(self._in_flight))]
+                    self.expired += 1
+
+    def release(self, total_id: str) -> Optional[float]:
+        """收到确认后归还额度，返回该消息的发送时刻（单调时钟），未记录时返回None"""
+        with self._cond:
+            sent = self._in_flight.pop(total_id, None)
+            if sent is not None:
+                self._cond.notify_all()
+            return sent
+
+    def reset(self):
+        """连接重建时清空未确认记录和对端窗口"""
+        with self._cond:
+            self._in_flight.clear()
+            self._peer_window = None
+            self._closed = False
+            self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def get_stats(self) -> Dict[str, Optional[int]]:
+        with self._cond:
+            return {
+                'peer_window': self._peer_window,
+                'in_flight': len(self._in_flight),
+                'stalls': self.stalls,
+                'expired': self.expired,
+            }
+
+    def _has_credit(self) -> bool:
+        if self._peer_window is None:
+            return True
+        if len(self._in_flight) >= self._peer_window:
+            self._expire()
+        return len(self._in_flight) < self._peer_window
+
+    def _expire(self):
+        """丢弃超过确认超时的记录，防止丢失的ack永久占用额度"""
+        cutoff = time.monotonic() - self._ack_timeout
+        stale = [total_id for total_id, sent in self._in_flight.items() if sent < cutoff]
+        for total_id in stale:
+            del self._in_flight[total_id]
+        self.expired += len(stale)
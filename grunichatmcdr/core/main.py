@@ -2,14 +2,24 @@ from .websocket_service import WebSocketService
 
 _ws_service = None
 
-def start_ws_service(server, config):
+def create_ws_service(server, config):
+    """创建WebSocket服务但不连接，之后调用start()（可在后台线程中）建立连接"""
     global _ws_service
     _ws_service = WebSocketService(server, config)
-    _ws_service.start()
     return _ws_service
 
-def stop_ws_service():
+def start_ws_service(server, config):
+    create_ws_service(server, config).start()
+    return _ws_service
+
+def stop_ws_service(timeout=None):
+    """停止WebSocket服务；指定timeout时优雅关闭并返回各通道的关闭报告"""
     global _ws_service
+    report = None
     if _ws_service:
-        _ws_service.stop()
+        if timeout is None:
+            _ws_service.stop()
+        else:
+            report = _ws_service.shutdown(timeout)
         _ws_service = None
+    return report
@@ -0,0 +1,145 @@
+"""
+协议消息模型
+以__slots__对象表示消息信封与消息体，type/from等重复出现的字符串做驻留
+入站帧解析后直接转换为对象，出站时直接拼接JSON文本，不再构造中间字典
+"""
+import json
+import re
+import sys
+import time
+import uuid
+from json.encoder import encode_basestring_ascii as _quote
+from typing import Any, Dict, Optional
+
+_intern = sys.intern
+# 不完整解析即可取得消息类型；JSON字符串内的引号必须转义，因此不会误匹配正文中的 "type"
+_TYPE_PATTERN = re.compile(r'"type"\s*:\s*"([A-Za-z_]{1,32})"')
+
+
+def sniff_type(text: str) -> Optional[str]:
+    """从原始帧中快速取出type字段，找不到时返回None（交由完整解析处理）"""
+    match = _TYPE_PATTERN.search(text)
+    return match.group(1) if match else None
+
+
+class Body:
+    """消息体"""
+    __slots__ = ('sender', 'chat_message', 'command', 'event_detail')
+
+    def __init__(self, sender: str = '', chat_message: str = '', command: str = '', event_detail: str = ''):
+        self.sender = sender
+        self.chat_message = chat_message
+        self.command = command
+        self.event_detail = event_detail
+
+    @classmethod
+    def from_dict(cls, data: Any) -> 'Body':
+        if not isinstance(data, dict):
+            return cls()
+        return cls(
+            _text(data.get('sender')),
+            _text(data.get('chatMessage')),
+            _text(data.get('command')),
+            _text(data.get('eventDetail')),
+        )
+
+    def to_json(self) -> str:
+        return (
+            f'{{"sender": {_quote(self.sender)}, "chatMessage": {_quote(self.chat_message)}, '
+            f'"command": {_quote(self.command)}, "eventDetail": {_quote(self.event_detail)}}}'
+        )
+
+    def __repr__(self):
+        return (f'Body(sender={self.sender!r}, chat_message={self.chat_message!r}, '
+                f'command={self.command!r}, event_detail={self.event_detail!r})')
+
+
+class Envelope:
+    """消息信封；ack/error/command_result等类型特有的字段放在extra中"""
+    __slots__ = ('source', 'type', 'body', 'total_id', 'current_time', 'extra')
+
+    def __init__(self, source: str, msg_type: str, body: Optional[Body] = None, total_id: str = '',
+                 current_time: int = 0, extra: Optional[Dict[str, Any]] = None):
+        self.source = _intern(source)
+        self.type = _intern(msg_type)
+        self.body = body
+        self.total_id = total_id
+        self.current_time = current_time
+        self.extra = extra
+
+    @classmethod
+    def create(cls, source: str, msg_type: str, body: Optional[Body] = None, **extra) -> 'Envelope':
+        """创建一条带新totalId和当前时间戳（毫秒）的出站消息"""
+        return cls(source, msg_type, body, str(uuid.uuid4()), int(time.time() * 1000), extra or None)
+
+    @classmethod
+    def from_json(cls, text: str) -> 'Envelope':
+        """解析一帧JSON文本，非对象时抛出ValueError"""
+        data = json.loads(text)
+        if not isinstance(data, dict):
+            raise ValueError('message is not a JSON object')
+        source = data.pop('from', '')
+        msg_type = data.pop('type', '')
+        body = data.pop('body', None)
+        total_id = data.pop('totalId', '')
+        current_time = data.pop('currentTime', 0)
+        try:
+            current_time = int(current_time)
+        except (TypeError, ValueError):
+            current_time = 0
+        return cls(
+            _text(source),
+            _text(msg_type),
+            Body.from_dict(body) if body is not None else None,
+            _text(total_id),
+            current_time,
+            data or None,
+        )
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """读取extra中的字段"""
+        extra = self.extra
+        return extra.get(key, default) if extra else default
+
+    def set(self, key: str, value: Any):
+        """设置extra中的字段"""
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def to_json(self) -> str:
+        parts = [f'{{"from": {_quote(self.source)}, "type": {_quote(self.type)}']
+        if self.body is not None:
+            parts.append(f', "body": {self.body.to_json()}')
+        parts.append(f', "totalId": {_quote(self.total_id)}')
+        if self.current_time:
+            parts.append(f', "currentTime": "{self.current_time}"')
+        if self.extra:
+            for key, value in self.extra.items():
+                parts.append(f', {_quote(key)}: {json.dumps(value)}')
+        parts.append('}')
+        return ''.join(parts)
+
+    def __repr__(self):
+        return (f'Envelope(source={self.source!r}, type={self.type!r}, body={self.body!r}, '
+                f'total_id={self.total_id!r}, current_time={self.current_time!r}, extra={self.extra!r})')
+
+
+def build_message(plugin_id: str, msg_type: str, sender: str = '', chat_message: str = '',
+                  command: str = '', event_detail: str = '') -> Envelope:
+    """创建标准格式的出站消息，非chat消息的内容带上plugin_id前缀"""
+    if msg_type != 'chat':
+        prefix = f'[{plugin_id}] '
+        if command:
+            command = prefix + command
+        if event_detail:
+            event_detail = prefix + event_detail
+        if sender:
+            sender = prefix + sender
+    return Envelope.create(plugin_id, msg_type, Body(sender, chat_message, command, event_detail))
+
+
+def _text(value: Any) -> str:
+    if value is None:
+        return ''
+    return value if isinstance(value, str) else str(value)
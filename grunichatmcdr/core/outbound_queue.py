@@ -0,0 +1,163 @@
+"""
+出站消息优先级队列
+按优先级分类的有界队列，使用加权轮询出队，持续过载时优先丢弃低优先级消息
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# 优先级分类，数值越小优先级越高
+PRIORITY_CONTROL = 0          # 控制帧（hello、ack等）
+PRIORITY_COMMAND_RESULT = 1   # 命令执行结果
+PRIORITY_LIFECYCLE = 2        # 生命周期事件（进出服、启动、卸载）
+PRIORITY_CHAT = 3             # 聊天消息
+PRIORITY_NOISY = 4            # 高频低价值事件（卡顿警告、死亡等）
+
+PRIORITY_NAMES = ('control', 'command_result', 'lifecycle', 'chat', 'noisy')
+
+# 各分类在一轮加权轮询中最多可出队的消息数
+DEFAULT_WEIGHTS = (8, 6, 4, 2, 1)
+# 各分类占总容量的比例
+_CAPACITY_SHARES = (0.0625, 0.125, 0.25, 0.5, 0.25)
+
+# 积压超过总容量的该比例即视为过载
+_HIGH_WATERMARK = 0.5
+# 积压超过总容量的该比例且持续过载时，连聊天消息也一并丢弃
+_CRITICAL_WATERMARK = 0.9
+
+
+class OutboundQueue:
+    """按优先级分类的出站消息队列"""
+
+    def __init__(self, total_capacity: int = 1024, shed_delay: float = 5.0,
+                 weights: Tuple[int, ...] = DEFAULT_WEIGHTS):
+        self._cond = threading.Condition()
+        self._total_capacity = max(len(PRIORITY_NAMES), total_capacity)
+        self._capacities = [max(4, int(self._total_capacity * share)) for share in _CAPACITY_SHARES]
+        self._weights = list(weights)
+        self._credits = list(weights)
+        self._shed_delay = shed_delay
+        self._queues: List[Deque[Any]] = [deque() for _ in PRIORITY_NAMES]
+        self._size = 0
+        self._pressure_since: Optional[float] = None
+        self._enqueued = [0] * len(PRIORITY_NAMES)
+        self._dropped = [0] * len(PRIORITY_NAMES)
+        self._taken = 0
+        self._closed = False
+
+    def put(self, priority: int, item: Any) -> bool:
+        """放入一条消息，被过载策略丢弃时返回False"""
+        with self._cond:
+            if self._should_shed(priority):
+                self._dropped[priority] += 1
+                return False
+
+            queue = self._queues[priority]
+            if len(queue) >= self._capacities[priority]:
+                # 分类已满时丢弃该分类中最旧的一条，保留最新的消息
+                queue.popleft()
+                self._size -= 1
+                self._dropped[priority] += 1
+            elif self._size >= self._total_capacity and not self._evict_lower_than(priority):
+                self._dropped[priority] += 1
+                return False
+
+            queue.append(item)
+            self._size += 1
+            self._enqueued[priority] += 1
+            self._cond.notify()
+            return True
+
+    def get(self, timeout: Optional[float] = None) -> Optional[Tuple[int, Any]]:
+        """按加权轮询取出一条消息，超时或队列关闭时返回None"""
+        with self._cond:
+            if not self._size and not self._closed:
+                self._cond.wait(timeout)
+            if not self._size:
+                return None
+
+            for _ in range(2):
+                for priority, queue in enumerate(self._queues):
+                    if queue and self._credits[priority] > 0:
+                        self._credits[priority] -= 1
+                        self._size -= 1
+                        self._taken += 1
+                        return priority, queue.popleft()
+                # 所有非空分类的额度都已用完，开始新一轮
+                self._credits = list(self._weights)
+            return None
+
+    def wakeup(self):
+        """唤醒等待中的消费者"""
+        with self._cond:
+            self._cond.notify_all()
+
+    def close(self):
+        """关闭队列，之后的get不再阻塞"""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+    def reopen(self):
+        """重新开放队列"""
+        with self._cond:
+            self._closed = False
+
+    def clear(self) -> int:
+        """清空队列，返回被清除的消息数"""
+        with self._cond:
+            cleared = self._size
+            for queue in self._queues:
+                queue.clear()
+            self._size = 0
+            self._pressure_since = None
+            return cleared
+
+    @property
+    def taken(self) -> int:
+        """累计被取出的消息数"""
+        return self._taken
+
+    def __len__(self) -> int:
+        with self._cond:
+            return self._size
+
+    def get_stats(self) -> Dict[str, Dict[str, int]]:
+        """获取各分类的排队、入队和丢弃计数"""
+        with self._cond:
+            return {
+                name: {
+                    'queued': len(self._queues[priority]),
+                    'enqueued': self._enqueued[priority],
+                    'dropped': self._dropped[priority],
+                }
+                for priority, name in enumerate(PRIORITY_NAMES)
+            }
+
+    def _should_shed(self, priority: int) -> bool:
+        """持续过载时按优先级从低到高拒绝新消息"""
+        fill = self._size / self._total_capacity
+        if fill < _HIGH_WATERMARK:
+            self._pressure_since = None
+            return False
+
+        now = time.monotonic()
+        if self._pressure_since is None:
+            self._pressure_since = now
+        if now - self._pressure_since < self._shed_delay:
+            return False
+
+        if fill >= _CRITICAL_WATERMARK:
+            return priority >= PRIORITY_CHAT
+        return priority >= PRIORITY_NOISY
+
+    def _evict_lower_than(self, priority: int) -> bool:
+        """总容量已满时，从优先级低于给定值的分类中丢弃最旧的一条"""
+        for lower in range(len(self._queues) - 1, priority, -1):
+            if self._queues[lower]:
+                self._queues[lower].popleft()
+                self._size -= 1
+                self._dropped[lower] += 1
+                return True
+        return False
@@ -0,0 +1,148 @@
+"""
+在线名单同步模块
+本服玩家进出时发送带序号的增量presence消息，连接建立后、定期以及收到请求时发送完整快照；
+收到其它服务器的presence消息时更新跨服在线名单，发现序号缺口时向对方请求快照
+"""
+import threading
+import time
+import uuid
+from typing import Any, Dict, Iterable, List, Optional
+
+from .message import Envelope
+from .outbound_queue import PRIORITY_LIFECYCLE
+from grunichatmcdr.state.player_index import player_index
+from grunichatmcdr.state.presence_roster import APPLY_GAP, APPLY_UNKNOWN, PresenceRoster
+
+# presence消息的kind字段
+KIND_DELTA = 'delta'
+KIND_SNAPSHOT = 'snapshot'
+KIND_RESYNC = 'resync'
+KIND_OFFLINE = 'offline'
+
+# 向同一服务器请求快照的最小间隔（秒）
+_RESYNC_INTERVAL = 5.0
+# 收到快照请求后稍等再发送，合并同一时刻来自多个服务器的请求
+_RESYNC_REPLY_DELAY = 0.5
+# 单条消息中接受的玩家名数量与长度上限
+_MAX_PLAYERS = 1024
+_MAX_NAME_CHARS = 64
+
+
+def _names(value: Any) -> List[str]:
+    """取出消息中的玩家名列表，忽略非字符串与超长的名字"""
+    if not isinstance(value, list):
+        return []
+    return [name for name in value[:_MAX_PLAYERS] if isinstance(name, str) and 0 < len(name) <= _MAX_NAME_CHARS]
+
+
+class PresenceTracker:
+    """本服在线名单的发布与跨服名单的接收"""
+
+    def __init__(self, service, roster: PresenceRoster):
+        self.service = service
+        self.config = service.config
+        self.logger = service.server.logger
+        self.roster = roster
+        # 本实例的标识，对端据此区分重启前后的序号
+        self.epoch = uuid.uuid4().hex[:12]
+        self._lock = threading.Lock()
+        self._seq = 0
+        # 当前连接的建立时刻，变化时视为新连接
+        self._session: Optional[float] = None
+        self._next_snapshot = float('inf')
+        self._resync_sent: Dict[str, float] = {}
+        # 统计
+        self.resyncs_requested = 0
+        self.resyncs_answered = 0
+
+    def publish_delta(self, joined: Iterable[str] = (), left: Iterable[str] = ()):
+        """发送一条增量；连接建立前不发送，连接后的快照会包含这些变化"""
+        with self._lock:
+            if self._session is None:
+                return
+            self._seq += 1
+            msg = self._create(KIND_DELTA, seq=self._seq, joined=list(joined), left=list(left))
+            if not self.service.send_envelope(msg, priority=PRIORITY_LIFECYCLE):
+                # 增量未能入队，对端会看到缺口；尽快补发快照
+                self._next_snapshot = 0.0
+
+    def publish_snapshot(self):
+        """发送本服完整在线名单"""
+        with self._lock:
+            msg = self._create(KIND_SNAPSHOT, seq=self._seq, players=player_index.names())
+            self.service.send_envelope(msg, priority=PRIORITY_LIFECYCLE)
+            interval = self.config.presence_snapshot_interval
+            self._next_snapshot = time.monotonic() + interval if interval > 0 else float('inf')
+
+    def publish_offline(self):
+        """通知对端移除本服名单（插件卸载时）"""
+        self.service.send_envelope(self._create(KIND_OFFLINE), priority=PRIORITY_LIFECYCLE)
+
+    def tick(self, session: Optional[float]):
+        """由控制通道写线程定期调用：新连接时请求所有服务器的快照并发送本服快照，到期时发送定期快照"""
+        if session is not None and session != self._session:
+            with self._lock:
+                self._session = session
+                self._next_snapshot = 0.0
+            self._request_resync('')
+        if time.monotonic() >= self._next_snapshot:
+            self.publish_snapshot()
+        for server in self.roster.expire(self.config.presence_ttl):
+            self.logger.debug(f"[{self.config.plugin_id}] 服务器 {server} 的在线名单已过期")
+
+    def handle(self, envelope: Envelope):
+        """处理其它服务器的presence消息"""
+        source = envelope.source
+        plugin_id = self.config.plugin_id
+        if not source or source == plugin_id:
+            return
+        kind = envelope.get('kind')
+        if kind == KIND_RESYNC:
+            if envelope.get('target') in (None, '', plugin_id):
+                self._schedule_snapshot(_RESYNC_REPLY_DELAY)
+                self.resyncs_answered += 1
+            return
+        if kind == KIND_OFFLINE:
+            self.roster.remove_server(source)
+            return
+
+        epoch = str(envelope.get('epoch', ''))
+        try:
+            seq = int(envelope.get('seq'))
+        except (TypeError, ValueError):
+            self.service.reject_inbound('malformed', f"presence seq: {envelope.get('seq')!r}")
+            return
+        if kind == KIND_SNAPSHOT:
+            self.roster.apply_snapshot(source, epoch, seq, _names(envelope.get('players')))
+        elif kind == KIND_DELTA:
+            result = self.roster.apply_delta(
+                source, epoch, seq, _names(envelope.get('joined')), _names(envelope.get('left'))
+            )
+            if result in (APPLY_GAP, APPLY_UNKNOWN):
+                self.logger.debug(f"[{plugin_id}] 服务器 {source} 的在线名单增量不连续({result})，请求快照")
+                self._request_resync(source)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = self.roster.get_stats()
+        stats['seq'] = self._seq
+        stats['resyncs_requested'] = self.resyncs_requested
+        stats['resyncs_answered'] = self.resyncs_answered
+        return stats
+
+    def _schedule_snapshot(self, delay: float):
+        with self._lock:
+            self._next_snapshot = min(self._next_snapshot, time.monotonic() + delay)
+
+    def _request_resync(self, target: str):
+        """请求target（为空时请求所有服务器）重发快照，同一目标限频"""
+        now = time.monotonic()
+        with self._lock:
+            if now - self._resync_sent.get(target, -_RESYNC_INTERVAL) < _RESYNC_INTERVAL:
+                return
+            self._resync_sent[target] = now
+        msg = self._create(KIND_RESYNC, target=target) if target else self._create(KIND_RESYNC)
+        if self.service.send_envelope(msg, priority=PRIORITY_LIFECYCLE):
+            self.resyncs_requested += 1
+
+    def _create(self, kind: str, **fields) -> Envelope:
+        return Envelope.create(self.config.plugin_id, 'presence', kind=kind, epoch=self.epoch, **fields)
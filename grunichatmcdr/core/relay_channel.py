@@ -0,0 +1,162 @@
+"""
+中继通道模块
+通过Unix域套接字连接本机的中继服务器，对上层提供与WebSocketChannel相同的接口
+中继的上游断开时通道视为未连接，写线程暂停，排队的消息等上游恢复后再发出
+"""
+import json
+import os
+import socket
+import threading
+import time
+
+from .message import sniff_type
+from .ws_channel import WebSocketChannel
+
+# 连接中继失败或断开后的重试间隔（秒）
+_RETRY_DELAY = 3.0
+# 未配置relay_socket时使用的文件名（位于插件数据目录）
+_DEFAULT_SOCKET_NAME = 'relay.sock'
+
+
+def resolve_relay_socket(server, config):
+    """中继套接字路径；未配置时放在插件数据目录，避免使用所有用户可写的/tmp"""
+    return config.relay_socket or os.path.join(server.get_data_folder(), _DEFAULT_SOCKET_NAME)
+
+
+class _UnixConnection:
+    """按行收发JSON帧的Unix域套接字连接"""
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.connected = True
+        self._lock = threading.Lock()
+
+    def send(self, text):
+        with self._lock:
+            self.sock.sendall(text.encode('utf-8') + b'\n')
+
+    def close(self):
+        self.connected = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.sock.close()
+
+
+class RelayChannel(WebSocketChannel):
+    """经由本地中继的通道"""
+    # hello和本地投递的消息由中继直接确认，只有转发给广播器的probe能反映广播器时钟
+    ack_clock_samples = False
+
+    def __init__(self, service, name, socket_path):
+        super().__init__(service, name, lambda: socket_path)
+        # 中继的上游连接状态，由中继的relay_status帧更新
+        self.upstream_connected = False
+
+    def is_connected(self):
+        ws = self.ws
+        return bool(ws and ws.connected and self.upstream_connected)
+
+    def get_health(self):
+        health = super().get_health()
+        health['upstream'] = self.upstream_connected
+        return health
+
+    def _on_open(self, wsapp):
+        # 新的本地连接在收到中继的relay_status之前不知道上游状态
+        self.upstream_connected = False
+        super()._on_open(wsapp)
+
+    def _ready_to_send(self):
+        return self.upstream_connected
+
+    def _on_message(self, wsapp, message):
+        if sniff_type(message) != 'relay_status':
+            super()._on_message(wsapp, message)
+            return
+        self.last_received = time.time()
+        try:
+            upstream = bool(json.loads(message).get('upstream'))
+        except (ValueError, AttributeError):
+            return
+        if upstream == self.upstream_connected:
+            return
+        self.upstream_connected = upstream
+        if upstream:
+            self.logger.info(f'[{self.plugin_id}] 中继上游已连接[{self.name}]')
+            self._connected.set()
+        else:
+            self.logger.warning(f'[{self.plugin_id}] 中继上游已断开[{self.name}]，暂停发送')
+            self._connected.clear()
+
+    def start(self):
+        with self._ws_lock:
+            self.running = True
+            stopped = self._stopped = threading.Event()
+        path = self._url_getter()
+
+        def run():
+            while self._owns_connection():
+                if self._attempt_started is None:
+                    self._attempt_started = time.monotonic()
+                sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                try:
+                    sock.connect(path)
+                except OSError as e:
+                    sock.close()
+                    self.last_error = str(e)
+                    self.logger.debug(f'[{self.plugin_id}] 连接本地中继失败[{self.name}]: {e}')
+                    stopped.wait(_RETRY_DELAY)
+                    continue
+
+                conn = _UnixConnection(sock)
+                if not self._attach(conn):
+                    conn.close()
+                    break
+                self._on_open(conn)
+                self._read_lines(conn)
+                self._on_close(conn, None, 'relay closed')
+                conn.close()
+                stopped.wait(_RETRY_DELAY)
+
+        self.thread = threading.Thread(target=run, name=f'GRUniChat-relay-{self.name}-reader', daemon=True)
+        self.thread.start()
+        self.outbox.reopen()
+        self.writer_thread = threading.Thread(target=self._write_loop, name=f'GRUniChat-relay-{self.name}-writer', daemon=True)
+        self.writer_thread.start()
+
+    def _close_connection(self, timeout):
+        # 本地套接字没有关闭握手
+        self.ws.close()
+
+    def _after_open(self, wsapp):
+        # 上游连接由中继持有，本地套接字无需快速重连
+        pass
+
+    def _read_lines(self, conn):
+        buffer = b''
+        # 超长帧按字节上限在缓冲阶段丢弃，直到下一个换行
+        limit = self.service.config.inbound_max_frame_size * 4
+        skipping = False
+        try:
+            while self.running and conn.connected:
+                chunk = conn.sock.recv(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                while b'\n' in buffer:
+                    line, buffer = buffer.split(b'\n', 1)
+                    if skipping:
+                        skipping = False
+                    elif line.strip():
+                        self._on_message(conn, line.decode('utf-8', errors='replace'))
+                if len(buffer) > limit:
+                    if not skipping:
+                        self.service.reject_inbound('oversized_frame', f'{len(buffer)}字节')
+                    buffer = b''
+                    skipping = True
+        except OSError as e:
+            if self.running:
+                self._on_error(conn, e)
+        conn.connected = False
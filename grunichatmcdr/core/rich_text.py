@@ -0,0 +1,260 @@
+"""
+富文本渲染模块
+将来自QQ/Discord等平台的聊天标记转换为Minecraft文本组件：Markdown强调与链接、可点击的网址、
+表情转为 :名称:，§格式代码默认去除以防注入；发送者前缀按消息来源着色并带来源悬停提示
+解析结果缓存在有上限的LRU中，重复出现的发送者与消息只需一次查找
+"""
+import re
+import threading
+import unicodedata
+import zlib
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Hashable, List, Optional, Tuple
+
+from mcdreforged.api.rtext import RAction, RColor, RStyle, RText, RTextBase, RTextList
+
+# 未配置颜色的来源按名称散列到以下颜色之一
+_SOURCE_PALETTE = ('aqua', 'green', 'gold', 'light_purple', 'yellow', 'blue', 'red', 'dark_aqua')
+# §格式代码对应的颜色与样式
+_FORMAT_COLORS = {
+    '0': 'black', '1': 'dark_blue', '2': 'dark_green', '3': 'dark_aqua',
+    '4': 'dark_red', '5': 'dark_purple', '6': 'gold', '7': 'gray',
+    '8': 'dark_gray', '9': 'blue', 'a': 'green', 'b': 'aqua',
+    'c': 'red', 'd': 'light_purple', 'e': 'yellow', 'f': 'white',
+}
+_FORMAT_STYLES = {'k': 'obfuscated', 'l': 'bold', 'm': 'strikethrough', 'n': 'underlined', 'o': 'italic'}
+# 成对的Markdown强调标记对应的样式，||剧透|| 以乱码显示、悬停查看原文
+_EMPHASIS = {
+    'bold': 'bold',
+    'underline': 'underlined',
+    'strike': 'strikethrough',
+    'italic': 'italic',
+    'italic_u': 'italic',
+}
+# emoji只匹配补充平面中的表情区块（麻将牌、扑克牌、带圈字母数字至符号与象形文字扩展-A），
+# 同在补充平面的中日韩统一表意文字扩展B及以后的汉字原样保留；joiner为零宽连接符、变体选择符与旗帜标签字符
+_MARKUP_PATTERN = re.compile(
+    r'\\(?P<escaped>[\\*_~|`\[\]])'
+    r'|\[(?P<label>[^\]\n]+)\]\((?P<href>https?://[^\s)]+)\)'
+    r'|(?P<url>https?://[^\s<>"]+)'
+    r'|`(?P<code>[^`\n]+)`'
+    r'|<a?:(?P<custom_emoji>\w{2,32}):\d+>'
+    r'|§(?P<format>[0-9a-fk-or]?)'
+    r'|\*\*(?P<bold>.+?)\*\*'
+    r'|__(?P<underline>.+?)__'
+    r'|~~(?P<strike>.+?)~~'
+    r'|\|\|(?P<spoiler>.+?)\|\|'
+    r'|\*(?P<italic>[^\s*](?:[^*]*?[^\s*])?)\*'
+    r'|(?<!\w)_(?P<italic_u>[^\s_](?:[^_]*?[^\s_])?)_(?!\w)'
+    r'|(?P<flag>[\U0001F1E6-\U0001F1FF]{2})'
+    r'|(?P<emoji>[\U0001F000-\U0001FAFF])'
+    r'|(?P<joiner>[\u200d\ufe0f\U000E0020-\U000E007F])',
+    re.IGNORECASE
+)
+# 网址末尾通常属于句子而不是链接的标点
+_URL_TRAILING = '.,;:!?\'"'
+
+
+class Span:
+    """一段样式相同的文本"""
+    __slots__ = ('text', 'color', 'styles', 'url', 'hover')
+
+    def __init__(self, text: str, color: Optional[str] = None, styles: FrozenSet[str] = frozenset(),
+                 url: Optional[str] = None, hover: Optional[str] = None):
+        self.text = text
+        self.color = color
+        self.styles = styles
+        self.url = url
+        self.hover = hover
+
+    def plain(self) -> bool:
+        """不带任何样式和事件，可以与提及高亮拆分"""
+        return self.color is None and not self.styles and self.url is None and self.hover is None
+
+    def to_rtext(self) -> RTextBase:
+        text = RText(
+            self.text,
+            color=getattr(RColor, self.color) if self.color else None,
+            styles=[getattr(RStyle, style) for style in self.styles] or None
+        )
+        if self.url:
+            text.c(RAction.open_url, self.url)
+        if self.hover:
+            text.h(self.hover)
+        return text
+
+
+class RenderedLine:
+    """一行消息的解析结果；components为不含提及高亮时可直接复用的文本组件"""
+    __slots__ = ('spans', '_components')
+
+    def __init__(self, spans: Tuple[Span, ...]):
+        self.spans = spans
+        self._components: Optional[List[RTextBase]] = None
+
+    @property
+    def components(self) -> List[RTextBase]:
+        if self._components is None:
+            self._components = [span.to_rtext() for span in self.spans]
+        return self._components
+
+
+class RenderCache:
+    """线程安全的有界LRU"""
+
+    def __init__(self, capacity: int):
+        self._capacity = max(0, capacity)
+        self._entries: 'OrderedDict[Hashable, Any]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Any:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key: Hashable, value: Any):
+        if not self._capacity:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self._capacity:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def emoji_name(chars: str) -> str:
+    """把Minecraft字体无法显示的表情转为 :名称:，国旗（区域指示符对）转为 :flag_xx:"""
+    if len(chars) == 2:
+        return ':flag_' + ''.join(chr(ord(ch) - 0x1F1E6 + ord('a')) for ch in chars) + ':'
+    name = unicodedata.name(chars, '')
+    if not name or name.startswith('EMOJI MODIFIER'):
+        return ''
+    return ':' + name.lower().replace(' ', '_') + ':'
+
+
+class RichTextRenderer:
+    """入站聊天的富文本渲染"""
+
+    def __init__(self, config):
+        self.config = config
+        self.cache = RenderCache(config.chat_render_cache_size)
+
+    def source_color(self, source: str) -> str:
+        """来源的显示颜色：优先使用配置，否则按名称稳定地散列到调色板"""
+        color = self.config.chat_source_colors.get(source)
+        if color and hasattr(RColor, color):
+            return color
+        return _SOURCE_PALETTE[zlib.crc32(source.encode('utf-8')) % len(_SOURCE_PALETTE)]
+
+    def render_prefix(self, source: str, sender: str) -> RTextBase:
+        """渲染 <[来源] 发送者> 前缀，来源部分着色并在悬停时显示来源平台"""
+        key = ('prefix', source, sender)
+        prefix = self.cache.get(key)
+        if prefix is None:
+            sender = self.strip_formatting(sender)
+            if source:
+                prefix = RTextList(
+                    '<',
+                    RText(f'[{source}]', color=getattr(RColor, self.source_color(source)))
+                    .h(f'来自 {source}\n发送者: {sender}'),
+                    f' {sender}> '
+                )
+            else:
+                prefix = RText(f'<{sender}> ')
+            self.cache.put(key, prefix)
+        return prefix
+
+    def render_line(self, text: str) -> RenderedLine:
+        """解析一行消息，结果按原文缓存"""
+        key = ('line', text)
+        line = self.cache.get(key)
+        if line is None:
+            spans: List[Span] = []
+            self._render(text, None, frozenset(), spans)
+            line = RenderedLine(tuple(_merge(spans)))
+            self.cache.put(key, line)
+        return line
+
+    def strip_formatting(self, text: str) -> str:
+        """去除§格式代码，允许格式代码时原样返回"""
+        if self.config.chat_format_codes:
+            return text
+        return re.sub(r'§[0-9a-fk-or]?', '', text, flags=re.IGNORECASE)
+
+    def get_stats(self) -> Dict[str, int]:
+        return {'cached': len(self.cache), 'hits': self.cache.hits, 'misses': self.cache.misses}
+
+    def _render(self, text: str, color: Optional[str], styles: FrozenSet[str], out: List[Span]):
+        cursor = 0
+        for match in _MARKUP_PATTERN.finditer(text):
+            start, end = match.span()
+            if start > cursor:
+                out.append(Span(text[cursor:start], color, styles))
+            cursor = end
+            kind = match.lastgroup
+            value = match.group(kind)
+            if kind == 'escaped':
+                out.append(Span(value, color, styles))
+            elif kind == 'href':
+                out.append(Span(match.group('label'), 'blue', styles | {'underlined'}, value, value))
+            elif kind == 'url':
+                url = value.rstrip(_URL_TRAILING)
+                if url.endswith(')') and '(' not in url:
+                    url = url[:-1]
+                cursor = start + len(url)
+                out.append(Span(url, 'blue', styles | {'underlined'}, url, url))
+            elif kind == 'code':
+                out.append(Span(value, 'gray', styles))
+            elif kind == 'custom_emoji':
+                out.append(Span(f':{value}:', 'gold', styles))
+            elif kind == 'format':
+                if not self.config.chat_format_codes or not value:
+                    continue
+                code = value.lower()
+                if code in _FORMAT_COLORS:
+                    color, styles = _FORMAT_COLORS[code], frozenset()
+                elif code == 'r':
+                    color, styles = None, frozenset()
+                else:
+                    styles = styles | {_FORMAT_STYLES[code]}
+            elif kind == 'spoiler':
+                out.append(Span(value, color, styles | {'obfuscated'}, hover=value))
+            elif kind in ('flag', 'emoji'):
+                name = emoji_name(value)
+                if name:
+                    out.append(Span(name, 'gold', styles))
+            elif kind == 'joiner':
+                continue
+            else:
+                self._render(value, color, styles | {_EMPHASIS[kind]}, out)
+        if cursor < len(text):
+            out.append(Span(text[cursor:], color, styles))
+
+
+def _merge(spans: List[Span]) -> List[Span]:
+    """合并相邻的同样式片段，减少组件数量"""
+    merged: List[Span] = []
+    for span in spans:
+        if not span.text:
+            continue
+        last = merged[-1] if merged else None
+        if (last is not None and last.color == span.color and last.styles == span.styles
+                and last.url is None and span.url is None and last.hover is None and span.hover is None):
+            merged[-1] = Span(last.text + span.text, last.color, last.styles)
+        else:
+            merged.append(span)
+    return merged
@@ -1,17 +1,110 @@
-import websocket
-import threading
-import json
-import os
 import time
-import uuid
+
+from .outbound_queue import (
+    PRIORITY_CHAT,
+    PRIORITY_COMMAND_RESULT,
+    PRIORITY_CONTROL,
+    PRIORITY_LIFECYCLE,
+)
+from .chat_delivery import ChatDelivery
+from .clock_sync import ClockEstimator, parse_timestamp
+from .command_capture import CommandOutputCapture
+from .command_policy import CommandPolicy
+from .connector import Connector
+from .message import Body, Envelope, build_message, sniff_type
+from .presence import PresenceTracker
+from .relay_channel import RelayChannel, resolve_relay_socket
+from .ws_channel import WebSocketChannel
+from grunichatmcdr.state.message_trace import message_trace
+from grunichatmcdr.state.player_index import player_index
+from grunichatmcdr.state.plugin_state import plugin_state
+from grunichatmcdr.state.presence_roster import presence_roster
+from grunichatmcdr.state.rate_stats import rate_stats
+
+# 未指定优先级时按消息类型推断
+_DEFAULT_PRIORITIES = {
+    'hello': PRIORITY_CONTROL,
+    'ack': PRIORITY_CONTROL,
+    'command_result': PRIORITY_COMMAND_RESULT,
+    'event': PRIORITY_LIFECYCLE,
+    'chat': PRIORITY_CHAT,
+    'presence': PRIORITY_LIFECYCLE,
+}
+
+# on_message会处理的入站消息类型，其它类型的帧在完整解析前丢弃
+_HANDLED_TYPES = frozenset(('ack', 'error', 'chat', 'command', 'event', 'presence'))
+# 调试日志中原始帧的最大长度
+_DEBUG_PREVIEW_CHARS = 200
+
+# 不带body的入站消息共用的空消息体
+_EMPTY_BODY = Body()
 
 class WebSocketService:
     def __init__(self, server, config):
         self.server = server
         self.config = config
-        self.ws = None
-        self.thread = None
         self.running = False
+        # 创建后即接受消息，首次连接建立前的消息缓冲在出站队列中；停止或优雅关闭开始后不再接受
+        self.accepting = True
+        # 各通道共用的连接器，DNS缓存、TLS会话和备用套接字在重连之间保留
+        self.connector = Connector(
+            server.logger,
+            dns_ttl=config.dns_cache_ttl,
+            tls_session_reuse=config.tls_session_reuse,
+            standby=config.standby_socket,
+            standby_max_age=config.standby_max_age
+        )
+        # 控制通道承载命令、确认和生命周期事件；双通道模式下聊天与普通事件走独立的批量通道
+        # 中继模式下只经由本地中继的一条通道收发，上游连接由中继持有
+        if config.relay_mode in ('client', 'host'):
+            self.control = RelayChannel(self, 'relay', resolve_relay_socket(server, config))
+            self.bulk = None
+        else:
+            self.control = WebSocketChannel(self, 'control', lambda: self.config.ws_url)
+            self.bulk = WebSocketChannel(self, 'bulk', lambda: self.config.bulk_ws_url or self.config.ws_url) \
+                if config.dual_channel else None
+        # 远程命令的输出捕获，完成后以command_result回复
+        self.command_capture = CommandOutputCapture(
+            self._send_command_result,
+            server.logger,
+            timeout=config.command_result_timeout,
+            idle=config.command_result_idle,
+            max_chars=config.command_result_max_chars,
+            end_pattern=config.command_result_end_pattern
+        ) if config.command_result_enabled else None
+        # 远程命令的按来源授权，同时执行数以等待输出捕获的命令计
+        self.command_policy = CommandPolicy(
+            config,
+            server.logger,
+            self.command_capture.pending_count if self.command_capture else None
+        )
+        # 入站聊天的@提及与私信投递
+        self.chat_delivery = ChatDelivery(server, config, player_index)
+        # 广播器时钟偏差估计，用于换算单向延迟
+        self.clock = ClockEstimator()
+        # 跨服在线名单的发布与接收
+        self.presence = PresenceTracker(self, presence_roster) if config.presence_enabled else None
+        # 入站帧的拒绝计数
+        self.inbound_rejects = {'oversized_frame': 0, 'oversized_field': 0, 'ignored': 0, 'malformed': 0}
+
+    @property
+    def ws(self):
+        """控制通道的WebSocketApp"""
+        return self.control.ws
+
+    @property
+    def thread(self):
+        """控制通道的读线程"""
+        return self.control.thread
+
+    def _channels(self):
+        return [self.control, self.bulk] if self.bulk else [self.control]
+
+    def _channel_for(self, priority):
+        """按优先级选择通道"""
+        if self.bulk and priority >= PRIORITY_CHAT:
+            return self.bulk
+        return self.control
 
     def _strip_prefix(self, text, prefix_source):
         """去掉消息内容中的前缀"""
@@ -23,81 +116,208 @@ class WebSocketService:
 
     def _create_message(self, msg_type, sender="", chat_message="", command="", event_detail=""):
         """创建标准格式的WebSocket消息"""
-        # 只为非chat消息的内容添加plugin_id前缀
-        if msg_type != 'chat':
-            if command:
-                command = f"[{self.config.plugin_id}] {command}"
-            if event_detail:
-                event_detail = f"[{self.config.plugin_id}] {event_detail}"
-            if sender:
-                sender = f"[{self.config.plugin_id}] {sender}"
-            
-        return {
-            "from": self.config.plugin_id,
-            "type": msg_type,
-            "body": {
-                "sender": sender,
-                "chatMessage": chat_message,
-                "command": command,
-                "eventDetail": event_detail
-            },
-            "totalId": str(uuid.uuid4()),
-            "currentTime": str(int(time.time() * 1000))
-        }
+        return build_message(self.config.plugin_id, msg_type, sender, chat_message, command, event_detail)
 
-    def send_message(self, msg_type, sender="", chat_message="", command="", event_detail=""):
-        """发送标准格式的WebSocket消息"""
-        if self.ws and self.ws.sock and self.ws.sock.connected:
-            try:
-                msg = self._create_message(msg_type, sender, chat_message, command, event_detail)
-                self.ws.send(json.dumps(msg))
-                
-                # 调试级别的详细日志
-                self.server.logger.debug(f"[{self.config.plugin_id}] WebSocket发送消息: {msg}")
-                
-                # 简化的INFO级别日志
-                if msg_type == 'chat':
-                    self.server.logger.info(f"[{self.config.plugin_id}] WebSocket转发聊天: <{sender}> {chat_message}")
-                elif msg_type == 'event':
-                    self.server.logger.info(f"[{self.config.plugin_id}] WebSocket转发事件: {event_detail}")
-                elif msg_type == 'command':
-                    self.server.logger.info(f"[{self.config.plugin_id}] WebSocket转发命令: {command}")
-                # 对于其他消息类型（如hello），不输出INFO级别日志
-                
-                return True
-            except Exception as e:
-                self.server.logger.error(f"[{self.config.plugin_id}] WebSocket发送消息失败: {e}")
-                return False
+    def is_connected(self):
+        """检查WebSocket连接状态"""
+        return self.control.is_connected()
+
+    def can_send(self):
+        """连接已建立，或尚未完成首次连接（消息缓冲到连接建立后发出）"""
+        return self.accepting and (self.control.is_connected() or not self.control.has_connected)
+
+    def send_message(self, msg_type, sender="", chat_message="", command="", event_detail="", priority=None, trace=None):
+        """将标准格式的WebSocket消息放入出站队列，由写线程按优先级发送"""
+        return self.send_envelope(self._create_message(msg_type, sender, chat_message, command, event_detail),
+                                  priority, trace)
+
+    def send_envelope(self, msg, priority=None, trace=None):
+        """将已构造好的消息放入出站队列"""
+        if priority is None:
+            priority = _DEFAULT_PRIORITIES.get(msg.type, PRIORITY_LIFECYCLE)
+        if trace is not None:
+            message_trace.bind(trace, msg.total_id)
+            message_trace.mark(trace, 'encoded')
+        return self._enqueue(msg, priority, trace)
+
+    def _enqueue(self, msg, priority, trace=None):
+        """按优先级选择通道并放入出站队列"""
+        if not self.accepting:
+            self.server.logger.debug(f"[{self.config.plugin_id}] WebSocket服务正在关闭，消息未发送")
+            return False
+        channel = self._channel_for(priority)
+        if not channel.is_connected() and channel.has_connected:
+            self.server.logger.debug(f"[{self.config.plugin_id}] WebSocket[{channel.name}]未连接，消息未发送")
+            return False
+
+        if not channel.put(priority, msg):
+            self.server.logger.debug(f"[{self.config.plugin_id}] 出站队列过载，消息已丢弃: {msg.total_id}")
+            return False
+        message_trace.mark(trace, 'enqueued')
+        return True
+
+    def _authorize_command(self, source, total_id, command):
+        """按来源策略检查远程命令并记入审计日志，通过时返回应执行的命令，拒绝时按配置回复来源并返回None"""
+        decision = self.command_policy.check(source, command)
+        plugin_state.record_audit(source, total_id, command, decision.allowed, decision.reason)
+        if decision.allowed:
+            return decision.command
+        self.server.logger.warning(f"[{self.config.plugin_id}] 拒绝来自 {source} 的指令({decision.reason}): {command}")
+        if self.config.command_deny_reply and total_id:
+            msg = self._create_message('command_result', source, command=command,
+                                       event_detail=f'command denied: {decision.reason}')
+            msg.total_id = total_id
+            msg.extra = {"status": "denied", "reason": decision.reason, "truncated": False, "elapsed": 0}
+            self._enqueue(msg, PRIORITY_COMMAND_RESULT)
+        return None
+
+    def _execute_command(self, source, total_id, command):
+        """执行已授权的远程命令"""
+        self.server.logger.info(f"[{self.config.plugin_id}] 收到WebSocket指令: {command}")
+        # 先登记输出捕获再执行，避免漏掉紧随其后的输出；停止后仍在读取的通道不再登记，以免重新拉起捕获线程
+        if self.command_capture and total_id and self.running:
+            self.command_capture.begin(total_id, command, source)
+
+        if command.startswith('!!'):
+            self.server.execute_command(command)
+        elif command.startswith('/'):
+            self.server.execute(command[1:])
         else:
-            self.server.logger.debug(f"[{self.config.plugin_id}] WebSocket未连接，消息未发送")
+            self.server.execute_command(command)
+        self.server.logger.info(f"[{self.config.plugin_id}] 处理WebSocket指令: {command}")
+
+    def get_command_stats(self):
+        return self.command_policy.get_stats()
+
+    def feed_console_line(self, line):
+        """将服务端控制台输出送入命令输出捕获"""
+        if self.command_capture and self.command_capture.has_pending():
+            self.command_capture.feed(line)
+
+    def _send_command_result(self, capture):
+        """发送与原命令totalId关联的command_result消息"""
+        msg = self._create_message('command_result', capture.source, command=capture.command, event_detail=capture.output)
+        msg.total_id = capture.total_id
+        msg.extra = {
+            "status": capture.status,
+            "truncated": capture.truncated,
+            "elapsed": int((time.monotonic() - capture.started) * 1000),
+        }
+        if self._enqueue(msg, PRIORITY_COMMAND_RESULT):
+            self.server.logger.info(f"[{self.config.plugin_id}] 命令结果已回复 [ID: {capture.total_id}]: {capture.command} ({capture.status})")
+
+    def get_queue_stats(self):
+        """获取出站队列各优先级的统计（双通道模式下合并两条通道）"""
+        merged = {}
+        for channel in self._channels():
+            for name, queue_stats in channel.outbox.get_stats().items():
+                target = merged.setdefault(name, {'queued': 0, 'enqueued': 0, 'dropped': 0})
+                for key, value in queue_stats.items():
+                    target[key] += value
+        return merged
+
+    def get_channel_health(self):
+        """获取各通道的健康状态"""
+        return {channel.name: channel.get_health() for channel in self._channels()}
+
+    def write_message(self, ws, msg):
+        """在通道写线程中实际发送一条消息"""
+        msg_type = msg.type
+        body = msg.body
+        try:
+            ws.send(msg.to_json())
+        except Exception as e:
+            self.server.logger.error(f"[{self.config.plugin_id}] WebSocket发送消息失败: {e}")
             return False
 
-    def on_message(self, _, message):
+        # 调试级别的详细日志
+        self.server.logger.debug(f"[{self.config.plugin_id}] WebSocket发送消息: {msg}")
+
+        # 简化的INFO级别日志
+        if msg_type == 'chat':
+            self.server.logger.info(f"[{self.config.plugin_id}] WebSocket转发聊天: <{body.sender}> {body.chat_message}")
+        elif msg_type == 'event':
+            self.server.logger.info(f"[{self.config.plugin_id}] WebSocket转发事件: {body.event_detail}")
+        elif msg_type == 'command':
+            self.server.logger.info(f"[{self.config.plugin_id}] WebSocket转发命令: {body.command}")
+        # 对于其他消息类型（如hello），不输出INFO级别日志
+        return True
+
+    def reject_inbound(self, reason, detail=''):
+        """记录一次入站帧拒绝"""
+        self.inbound_rejects[reason] += 1
+        self.server.logger.debug(f"[{self.config.plugin_id}] 丢弃入站消息({reason}) {detail}")
+
+    def get_inbound_stats(self):
+        """入站帧拒绝计数与聊天拆分/截断计数"""
+        stats = dict(self.inbound_rejects)
+        stats['split'] = self.chat_delivery.split
+        stats['truncated'] = self.chat_delivery.truncated
+        renderer = self.chat_delivery.renderer
+        stats['render'] = renderer.get_stats() if renderer else None
+        return stats
+
+    def on_message(self, _, message, channel=None):
         try:
             if not isinstance(message, str) or not message.strip():
                 return  # 忽略空消息或非字符串消息
             
+            # 在解析前拒绝超长帧，并按type快速丢弃不处理的消息
+            if len(message) > self.config.inbound_max_frame_size:
+                self.reject_inbound('oversized_frame', f"{len(message)}字符")
+                return
+            sniffed_type = sniff_type(message)
+            if sniffed_type is not None and sniffed_type not in _HANDLED_TYPES:
+                rate_stats.record('in', sniffed_type)
+                self.reject_inbound('ignored', sniffed_type)
+                return
+            
             # 调试级别的详细日志
-            self.server.logger.debug(f"[{self.config.plugin_id}] 收到WebSocket原始消息: {message}")
+            self.server.logger.debug(f"[{self.config.plugin_id}] 收到WebSocket原始消息: {message[:_DEBUG_PREVIEW_CHARS]}")
             
-            data = json.loads(message)
-            self.server.logger.debug(f"[{self.config.plugin_id}] 解析后的消息数据: {data}")
+            try:
+                envelope = Envelope.from_json(message)
+            except ValueError as e:
+                self.reject_inbound('malformed', str(e))
+                return
             
+
             # 适配新协议格式
-            from_source = data.get('from', '')
-            msg_type = data.get('type', '')
-            body = data.get('body', {})
-            total_id = data.get('totalId', '')
-            current_time = data.get('currentTime', '')
+            from_source = envelope.source
+            msg_type = envelope.type
+            body = envelope.body or _EMPTY_BODY
+            total_id = envelope.total_id
             
             self.server.logger.debug(f"[{self.config.plugin_id}] 消息来源: {from_source}, 类型: {msg_type}, 本插件ID: {self.config.plugin_id}")
+            rate_stats.record('in', msg_type or 'unknown')
+            
+            if msg_type in ('chat', 'command', 'event'):
+                self._observe_downlink(envelope)
+            
+            # 流量控制：对端通过window字段声明可接受的未确认消息数
+            window = envelope.get('window')
+            if self.config.flow_control and channel and window is not None:
+                channel.credit.update_window(window)
             
             # 处理确认消息（ack）
             if msg_type == 'ack':
-                status = data.get('status', '')
-                message_text = data.get('message', '')
-                timestamp = data.get('timestamp', '')
-                total_id = data.get('totalId', '')
+                status = envelope.get('status', '')
+                message_text = envelope.get('message', '')
+                
+                message_trace.mark_id(total_id, 'acked')
+                
+                # 无论成功与否都归还发送额度；hello与时钟探测的确认只用于时钟估计
+                for ack_channel in self._channels():
+                    sent = ack_channel.credit.release(total_id)
+                    if sent is not None:
+                        rate_stats.observe('ack', (time.monotonic() - sent) * 1000)
+                        if ack_channel.ack_clock_samples:
+                            self._sample_clock(envelope, sent, per_message=True)
+                        break
+                    sent = ack_channel.take_probe(total_id)
+                    if sent is not None:
+                        self._sample_clock(envelope, sent, per_message=False)
+                        return
                 
                 if status == 'success':
                     # 成功时静默处理，不输出日志
@@ -109,103 +329,145 @@ class WebSocketService:
             
             # 处理错误消息（error）
             elif msg_type == 'error':
-                error_msg = data.get('error', '')
-                error_code = data.get('code', 0)
-                timestamp = data.get('timestamp', '')
-                total_id = data.get('totalId', '')
+                error_msg = envelope.get('error', '')
+                error_code = envelope.get('code', 0)
+                
+                # 对应的消息不会再被确认：归还发送额度并计为失败
+                for error_channel in self._channels():
+                    error_channel.credit.release(total_id)
+                plugin_state.increment_messages_failed()
                 
                 self.server.logger.error(f"[{self.config.plugin_id}] WebSocket错误 [ID: {total_id}, Code: {error_code}]: {error_msg}")
                 return  # 处理完错误消息后直接返回
             
             # 聊天消息
-            elif msg_type == 'chat' and body.get('chatMessage'):
-                sender = body.get('sender', '未知')
-                chat_msg = body['chatMessage']
+            elif msg_type == 'chat' and body.chat_message:
+                sender = body.sender or '未知'
+                chat_msg = self._limit_field(body.chat_message, 'chatMessage')
+                plugin_state.record_history('in', from_source, sender, 'chat', chat_msg)
                 self.server.logger.info(f"[{self.config.plugin_id}] 准备say: <{sender}> {chat_msg}")
                 try:
                     # 在转发到Minecraft时，在sender前面加上消息来源的plugin_id前缀
                     display_sender = f"[{from_source}] {sender}" if from_source else sender
-                    self.server.say(f"<{display_sender}> {chat_msg}")
-                    self.server.logger.info(f"[{self.config.plugin_id}] 已执行say: <{display_sender}> {chat_msg}")
+                    mode = self.chat_delivery.deliver(from_source, sender, chat_msg)
+                    self.server.logger.info(f"[{self.config.plugin_id}] 已执行say({mode}): <{display_sender}> {chat_msg}")
                 except Exception as say_e:
                     self.server.logger.error(f"[{self.config.plugin_id}] 执行say失败: {say_e}")
             # 指令消息
-            elif msg_type == 'command' and body.get('command'):
-                command = body['command']
-                self.server.logger.info(f"[{self.config.plugin_id}] 收到WebSocket指令: {command}")
-                # 去掉来源前缀，得到实际的命令
-                actual_command = self._strip_prefix(command, from_source)
-                
-                if actual_command.startswith('!!'):
-                    self.server.execute_command(actual_command)
-                elif actual_command.startswith('/'):
-                    self.server.execute(actual_command[1:])
-                else:
-                    self.server.execute_command(actual_command)
-                self.server.logger.info(f"[{self.config.plugin_id}] 处理WebSocket指令: {actual_command}")
+            elif msg_type == 'command' and body.command and \
+                    self._limit_field(body.command, 'command', truncate=False) is not None:
+                # 去掉来源前缀后授权；启用授权时执行的是检查过的规范形式，而不是原始文本
+                actual_command = self._authorize_command(
+                    from_source, total_id, self._strip_prefix(body.command, from_source)
+                )
+                if actual_command is not None:
+                    self._execute_command(from_source, total_id, actual_command)
             # 事件消息
-            elif msg_type == 'event' and body.get('eventDetail'):
-                event_detail = body['eventDetail']
+            elif msg_type == 'event' and body.event_detail:
+                event_detail = self._limit_field(body.event_detail, 'eventDetail')
+                plugin_state.record_history('in', from_source, body.sender, 'event', event_detail)
                 self.server.logger.info(f"[{self.config.plugin_id}] 收到事件: {event_detail}")
+            # 其它服务器的在线名单
+            elif msg_type == 'presence' and self.presence:
+                self.presence.handle(envelope)
             # 其它类型可扩展
+            
+            # 流量控制模式下处理完毕即确认，为对端补充额度
+            if self.config.flow_control and channel and total_id and msg_type in ('chat', 'command', 'event', 'presence'):
+                channel.send_ack(total_id, self.config.flow_window)
         except Exception as e:
             self.server.logger.error(f"[{self.config.plugin_id}] WebSocket消息处理异常: {e}")
 
-    def on_error(self, wsapp, error):
-        self.server.logger.error(f"[{self.config.plugin_id}] WebSocket错误: {error}")
-
-    def on_close(self, wsapp, close_status_code, close_msg):
-        self.server.logger.info(f"[{self.config.plugin_id}] WebSocket连接关闭 code={close_status_code}, msg={close_msg}")
-
-    def on_open(self, wsapp):
-        self.server.logger.info(f"[{self.config.plugin_id}] WebSocket连接已建立")
-        hello_msg = json.dumps({
-            "from": self.config.plugin_id,
-            "type": "hello",
-            "body": {
-                "sender": self.config.plugin_id,
-                "chatMessage": "",
-                "command": "",
-                "eventDetail": f"[{self.config.plugin_id}] Plugin {self.config.plugin_id} connected"
-            },
-            "totalId": str(uuid.uuid4()),
-            "currentTime": str(int(time.time() * 1000))
-        })
-        wsapp.send(hello_msg)
+    def _sample_clock(self, ack, sent, per_message):
+        """由一条ack计算时钟样本；receiveTime为广播器收到消息的时刻，缺省时与timestamp相同
+        per_message为True时同时记录该消息校正后的上行（插件→广播器）与下行（广播器→插件）单向延迟"""
+        t2 = parse_timestamp(ack.get('timestamp'))
+        if t2 is None:
+            return
+        t1 = parse_timestamp(ack.get('receiveTime'))
+        if t1 is None:
+            t1 = t2
+        # 发送时刻记录的是单调时钟，按经过的时间换算到本地墙上时间
+        t3 = time.time() * 1000
+        t0 = t3 - (time.monotonic() - sent) * 1000
+        self.clock.add_sample(t0, t1, t2, t3)
+        if per_message and self.clock.ready:
+            rate_stats.observe('uplink', max(0.0, self.clock.to_local(t1) - t0))
+            rate_stats.observe('downlink', max(0.0, t3 - self.clock.to_local(t2)))
+
+    def _observe_downlink(self, envelope):
+        """广播器转发消息时附带的timestamp为其发出时刻，换算后得到该消息的下行延迟"""
+        sent = parse_timestamp(envelope.get('timestamp'))
+        if sent is not None and self.clock.ready:
+            rate_stats.observe('downlink', max(0.0, time.time() * 1000 - self.clock.to_local(sent)))
+
+    def get_clock_stats(self):
+        return self.clock.get_stats()
+
+    def get_presence_stats(self):
+        return self.presence.get_stats() if self.presence else None
+
+    def _limit_field(self, value, field, truncate=True):
+        """检查字段长度，超长时截断（truncate=False时拒绝并返回None）"""
+        limit = self.config.inbound_max_field_size
+        if len(value) <= limit:
+            return value
+        self.reject_inbound('oversized_field', f"{field}: {len(value)}字符")
+        return value[:limit] if truncate else None
+
+    def build_hello(self, channel_name):
+        """构造连接握手消息，双通道模式下附带通道名供广播器区分"""
+        plugin_id = self.config.plugin_id
+        hello = Envelope.create(plugin_id, "hello", Body(
+            sender=plugin_id,
+            event_detail=f"[{plugin_id}] Plugin {plugin_id} connected"
+        ))
+        if self.bulk:
+            hello.set("channel", channel_name)
+        if self.config.flow_control:
+            hello.set("window", self.config.flow_window)
+        return hello
 
     def start(self):
         self.running = True
-        def run():
-            try:
-                self.server.logger.debug(f'[{self.config.plugin_id}] 尝试连接WebSocket: {self.config.ws_url}')
-                self.server.logger.debug(f'[{self.config.plugin_id}] 配置对象类型: {type(self.config)}')
-                self.server.logger.debug(f'[{self.config.plugin_id}] 配置ws_url属性: {getattr(self.config, "ws_url", "属性不存在")}')
-                self.ws = websocket.WebSocketApp(
-                    self.config.ws_url,
-                    on_message=self.on_message,
-                    on_error=self.on_error,
-                    on_close=self.on_close,
-                    on_open=self.on_open
-                )
-                self.ws.server = self.server
-                self.ws.run_forever()
-            except Exception as e:
-                self.server.logger.error(f"[{self.config.plugin_id}] WebSocket线程异常: {e}")
-        self.thread = threading.Thread(target=run, daemon=True)
-        self.thread.start()
-
-    def stop(self):
+        self.accepting = True
+        for channel in self._channels():
+            channel.start()
+
+    def stop(self, keep_standby=False):
+        """停止所有通道；重连时保留备用套接字以便立即提升"""
         self.running = False
-        if self.ws:
-            try:
-                self.ws.close()
-            except Exception as e:
-                self.server.logger.error(f"[{self.config.plugin_id}] WebSocket关闭异常: {e}")
-            self.ws = None
+        self.accepting = False
+        if self.command_capture:
+            self.command_capture.stop()
+        for channel in self._channels():
+            channel.stop()
+        if not keep_standby:
+            self.connector.close()
+
+    def flush(self, timeout):
+        """等待各通道发出已排队的消息并收到确认，返回是否在超时前完成"""
+        deadline = time.monotonic() + timeout
+        return all([channel.drain(deadline) for channel in self._channels()])
+
+    def shutdown(self, timeout):
+        """优雅关闭：停止接受新消息，在timeout秒内排空队列、等待确认、发送关闭帧并等待线程退出
+        返回各通道的关闭报告，超时未发出的消息计入dropped"""
+        deadline = time.monotonic() + timeout
+        self.accepting = False
+        self.running = False
+        if self.command_capture:
+            self.command_capture.stop()
+        report = {channel.name: channel.shutdown(deadline) for channel in self._channels()}
+        self.connector.close()
+        return report
+
+    def get_connector_stats(self):
+        return self.connector.get_stats()
 
     def reconnect(self, src=None):
         self.server.logger.info(f"[{self.config.plugin_id}] WebSocket正在重连...")
-        self.stop()
+        self.stop(keep_standby=True)
         self.start()
         if src:
             src.reply("§a[GRUniChat] 正在断开并重新连接...")
@@ -218,13 +480,16 @@ class WebSocketService:
     def connect(self, src, url):
         self.stop()
         self.config.ws_url = url
+        # 新的广播器时钟与之前的估计无关，其它服务器的名单在新连接上重新获取
+        self.clock.reset()
+        presence_roster.clear()
         self.start()
         src.reply(f"§a[GRUniChat] 正在连接到: {url}")
 
     def rename(self, src, new_id, server=None):
         old_id = self.config.plugin_id
         self.config.plugin_id = new_id
-        self.stop()
+        self.stop(keep_standby=True)
         self.start()
         
         # 使用传入的server或使用实例的server来保存配置
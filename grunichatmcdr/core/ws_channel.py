@@ -0,0 +1,392 @@
+"""
+WebSocket通道模块
+每个通道持有独立的WebSocketApp、读线程、写线程、出站队列和健康状态
+"""
+import socket
+import threading
+import time
+
+from .flow_control import CreditWindow
+from .message import Envelope
+from .outbound_queue import OutboundQueue
+from grunichatmcdr.state.message_trace import message_trace
+from grunichatmcdr.state.rate_stats import rate_stats
+
+# 不占用发送额度的消息类型
+_CREDIT_FREE_TYPES = ('ack', 'hello')
+# 优雅关闭时检查队列与确认状态的间隔（秒）
+_DRAIN_POLL = 0.02
+# 截止时刻已过时仍给读写线程留出的退出时间（秒），关闭连接后线程通常立即退出
+_JOIN_GRACE = 0.2
+# 立即停止（断开、重连）时等待读写线程退出的最长时间（秒）
+_STOP_JOIN_TIMEOUT = 1.0
+# 启用备用套接字时断线自动重连的退避区间（秒）
+_RETRY_MIN = 1.0
+_RETRY_MAX = 30.0
+# 连接建立后先以较短间隔连续发送的时钟探测数，使偏差估计尽快收敛
+_PROBE_BURST = 4
+_PROBE_BURST_INTERVAL = 1.0
+# 等待确认的时钟探测（含hello）最多保留的条数
+_PROBE_TRACK_LIMIT = 16
+# 关闭帧的状态码（正常关闭）
+_STATUS_NORMAL = 1000
+
+
+class WebSocketChannel:
+    """单条WebSocket连接"""
+    # 对端即广播器，hello与普通消息的ack都可作为时钟样本
+    ack_clock_samples = True
+
+    def __init__(self, service, name, url_getter):
+        self.service = service
+        self.name = name
+        self._url_getter = url_getter
+        self.ws = None
+        self.thread = None
+        self.writer_thread = None
+        self.running = False
+        # 保护running与ws的切换，停止后读线程不能再登记新连接
+        self._ws_lock = threading.Lock()
+        # 每次start新建，停止时置位以打断重试等待
+        self._stopped = threading.Event()
+        self.outbox = OutboundQueue(
+            total_capacity=service.config.outbound_queue_size,
+            shed_delay=service.config.outbound_shed_delay
+        )
+        self._connected = threading.Event()
+        # 写线程已处理完（写出或失败）的消息数，与outbox.taken相等时没有正在写的消息
+        self._finished = 0
+        self.write_failures = 0
+        self.credit = CreditWindow(service.config.flow_ack_timeout)
+        # 健康状态
+        self.connected_since = None
+        self.last_error = None
+        self.disconnects = 0
+        self.last_sent = None
+        self.last_received = None
+        # 本次连接尝试开始的单调时刻，用于统计重连到首条消息发出的耗时
+        self._attempt_started = None
+        self._opened_once = False
+        # 等待确认的hello与时钟探测: totalId -> 发送时刻（单调时钟）
+        self._probes = {}
+        self._probes_lock = threading.Lock()
+        self._next_probe = 0.0
+        self._probe_burst = 0
+
+    @property
+    def logger(self):
+        return self.service.server.logger
+
+    @property
+    def plugin_id(self):
+        return self.service.config.plugin_id
+
+    def is_connected(self):
+        """检查通道连接状态"""
+        ws = self.ws
+        return bool(ws and ws.sock and ws.sock.connected)
+
+    @property
+    def has_connected(self):
+        """通道是否曾经建立过连接；首次连接前的消息留在出站队列中等待发送"""
+        return self._opened_once
+
+    def get_health(self):
+        """获取通道健康状态"""
+        now = time.time()
+        return {
+            'connected': self.is_connected(),
+            'uptime': now - self.connected_since if self.connected_since else None,
+            'last_error': self.last_error,
+            'disconnects': self.disconnects,
+            'queued': len(self.outbox),
+            'write_failures': self.write_failures,
+            'flow': self.credit.get_stats(),
+            'idle': now - max(self.last_sent or 0, self.last_received or 0) if (self.last_sent or self.last_received) else None,
+        }
+
+    def put(self, priority, msg):
+        """放入出站队列"""
+        return self.outbox.put(priority, msg)
+
+    def send_ack(self, total_id, window=None):
+        """直接在当前线程回复确认，不经过出站队列和发送额度"""
+        extra = {"status": "success", "timestamp": str(int(time.time() * 1000))}
+        if window is not None:
+            extra["window"] = window
+        ack = Envelope(self.plugin_id, "ack", total_id=total_id, extra=extra)
+        try:
+            self.ws.send(ack.to_json())
+        except Exception as e:
+            self.logger.debug(f"[{self.plugin_id}] 发送确认失败[{self.name}] [ID: {total_id}]: {e}")
+
+    def _on_message(self, wsapp, message):
+        self.last_received = time.time()
+        self.service.on_message(wsapp, message, self)
+
+    def _on_error(self, wsapp, error):
+        self.last_error = str(error)
+        self.logger.error(f"[{self.plugin_id}] WebSocket错误[{self.name}]: {error}")
+
+    def _on_close(self, wsapp, close_status_code, close_msg):
+        self._connected.clear()
+        if self.connected_since:
+            self.disconnects += 1
+        self.connected_since = None
+        self.logger.info(f"[{self.plugin_id}] WebSocket连接关闭[{self.name}] code={close_status_code}, msg={close_msg}")
+
+    def _on_open(self, wsapp):
+        if not self._owns_connection():
+            # 通道已停止或已被新的读线程接替，关闭这条迟到的连接
+            wsapp.close()
+            return
+        self.logger.info(f"[{self.plugin_id}] WebSocket连接已建立[{self.name}]")
+        self.credit.reset()
+        with self._probes_lock:
+            self._probes.clear()
+        self._next_probe = 0.0
+        self._probe_burst = 0
+        hello = self.service.build_hello(self.name)
+        if self.ack_clock_samples:
+            self._track_probe(hello.total_id)
+        wsapp.send(hello.to_json())
+        self.connected_since = time.time()
+        if self._attempt_started is not None:
+            if self._opened_once:
+                rate_stats.observe('reconnect', (time.monotonic() - self._attempt_started) * 1000)
+            self._attempt_started = None
+        self._opened_once = True
+        self._after_open(wsapp)
+        if self._ready_to_send():
+            self._connected.set()
+
+    def _ready_to_send(self):
+        """连接建立后是否可以立即开始发送"""
+        return True
+
+    def _after_open(self, wsapp):
+        """连接建立后保存TLS会话，并开始为该地址准备备用套接字"""
+        connector = self.service.connector
+        url = wsapp.url
+        if connector.applies_to(url):
+            sock = wsapp.sock.sock if wsapp.sock else None
+            connector.remember_session(url, sock)
+            connector.keep_standby(url)
+
+    def _write_loop(self):
+        """写线程：连接可用时按加权轮询从出站队列取消息发送"""
+        while self.running and self.writer_thread is threading.current_thread():
+            if not self._connected.wait(0.5):
+                continue
+            self._maybe_probe()
+            presence = self.service.presence
+            if presence and self is self.service.control:
+                presence.tick(self.connected_since)
+            # 对端额度用尽时暂停取消息
+            if not self.credit.wait_for_credit(0.5):
+                continue
+            item = self.outbox.get(timeout=0.5)
+            if item is None:
+                continue
+            try:
+                self._write(item[1])
+            finally:
+                self._finished += 1
+
+    def _track_probe(self, total_id):
+        with self._probes_lock:
+            self._probes[total_id] = time.monotonic()
+            while len(self._probes) > _PROBE_TRACK_LIMIT:
+                del self._probes[next(iter(self._probes))]
+
+    def take_probe(self, total_id):
+        """取出hello或时钟探测的发送时刻（单调时钟），不是本通道发出的探测时返回None"""
+        with self._probes_lock:
+            return self._probes.pop(total_id, None)
+
+    def _maybe_probe(self):
+        """到达探测时刻时直接发送一条probe，不经过出站队列，避免排队时间计入往返时延"""
+        interval = self.service.config.clock_probe_interval
+        now = time.monotonic()
+        if interval <= 0 or now < self._next_probe:
+            return
+        self._probe_burst += 1
+        self._next_probe = now + (_PROBE_BURST_INTERVAL if self._probe_burst < _PROBE_BURST else interval)
+        probe = Envelope.create(self.plugin_id, 'probe')
+        self._track_probe(probe.total_id)
+        try:
+            self.ws.send(probe.to_json())
+        except Exception as e:
+            self.take_probe(probe.total_id)
+            self.logger.debug(f"[{self.plugin_id}] 发送时钟探测失败[{self.name}]: {e}")
+
+    def _write(self, msg):
+        # 先占用额度再写出，避免ack先于登记到达
+        tracked = msg.type not in _CREDIT_FREE_TYPES
+        if tracked:
+            self.credit.acquire(msg.total_id)
+        if self.service.write_message(self.ws, msg):
+            message_trace.mark_id(msg.total_id, 'written')
+            self.last_sent = time.time()
+            rate_stats.record('out', msg.type, self.last_sent)
+            rate_stats.observe('queue', self.last_sent * 1000 - msg.current_time)
+        else:
+            if tracked:
+                self.credit.release(msg.total_id)
+            self.write_failures += 1
+
+    def _owns_connection(self):
+        """当前线程是否为仍在运行的通道的读线程"""
+        return self.running and self.thread is threading.current_thread()
+
+    def _attach(self, ws):
+        """登记读线程新建的连接；通道已停止或读线程已被接替时返回False，由调用方关闭连接"""
+        with self._ws_lock:
+            if not self._owns_connection():
+                return False
+            self.ws = ws
+            return True
+
+    def start(self):
+        # websocket-client只在建立WebSocket连接时导入，中继模式下不需要
+        import websocket
+
+        with self._ws_lock:
+            self.running = True
+            stopped = self._stopped = threading.Event()
+        url = self._url_getter()
+
+        connector = self.service.connector
+
+        def run():
+            delay = _RETRY_MIN
+            while self.running and self.thread is threading.current_thread():
+                self._attempt_started = time.monotonic()
+                try:
+                    self.logger.debug(f'[{self.plugin_id}] 尝试连接WebSocket[{self.name}]: {url}')
+                    # 直连地址由连接器预先建立套接字（DNS缓存、TLS会话复用、备用套接字）
+                    sock = connector.open(url) if connector.applies_to(url) else None
+                    ws = websocket.WebSocketApp(
+                        url,
+                        on_message=self._on_message,
+                        on_error=self._on_error,
+                        on_close=self._on_close,
+                        on_open=self._on_open,
+                        socket=sock
+                    )
+                    ws.server = self.service.server
+                    if not self._attach(ws):
+                        # 连接期间通道已停止
+                        if sock:
+                            sock.close()
+                        break
+                    ws.run_forever()
+                except Exception as e:
+                    self.last_error = str(e)
+                    self.logger.error(f"[{self.plugin_id}] WebSocket线程异常[{self.name}]: {e}")
+                # 未启用备用套接字时保持原有行为：断开后等待手动重连
+                if not connector.standby_enabled or not self.running:
+                    break
+                if self._attempt_started is None:
+                    # 本次连接曾经建立，立即提升备用套接字重连
+                    delay = _RETRY_MIN
+                    continue
+                if stopped.wait(delay):
+                    break
+                delay = min(delay * 2, _RETRY_MAX)
+
+        self.thread = threading.Thread(target=run, name=f'GRUniChat-ws-{self.name}-reader', daemon=True)
+        self.thread.start()
+        self.outbox.reopen()
+        self.writer_thread = threading.Thread(target=self._write_loop, name=f'GRUniChat-ws-{self.name}-writer', daemon=True)
+        self.writer_thread.start()
+
+    def drain(self, deadline):
+        """等待出站队列写完并收到全部确认，在截止时刻（单调时钟）前完成时返回True"""
+        while time.monotonic() < deadline:
+            if not self.is_connected():
+                return False
+            if not len(self.outbox) and self.outbox.taken == self._finished and not self.credit.in_flight:
+                return True
+            time.sleep(_DRAIN_POLL)
+        return False
+
+    def shutdown(self, deadline):
+        """优雅关闭：排空队列、等待确认、发送关闭帧并等待读写线程退出，返回关闭报告"""
+        drained = self.drain(deadline)
+        unacked = self.credit.in_flight
+        self._halt()
+        self.outbox.close()
+        self.credit.close()
+        if self.ws:
+            try:
+                self._close_connection(max(0.1, deadline - time.monotonic()))
+            except Exception as e:
+                self.logger.error(f"[{self.plugin_id}] WebSocket关闭异常[{self.name}]: {e}")
+        alive = self._join_threads(deadline)
+        self.ws = None
+        return {
+            'drained': drained,
+            'dropped': self.outbox.clear(),
+            'unacked': unacked,
+            'threads_alive': alive,
+        }
+
+    def _close_connection(self, timeout):
+        """发送关闭帧并在timeout内等待读线程收到对端回应后退出
+        之后对底层套接字执行shutdown唤醒仍阻塞在select上的读线程，由读线程自行关闭套接字；
+        若在读线程重新进入select前就关闭文件描述符，它会一直阻塞到select超时"""
+        ws = self.ws
+        sock = ws.sock
+        # 读线程被唤醒后据此退出，而不是按断线处理
+        ws.keep_running = False
+        thread = self.thread
+        reader_alive = bool(thread and thread.is_alive() and thread is not threading.current_thread())
+        if sock and sock.connected:
+            try:
+                sock.send_close(_STATUS_NORMAL)
+            except Exception as e:
+                self.logger.debug(f"[{self.plugin_id}] 发送关闭帧失败[{self.name}]: {e}")
+            if timeout > 0 and reader_alive:
+                thread.join(timeout)
+                reader_alive = thread.is_alive()
+        if sock and sock.sock:
+            try:
+                sock.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            if not reader_alive:
+                sock.shutdown()
+
+    def stop(self):
+        """立即停止：关闭连接并等待读写线程退出，不等待队列排空"""
+        self._halt()
+        self.outbox.close()
+        self.credit.close()
+        if self.ws:
+            try:
+                self._close_connection(0)
+            except Exception as e:
+                self.logger.error(f"[{self.plugin_id}] WebSocket关闭异常[{self.name}]: {e}")
+        alive = self._join_threads(time.monotonic() + _STOP_JOIN_TIMEOUT)
+        if alive:
+            # 通常是仍在建立连接的读线程，连接建立后会发现通道已停止并自行退出
+            self.logger.debug(f"[{self.plugin_id}] 通道[{self.name}]停止时线程尚未退出: {', '.join(alive)}")
+        self.ws = None
+
+    def _halt(self):
+        """标记通道停止并唤醒等待重试的读线程；此后读线程不会再登记新连接"""
+        with self._ws_lock:
+            self.running = False
+            self._stopped.set()
+        self._connected.clear()
+
+    def _join_threads(self, deadline):
+        """等待读写线程退出，返回截止时刻仍未退出的线程名"""
+        alive = []
+        for thread in (self.writer_thread, self.thread):
+            if thread and thread is not threading.current_thread():
+                thread.join(max(_JOIN_GRACE, deadline - time.monotonic()))
+                if thread.is_alive():
+                    alive.append(thread.name)
+        return alive
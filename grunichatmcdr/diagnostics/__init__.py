@@ -0,0 +1,6 @@
+"""
+诊断工具模块
+"""
+from .sampling_profiler import ProfileResult, SamplingProfiler
+
+__all__ = ['ProfileResult', 'SamplingProfiler']
@@ -0,0 +1,166 @@
+"""
+游戏日志事件提取基准
+对一份 latest.log（未指定时生成同样格式的合成日志）逐行运行事件提取器，统计每行耗时与识别出的事件，
+并与逐个模板做正则匹配的朴素实现对比；玩家名取自日志中的进服记录，与插件运行时的在线玩家校验一致
+
+用法: python -m grunichatmcdr.diagnostics.event_extraction_bench [--log latest.log] [--lines N] [--repeat N]
+"""
+import argparse
+import random
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+
+from grunichatmcdr.processors.game_event_extractor import GameEventExtractor, parse_template
+from grunichatmcdr.processors.vanilla_templates import (
+    ADVANCEMENT_TEMPLATES,
+    DEATH_TEMPLATES,
+    EMOTE_TEMPLATES,
+    LAG_TEMPLATES,
+    SERVER_TEMPLATES,
+)
+
+# 原版日志行首的 "[12:34:56] [Server thread/INFO]: "，新版本可能多一段 "[minecraft/DedicatedServer]"
+_LOG_PREFIX = re.compile(r'^\[[\d:]+\] \[[^\]]+\](?: \[[^\]]+\])?: ')
+_JOINED = re.compile(r'^(\S+) joined the game$')
+# 合成日志中事件行所占的比例
+_EVENT_RATIO = 0.05
+_NOISE_LINES = (
+    'Saving the game (this may take a moment!)',
+    'Saved the game',
+    'ThreadedAnvilChunkStorage: All dimensions are saved',
+    'Preparing spawn area: 83%',
+    'Done (12.345s)! For help, type "help"',
+    'Thread died',
+    'Player died',
+    'Steve lost connection: Disconnected',
+    'There are 3 of a max of 20 players online: Alex, Steve, Notch',
+    '[Rcon: Saved the game]',
+    'Mismatch in destroy block pos: BlockPos{x=12, y=64, z=-30} BlockPos{x=12, y=63, z=-30}',
+    'Named entity Wolf[\'Fido\'/123, l=\'ServerLevel[world]\', x=1.5, y=64.0, z=2.5] died: Fido was slain by Zombie',
+)
+
+
+def strip_prefix(line: str) -> str:
+    """去掉日志行首的时间与线程，得到与MCDR Info.content相同的内容"""
+    return _LOG_PREFIX.sub('', line.rstrip('\n'), count=1)
+
+
+def _all_templates() -> List[Tuple[str, str]]:
+    templates = []
+    for group in (DEATH_TEMPLATES, ADVANCEMENT_TEMPLATES, EMOTE_TEMPLATES, LAG_TEMPLATES, SERVER_TEMPLATES):
+        templates.extend(group.items())
+    return templates
+
+
+def _fill(template: str, rng: random.Random, players: List[str]) -> str:
+    args = [rng.choice(players), rng.choice(('Zombie', 'Skeleton', 'Alex', 'Diamond Sword', '2000', '40'))]
+    args += [str(rng.randrange(100)) for _ in range(4)]
+    literals, arg_order = parse_template(template)
+    parts = [literals[0]]
+    for index, literal in zip(arg_order, literals[1:]):
+        parts.append(args[index - 1])
+        parts.append(literal)
+    return ''.join(parts)
+
+
+def synthetic_log(lines: int, seed: int = 1) -> List[str]:
+    """生成latest.log格式的合成日志：玩家进出、聊天、普通服务端输出，以及按比例混入的事件"""
+    rng = random.Random(seed)
+    players = [f'Player{i}' for i in range(20)]
+    templates = _all_templates()
+    output = [f'[00:00:00] [Server thread/INFO]: {player} joined the game' for player in players]
+    for i in range(lines):
+        stamp = f'[{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}]'
+        roll = rng.random()
+        if roll < _EVENT_RATIO:
+            text = _fill(rng.choice(templates)[1], rng, players)
+        elif roll < 0.3:
+            text = f'<{rng.choice(players)}> hello world {i}'
+        else:
+            text = rng.choice(_NOISE_LINES)
+        output.append(f'{stamp} [Server thread/INFO]: {text}')
+    return output
+
+
+class NaiveExtractor:
+    """对照组：逐个模板做完整的正则匹配"""
+
+    def __init__(self):
+        self.patterns = []
+        for key, template in _all_templates():
+            literals, _ = parse_template(template)
+            regex = r'(.+?)'.join(re.escape(literal) for literal in literals)
+            self.patterns.append((key, re.compile(regex)))
+
+    def extract(self, line: str) -> Optional[str]:
+        for key, pattern in self.patterns:
+            if pattern.fullmatch(line):
+                return key
+        return None
+
+
+def _time_per_line(extract, contents: List[str], repeat: int) -> float:
+    """多次运行取最快一次，返回每行微秒数"""
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for content in contents:
+            extract(content)
+        best = min(best, time.perf_counter() - started)
+    return best / len(contents) * 1e6
+
+
+def run(log_lines: List[str], repeat: int = 5) -> Dict[str, object]:
+    contents = [strip_prefix(line) for line in log_lines]
+    online: Dict[str, str] = {}
+    for content in contents:
+        match = _JOINED.match(content)
+        if match:
+            online[match.group(1).lower()] = match.group(1)
+    extractor = GameEventExtractor(lambda name: online.get(name.lower()))
+    naive = NaiveExtractor()
+
+    kinds: Counter = Counter()
+    for content in contents:
+        event = extractor.extract(content)
+        if event:
+            kinds[event.kind] += 1
+    return {
+        'lines': len(contents),
+        'templates': extractor.template_count,
+        'players': len(online),
+        'events': dict(kinds),
+        'rejected': extractor.rejected,
+        'extractor_us': _time_per_line(extractor.extract, contents, repeat),
+        'naive_us': _time_per_line(naive.extract, contents, max(1, repeat // 2)),
+    }
+
+
+def format_report(result: Dict[str, object]) -> str:
+    events = ', '.join(f'{kind} {count}' for kind, count in sorted(result['events'].items())) or '无'
+    return '\n'.join([
+        f'日志{result["lines"]}行 / 模板{result["templates"]}个 / 进服玩家{result["players"]}名',
+        f'识别事件: {events}；玩家不在线而忽略: {result["rejected"]}',
+        f'提取器: {result["extractor_us"]:.2f}µs/行',
+        f'逐模板正则: {result["naive_us"]:.2f}µs/行 ({result["naive_us"] / result["extractor_us"]:.1f}倍)',
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='游戏日志事件提取基准')
+    parser.add_argument('--log', help='latest.log路径，未指定时使用合成日志')
+    parser.add_argument('--lines', type=int, default=50000, help='合成日志的行数')
+    parser.add_argument('--repeat', type=int, default=5, help='重复次数，取最快一次')
+    args = parser.parse_args()
+    if args.log:
+        with open(args.log, encoding='utf-8', errors='replace') as f:
+            log_lines = f.readlines()
+    else:
+        log_lines = synthetic_log(args.lines)
+    print(format_report(run(log_lines, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
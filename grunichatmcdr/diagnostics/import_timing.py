@@ -0,0 +1,74 @@
+"""
+导入耗时分析模块
+在子进程中以 -X importtime 导入插件入口，统计由插件首次导入的模块（MCDR自身已导入的模块不计）的自身与累计耗时，
+用于检查插件加载路径上是否引入了不必要的重量级模块
+
+用法: python -m grunichatmcdr.diagnostics.import_timing [--top N] [--entry 模块名]
+"""
+import argparse
+import subprocess
+import sys
+from typing import List, NamedTuple
+
+# MCDR加载插件前已经导入的模块
+BASELINE_MODULE = 'mcdreforged.mcdr_server'
+ENTRY_MODULE = 'grunichatmcdr.grunichatmcdr'
+
+
+class ImportTiming(NamedTuple):
+    module: str
+    self_us: int
+    cumulative_us: int
+    depth: int
+
+
+def parse_importtime(output: str) -> List[ImportTiming]:
+    """解析 -X importtime 的输出，按导入顺序返回各模块的耗时"""
+    timings = []
+    for line in output.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        fields = line[len('import time:'):].split('|')
+        if len(fields) != 3 or not fields[0].strip().isdigit():
+            # 表头行
+            continue
+        name = fields[2].rstrip()
+        stripped = name.lstrip()
+        timings.append(ImportTiming(
+            stripped, int(fields[0]), int(fields[1]), (len(name) - len(stripped)) // 2
+        ))
+    return timings
+
+
+def measure(entry: str = ENTRY_MODULE, baseline: str = BASELINE_MODULE) -> List[ImportTiming]:
+    """在新的解释器中先导入baseline，再导入entry，返回entry引入的模块耗时"""
+    marker = '__grunichat_import_timing__'
+    code = f'import {baseline}; import sys; sys.stderr.write("{marker}\\n"); import {entry}'
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, universal_newlines=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f'导入 {entry} 失败:\n{result.stderr[-2000:]}')
+    _, _, output = result.stderr.partition(marker + '\n')
+    return parse_importtime(output)
+
+
+def format_report(timings: List[ImportTiming], top: int = 20) -> str:
+    total = sum(item.self_us for item in timings)
+    lines = [f'共导入{len(timings)}个模块，合计{total / 1000:.1f}ms', '   自身(ms)   累计(ms)  模块']
+    for item in sorted(timings, key=lambda item: item.self_us, reverse=True)[:top]:
+        lines.append(f'{item.self_us / 1000:10.2f} {item.cumulative_us / 1000:10.2f}  {item.module}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='统计插件入口的导入耗时')
+    parser.add_argument('--entry', default=ENTRY_MODULE, help='要导入的插件模块')
+    parser.add_argument('--top', type=int, default=20, help='显示自身耗时最多的前N个模块')
+    args = parser.parse_args()
+    print(format_report(measure(args.entry), args.top))
+
+
+if __name__ == '__main__':
+    main()
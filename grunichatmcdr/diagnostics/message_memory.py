@@ -0,0 +1,101 @@
+"""
+消息模型内存基准
+用tracemalloc比较N条排队的出站消息在两种表示下的内存占用与分配次数：
+改用__slots__之前的嵌套字典，和现在的Envelope/Body对象；同时比较出站编码和入站解析的耗时
+
+用法: python -m grunichatmcdr.diagnostics.message_memory [--messages 10000]
+"""
+import argparse
+import json
+import time
+import tracemalloc
+import uuid
+from typing import Callable, Dict, List, Tuple
+
+from grunichatmcdr.core.message import Envelope, build_message
+
+PLUGIN_ID = 'mcdr_plugin'
+
+
+def legacy_message(plugin_id: str, msg_type: str, sender: str = '', chat_message: str = '') -> dict:
+    """改用__slots__之前的消息表示：每条消息一个嵌套字典"""
+    return {
+        'from': plugin_id,
+        'type': msg_type,
+        'body': {
+            'sender': sender,
+            'chatMessage': chat_message,
+            'command': '',
+            'eventDetail': '',
+        },
+        'totalId': str(uuid.uuid4()),
+        'currentTime': str(int(time.time() * 1000)),
+    }
+
+
+def _chat_args(count: int) -> List[Tuple[str, str]]:
+    # 消息内容事先构造好，两种表示共享同一批字符串，只比较消息结构本身
+    return [(f'Player{i % 50}', f'hello world {i}') for i in range(count)]
+
+
+def _measure(build: Callable[[str, str], object], args: List[Tuple[str, str]]) -> Tuple[list, int, int]:
+    """返回 (消息列表, 占用字节数, 分配块数)"""
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    messages = [build(sender, text) for sender, text in args]
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    stats = after.compare_to(before, 'filename')
+    return (messages, sum(stat.size_diff for stat in stats), sum(stat.count_diff for stat in stats))
+
+
+def _best(func: Callable[[], object], repeat: int = 3) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - started)
+    return best
+
+
+def run(count: int = 10000) -> Dict[str, Dict[str, float]]:
+    args = _chat_args(count)
+    results = {}
+    for name, build, encode, decode in (
+        ('dict', lambda s, t: legacy_message(PLUGIN_ID, 'chat', s, t),
+         json.dumps, json.loads),
+        ('slots', lambda s, t: build_message(PLUGIN_ID, 'chat', s, t),
+         Envelope.to_json, Envelope.from_json),
+    ):
+        messages, size, blocks = _measure(build, args)
+        frames = [encode(message) for message in messages]
+        results[name] = {
+            'bytes': size,
+            'blocks': blocks,
+            'encode_us': _best(lambda: [encode(message) for message in messages]) / count * 1e6,
+            'decode_us': _best(lambda: [decode(frame) for frame in frames]) / count * 1e6,
+        }
+    return results
+
+
+def format_report(results: Dict[str, Dict[str, float]], count: int) -> str:
+    dict_stats, slots_stats = results['dict'], results['slots']
+    lines = [f'{count}条排队的聊天消息', '          内存(KiB)    分配块    编码(µs/条)  解析(µs/条)']
+    for name, label in (('dict', '嵌套字典'), ('slots', '__slots__')):
+        stats = results[name]
+        lines.append(f'{label:<10}{stats["bytes"] / 1024:10.1f}{stats["blocks"]:10d}'
+                     f'{stats["encode_us"]:13.2f}{stats["decode_us"]:13.2f}')
+    lines.append(f'内存减少{1 - slots_stats["bytes"] / dict_stats["bytes"]:.1%}，'
+                 f'分配块减少{1 - slots_stats["blocks"] / dict_stats["blocks"]:.1%}')
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='比较字典与__slots__消息表示的内存占用')
+    parser.add_argument('--messages', type=int, default=10000, help='排队的消息条数')
+    args = parser.parse_args()
+    print(format_report(run(args.messages), args.messages))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+富文本渲染基准
+用带Markdown、网址、表情和生僻字的合成聊天流对比渲染缓存的冷、热路径：
+冷路径每条消息都重新解析（缓存容量为0），热路径在预热一轮后只做缓存查找；
+每条消息的耗时包括前缀、正文和序列化为tellraw JSON
+
+用法: python -m grunichatmcdr.diagnostics.render_bench [--messages N] [--senders N] [--distinct N] [--repeat N]
+"""
+import argparse
+import random
+import time
+from typing import Dict, List, Tuple
+
+from mcdreforged.api.rtext import RTextList
+
+from grunichatmcdr.config import GRUniChatConfig
+from grunichatmcdr.core.rich_text import RichTextRenderer
+
+_SOURCES = ('qq', 'discord', 'kook')
+_TEMPLATES = (
+    '大家好 😀 今天一起挖矿吗',
+    '**注意** 服务器将在 _5分钟_ 后重启',
+    '看这个 https://example.com/wiki/Redstone_{n} 很有用',
+    '[投票链接](https://example.com/vote/{n}) ||别告诉别人||',
+    '𠀀𪚥 生僻字测试 {n}',
+    '`/tp @s 0 64 0` 然后 ~~别~~ 跳下去 👍🏽',
+    '<:creeper:123456789> boom 🇨🇳',
+    '普通的一句话 {n}',
+)
+
+
+def make_corpus(messages: int, senders: int, distinct: int, seed: int = 1) -> List[Tuple[str, str, str]]:
+    """生成 (来源, 发送者, 正文) 列表；正文从distinct种不同内容中抽取，模拟群聊中的重复"""
+    rng = random.Random(seed)
+    texts = [_TEMPLATES[i % len(_TEMPLATES)].format(n=i) for i in range(distinct)]
+    people = [(rng.choice(_SOURCES), f'用户{i}') for i in range(senders)]
+    return [people[rng.randrange(senders)] + (rng.choice(texts),) for _ in range(messages)]
+
+
+def _render_all(renderer: RichTextRenderer, corpus: List[Tuple[str, str, str]]):
+    for source, sender, text in corpus:
+        RTextList(renderer.render_prefix(source, sender), *renderer.render_line(text).components).to_json_str()
+
+
+def _time_per_message(renderer: RichTextRenderer, corpus: List[Tuple[str, str, str]], repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        started = time.perf_counter()
+        _render_all(renderer, corpus)
+        best = min(best, time.perf_counter() - started)
+    return best / len(corpus) * 1e6
+
+
+def run(messages: int = 20000, senders: int = 50, distinct: int = 200, repeat: int = 3) -> Dict[str, float]:
+    corpus = make_corpus(messages, senders, distinct)
+    config = GRUniChatConfig.get_default()
+
+    config.chat_render_cache_size = 0
+    cold = _time_per_message(RichTextRenderer(config), corpus, repeat)
+
+    config.chat_render_cache_size = (senders + distinct) * 2
+    warm_renderer = RichTextRenderer(config)
+    _render_all(warm_renderer, corpus)
+    warm = _time_per_message(warm_renderer, corpus, repeat)
+    stats = warm_renderer.get_stats()
+    return {
+        'messages': messages,
+        'cold_us': cold,
+        'warm_us': warm,
+        'cached': stats['cached'],
+        'hit_rate': stats['hits'] / max(1, stats['hits'] + stats['misses']),
+    }
+
+
+def format_report(result: Dict[str, float]) -> str:
+    return '\n'.join([
+        f'消息{result["messages"]}条 / 缓存条目{result["cached"]} / 命中率{result["hit_rate"]:.1%}',
+        f'冷路径（每次解析）: {result["cold_us"]:.1f}µs/条',
+        f'热路径（缓存命中）: {result["warm_us"]:.1f}µs/条 ({result["cold_us"] / result["warm_us"]:.1f}倍)',
+    ])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='富文本渲染冷热路径基准')
+    parser.add_argument('--messages', type=int, default=20000, help='消息条数')
+    parser.add_argument('--senders', type=int, default=50, help='不同发送者数')
+    parser.add_argument('--distinct', type=int, default=200, help='不同正文数')
+    parser.add_argument('--repeat', type=int, default=3, help='重复次数，取最快一次')
+    args = parser.parse_args()
+    print(format_report(run(args.messages, args.senders, args.distinct, args.repeat)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,153 @@
+"""
+采样分析器模块
+通过 sys._current_frames() 定期采样插件自身线程的调用栈，输出火焰图兼容的折叠栈和函数耗时排行
+采样开销超过预算时自动降低采样频率
+"""
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Optional, Tuple
+
+# 插件线程统一使用的名称前缀
+THREAD_PREFIX = 'GRUniChat-'
+# 插件包目录，调用栈中出现该目录下的帧即视为在执行插件代码（例如MCDR任务线程中的事件回调）
+PACKAGE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+MAX_DURATION = 300.0
+MAX_RATE = 1000
+# 采样耗时占总时长的上限
+OVERHEAD_BUDGET = 0.02
+
+
+class ProfileResult:
+    """一次采样的结果"""
+
+    def __init__(self):
+        self.stacks: Counter = Counter()
+        self.self_counts: Counter = Counter()
+        self.total_counts: Counter = Counter()
+        self.ticks = 0
+        self.samples = 0
+        self.thread_samples: Counter = Counter()
+        self.duration = 0.0
+        self.sampling_time = 0.0
+        self.requested_rate = 0
+
+    @property
+    def effective_rate(self) -> float:
+        return self.ticks / self.duration if self.duration else 0.0
+
+    @property
+    def overhead(self) -> float:
+        """采样本身耗费的时间占总时长的比例"""
+        return self.sampling_time / self.duration if self.duration else 0.0
+
+    def top_functions(self, limit: int = 20) -> List[Tuple[str, int, int]]:
+        """按自身采样数排序的函数列表: (函数, 自身, 累计)"""
+        return [(name, count, self.total_counts[name]) for name, count in self.self_counts.most_common(limit)]
+
+    def write_collapsed(self, path: str):
+        """写出折叠栈文件，可直接交给 flamegraph.pl / speedscope"""
+        with open(path, 'w', encoding='utf-8') as f:
+            for stack, count in self.stacks.most_common():
+                f.write(f'{stack} {count}\n')
+
+    def write_summary(self, path: str, limit: int = 30):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(f'duration: {self.duration:.2f}s\n')
+            f.write(f'ticks: {self.ticks}, thread samples: {self.samples} (requested {self.requested_rate}Hz, effective {self.effective_rate:.1f}Hz)\n')
+            f.write(f'sampling overhead: {self.overhead * 100:.3f}%\n')
+            f.write('threads:\n')
+            for name, count in self.thread_samples.most_common():
+                f.write(f'  {name}: {count}\n')
+            f.write(f'\n{"self":>8} {"total":>8}  function\n')
+            for name, self_count, total_count in self.top_functions(limit):
+                f.write(f'{self_count:>8} {total_count:>8}  {name}\n')
+
+
+class SamplingProfiler:
+    """插件线程采样分析器"""
+
+    def __init__(self, rate: int = 100):
+        self.rate = max(1, min(rate, MAX_RATE))
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, duration: float, on_done: Callable[[ProfileResult], None]) -> bool:
+        """在后台线程中采样，结束后调用on_done；已有采样在进行时返回False"""
+        if self.running:
+            return False
+        self._stop.clear()
+
+        def run():
+            on_done(self.profile(duration))
+
+        self._thread = threading.Thread(target=run, name=f'{THREAD_PREFIX}profiler', daemon=True)
+        self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def profile(self, duration: float) -> ProfileResult:
+        """阻塞采样duration秒"""
+        duration = max(0.1, min(duration, MAX_DURATION))
+        result = ProfileResult()
+        result.requested_rate = self.rate
+        interval = 1.0 / self.rate
+        me = threading.get_ident()
+        code_names: Dict[object, str] = {}
+
+        started = time.perf_counter()
+        deadline = started + duration
+        while not self._stop.is_set():
+            tick = time.perf_counter()
+            if tick >= deadline:
+                break
+            self._sample(result, me, code_names)
+            result.ticks += 1
+            cost = time.perf_counter() - tick
+            result.sampling_time += cost
+            # 单次采样耗时超出预算时拉长间隔，保证总开销有界
+            wait = max(interval, cost / OVERHEAD_BUDGET) - cost
+            self._stop.wait(max(0.0, min(wait, deadline - time.perf_counter())))
+        result.duration = time.perf_counter() - started
+        return result
+
+    @staticmethod
+    def _sample(result: ProfileResult, me: int, code_names: Dict[object, str]):
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        for ident, frame in sys._current_frames().items():
+            if ident == me:
+                continue
+            thread_name = names.get(ident, str(ident))
+            own_thread = thread_name.startswith(THREAD_PREFIX)
+
+            stack = []
+            in_plugin = own_thread
+            while frame is not None:
+                code = frame.f_code
+                name = code_names.get(code)
+                if name is None:
+                    name = f'{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})'
+                    code_names[code] = name
+                if not in_plugin and code.co_filename.startswith(PACKAGE_DIR):
+                    in_plugin = True
+                stack.append(name)
+                frame = frame.f_back
+            if not in_plugin or not stack:
+                continue
+
+            result.samples += 1
+            result.thread_samples[thread_name] += 1
+            result.self_counts[stack[0]] += 1
+            for name in set(stack):
+                result.total_counts[name] += 1
+            stack.reverse()
+            result.stacks[';'.join([thread_name] + stack)] += 1
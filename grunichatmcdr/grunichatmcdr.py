@@ -1,6 +1,7 @@
 # MCDR GRUniChatMCDR 插件入口 - 模块化重构版本
-from mcdreforged.api.all import *
+from mcdreforged.api.types import Info, PluginServerInterface
 from grunichatmcdr.managers.lifecycle_manager import PluginLifecycleManager
+from grunichatmcdr.state.player_index import player_index
 from grunichatmcdr.state.plugin_state import plugin_state
 
 # 全局生命周期管理器实例
@@ -22,6 +23,11 @@ def on_server_startup(server: PluginServerInterface):
     lifecycle_manager.on_server_startup(server)
 
 
+def on_server_stop(server: PluginServerInterface, return_code: int):
+    """服务器停止回调"""
+    lifecycle_manager.on_server_stop(server)
+
+
 def on_info(server: PluginServerInterface, info: Info):
     """信息事件回调"""
     event_handler = lifecycle_manager.get_event_handler()
@@ -62,3 +68,8 @@ def is_plugin_loaded() -> bool:
 def is_websocket_connected() -> bool:
     """检查WebSocket是否已连接"""
     return plugin_state.is_ws_connected()
+
+
+def get_online_players() -> list:
+    """获取在线玩家列表（重载时新实例据此继承在线玩家索引）"""
+    return player_index.names()
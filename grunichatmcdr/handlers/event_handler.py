@@ -2,11 +2,18 @@
 MCDR事件处理模块
 负责处理各种MCDR事件的分发和处理
 """
-from mcdreforged.api.all import *
+from mcdreforged.api.types import Info, PluginServerInterface
 from grunichatmcdr.config import GRUniChatConfig
 from grunichatmcdr.core.websocket_service import WebSocketService
 from grunichatmcdr.processors.message_processor import MessageProcessor, MessageSender
+from grunichatmcdr.processors.chat_throttle import DECISION_FORWARD, DECISION_THROTTLED, ChatThrottle
+from grunichatmcdr.processors.game_event_extractor import (
+    EVENT_DEATH, EVENT_LAG, EVENT_SERVER, GameEvent, GameEventExtractor
+)
+from grunichatmcdr.core.outbound_queue import PRIORITY_CHAT, PRIORITY_LIFECYCLE, PRIORITY_NOISY
+from grunichatmcdr.state.player_index import parse_player_list, player_index
 from grunichatmcdr.state.plugin_state import plugin_state
+from grunichatmcdr.state.message_trace import message_trace
 from typing import Optional
 
 
@@ -21,11 +28,36 @@ class EventHandler:
         # 初始化消息处理器和发送器
         self.message_processor = MessageProcessor(config, self.logger)
         self.message_sender = MessageSender(ws_service, self.message_processor, self.logger)
+        # 在线玩家索引是否完整；首次加载时服务器上已有的玩家要等 list 的输出才能填入
+        self.player_list_synced = True
+        # 只把在线玩家识别为事件主体
+        self.event_extractor = GameEventExtractor(self._lookup_player)
+        # 聊天限流与重复消息折叠，合并后的消息由折叠线程回调发送
+        self.chat_throttle = ChatThrottle(
+            self._forward_chat,
+            self.logger,
+            collapse_window=config.chat_collapse_window,
+            rate_limit=config.chat_rate_limit,
+            rate_window=config.chat_rate_window,
+            max_senders=config.chat_throttle_players
+        )
         
         # 更新状态
         plugin_state.set_server(server)
         plugin_state.set_config(config)
         plugin_state.set_ws_service(ws_service)
+        plugin_state.set_chat_throttle(self.chat_throttle)
+    
+    def request_player_list(self):
+        """执行 list 以填充在线玩家索引，收到输出前不按索引校验事件主体"""
+        self.player_list_synced = False
+        self.server.execute('list')
+    
+    def _lookup_player(self, name: str) -> Optional[str]:
+        player = player_index.get(name)
+        if player is None and not self.player_list_synced:
+            return name
+        return player
     
     def update_ws_service(self, ws_service: Optional[WebSocketService]):
         """更新WebSocket服务实例"""
@@ -43,6 +75,17 @@ class EventHandler:
             # 玩家命令
             elif self._is_command_result(info.content):
                 self._handle_command_result(info.content)
+            elif info.is_from_server:
+                self._sync_player_list(info.content)
+                # 远程命令的输出捕获；玩家聊天和其他管理员命令的回显不会是远程命令的输出，不送入
+                ws_service = self.message_sender.ws_service
+                if ws_service:
+                    ws_service.feed_console_line(info.content)
+                # 死亡、进度等游戏日志事件
+                if self.config.forward_game_events:
+                    event = self.event_extractor.extract(info.content)
+                    if event:
+                        self._handle_game_event(event)
                 
         except Exception as e:
             self.logger.error(f"[{self.config.plugin_id}] 处理info事件失败: {e}")
@@ -51,8 +94,13 @@ class EventHandler:
         """处理玩家加入事件"""
         try:
             plugin_state.increment_events_processed()
+            player_index.add(player)
+            self._publish_presence(joined=(player,))
             
-            if self.message_sender.send_event_message(f"{player} joined the game"):
+            detail = f"{player} joined the game"
+            plugin_state.record_history('out', self.config.plugin_id, player, 'event', detail)
+            trace = message_trace.begin('event', detail)
+            if self.message_sender.send_event_message(detail, trace=trace):
                 plugin_state.increment_messages_sent()
                 self.logger.info(f"[{self.config.plugin_id}] 玩家加入事件已发送: {player}")
             else:
@@ -66,8 +114,13 @@ class EventHandler:
         """处理玩家离开事件"""
         try:
             plugin_state.increment_events_processed()
+            player_index.remove(player)
+            self._publish_presence(left=(player,))
             
-            if self.message_sender.send_event_message(f"{player} left the game"):
+            detail = f"{player} left the game"
+            plugin_state.record_history('out', self.config.plugin_id, player, 'event', detail)
+            trace = message_trace.begin('event', detail)
+            if self.message_sender.send_event_message(detail, trace=trace):
                 plugin_state.increment_messages_sent()
                 self.logger.info(f"[{self.config.plugin_id}] 玩家离开事件已发送: {player}")
             else:
@@ -97,21 +150,74 @@ class EventHandler:
         try:
             plugin_state.increment_events_processed()
             
+            # 先发出暂存的重复消息
+            self.chat_throttle.stop()
+            plugin_state.set_chat_throttle(None)
+            
             if self.message_sender.send_event_message("GRUniChatMCDR 插件被卸载"):
                 plugin_state.increment_messages_sent()
                 self.logger.info(f"[{self.config.plugin_id}] 插件卸载事件已发送")
             else:
                 plugin_state.increment_messages_failed()
+            
+            # 通知其它服务器移除本服的在线名单
+            ws_service = self.message_sender.ws_service
+            if ws_service and ws_service.presence:
+                ws_service.presence.publish_offline()
                 
         except Exception as e:
             plugin_state.increment_messages_failed()
             self.logger.error(f"[{self.config.plugin_id}] WebSocket发送插件卸载通知失败: {e}")
     
+    def _publish_presence(self, joined=(), left=()):
+        """向其它服务器发送本服在线名单的增量"""
+        ws_service = self.message_sender.ws_service
+        if ws_service and ws_service.presence:
+            ws_service.presence.publish_delta(joined, left)
+    
+    def _sync_player_list(self, content: str):
+        """list 的输出是完整的在线名单，用它整体替换索引"""
+        names = parse_player_list(content)
+        if names is None:
+            return
+        player_index.replace(names)
+        self.player_list_synced = True
+        ws_service = self.message_sender.ws_service
+        if ws_service and ws_service.presence:
+            ws_service.presence.publish_snapshot()
+    
     def _handle_chat_message(self, info: Info):
         """处理聊天消息"""
-        if self.message_sender.send_chat_message(info.player, info.content):
+        decision = self.chat_throttle.submit(info.player, info.content)
+        if decision == DECISION_FORWARD:
+            self._forward_chat(info.player, info.content)
+        elif decision == DECISION_THROTTLED:
+            self.logger.info(f"[{self.config.plugin_id}] 聊天消息超过限流，已丢弃: {info.player}: {info.content}")
+    
+    def _forward_chat(self, player: str, content: str):
+        """转发一条聊天消息（含折叠后的重复消息）"""
+        plugin_state.record_history('out', self.config.plugin_id, player, 'chat', content)
+        trace = message_trace.begin('chat', f"{player}: {content}")
+        if self.message_sender.send_chat_message(player, content, trace=trace):
+            plugin_state.increment_messages_sent()
+            self.logger.debug(f"[{self.config.plugin_id}] 聊天消息已发送: {player}: {content}")
+        else:
+            plugin_state.increment_messages_failed()
+    
+    def _handle_game_event(self, event: GameEvent):
+        """处理从日志中提取出的游戏事件"""
+        if event.kind == EVENT_SERVER:
+            priority = PRIORITY_LIFECYCLE
+        elif event.kind in (EVENT_DEATH, EVENT_LAG):
+            priority = PRIORITY_NOISY
+        else:
+            priority = PRIORITY_CHAT
+        
+        plugin_state.record_history('out', self.config.plugin_id, event.player, 'event', event.raw)
+        trace = message_trace.begin('event', event.raw)
+        if self.message_sender.send_game_event(event, priority=priority, trace=trace):
             plugin_state.increment_messages_sent()
-            self.logger.debug(f"[{self.config.plugin_id}] 聊天消息已发送: {info.player}: {info.content}")
+            self.logger.debug(f"[{self.config.plugin_id}] 游戏事件已发送: {event.kind}/{event.key}: {event.raw}")
         else:
             plugin_state.increment_messages_failed()
     
@@ -130,7 +236,8 @@ class EventHandler:
             player_name = player_part.strip()
             command_desc = command_result.strip()
             
-            if self.message_sender.send_command_result(player_name, "command", command_desc):
+            trace = message_trace.begin('command_result', command_desc)
+            if self.message_sender.send_command_result(player_name, "command", command_desc, trace=trace):
                 plugin_state.increment_messages_sent()
                 self.logger.debug(f"[{self.config.plugin_id}] 命令结果已发送: {player_name}: {command_desc}")
             else:
@@ -2,13 +2,19 @@
 插件生命周期管理模块
 负责管理插件的加载、卸载和状态管理
 """
-from mcdreforged.api.all import *
+from mcdreforged.api.types import Info, PluginServerInterface
 from grunichatmcdr.config import GRUniChatConfig
-from grunichatmcdr.core.main import start_ws_service, stop_ws_service
+from grunichatmcdr.core.main import create_ws_service, stop_ws_service
 from grunichatmcdr.cmd.command_tree import register_grunichat_command
 from grunichatmcdr.handlers.event_handler import EventHandler
+from grunichatmcdr.state.player_index import player_index
 from grunichatmcdr.state.plugin_state import plugin_state
+from grunichatmcdr.state.message_trace import message_trace
+from grunichatmcdr.state.rate_stats import rate_stats
 from typing import Optional
+import os
+import threading
+import time
 
 
 class PluginLifecycleManager:
@@ -16,9 +22,12 @@ class PluginLifecycleManager:
     
     def __init__(self):
         self.event_handler: Optional[EventHandler] = None
+        self.relay_server = None
+        self._startup_thread: Optional[threading.Thread] = None
     
     def load(self, server: PluginServerInterface, old=None):
         """加载插件"""
+        started = time.perf_counter()
         try:
             # 加载配置
             config = server.load_config_simple(target_class=GRUniChatConfig)
@@ -28,13 +37,31 @@ class PluginLifecycleManager:
             # 更新状态
             plugin_state.set_server(server)
             plugin_state.set_config(config)
+            message_trace.configure(config.trace_enabled, config.trace_capacity)
             
-            # 启动WebSocket服务
-            ws_service = start_ws_service(server, config)
+            # 重载时从旧实例继承在线玩家索引
+            get_online_players = getattr(old, 'get_online_players', None)
+            inherited_players = callable(get_online_players)
+            if inherited_players:
+                player_index.replace(get_online_players())
+            
+            # 启动历史记录存储
+            if config.history_enabled:
+                self._start_history_store(server, config)
+            
+            # 启动命令审计日志
+            if config.command_audit_enabled:
+                self._start_audit_log(server, config)
+            
+            # 创建WebSocket服务，连接在后台建立，此前产生的事件缓冲在出站队列中
+            ws_service = create_ws_service(server, config)
             plugin_state.set_ws_service(ws_service)
             
             # 初始化事件处理器
             self.event_handler = EventHandler(server, ws_service, config)
+            # 首次加载时服务器可能已在运行，用 list 的输出填充在线玩家索引
+            if not inherited_players and server.is_server_startup():
+                self.event_handler.request_player_list()
             
             # 注册命令
             register_grunichat_command(server, ws_service, config=None)
@@ -45,8 +72,15 @@ class PluginLifecycleManager:
             # 设置加载状态
             plugin_state.set_loaded(True)
             
-            server.logger.info(f'[{config.plugin_id}] GRUniChatMCDR 插件加载完成')
-            server.logger.info(f'[{config.plugin_id}] {plugin_state.get_status_summary()}')
+            # 读取快照、启动中继和建立连接都可能阻塞，放到后台线程，不占用MCDR的加载线程
+            self._startup_thread = threading.Thread(
+                target=self._background_startup, args=(server, config, ws_service),
+                name='GRUniChat-startup', daemon=True
+            )
+            self._startup_thread.start()
+            
+            elapsed = (time.perf_counter() - started) * 1000
+            server.logger.info(f'[{config.plugin_id}] GRUniChatMCDR 插件加载完成，耗时{elapsed:.1f}ms，连接在后台建立')
             
         except Exception as e:
             plugin_state.set_loaded(False)
@@ -59,12 +93,46 @@ class PluginLifecycleManager:
             config = plugin_state.get_config()
             plugin_id = config.plugin_id if config else "GRUniChat"
             
+            # 等待后台启动结束，避免在连接建立过程中关闭
+            startup_thread = self._startup_thread
+            if startup_thread:
+                startup_thread.join(config.shutdown_timeout if config else 3.0)
+                self._startup_thread = None
+            
             # 发送卸载事件
             if self.event_handler:
                 self.event_handler.handle_plugin_unload()
             
-            # 停止WebSocket服务
-            stop_ws_service()
+            # 优雅关闭WebSocket服务，超时后丢弃剩余消息
+            timeout = config.shutdown_timeout if config else 3.0
+            report = stop_ws_service(timeout)
+            if report:
+                self._log_shutdown_report(server, plugin_id, report)
+            
+            # 停止本实例运行的本地中继
+            if self.relay_server:
+                self.relay_server.stop()
+                self.relay_server = None
+                plugin_state.set_relay_server(None)
+            
+            # 停止历史记录存储，写完剩余记录
+            history_store = plugin_state.get_history_store()
+            if history_store:
+                history_store.stop()
+                plugin_state.set_history_store(None)
+            
+            # 停止命令审计日志，写完剩余记录
+            audit_log = plugin_state.get_audit_log()
+            if audit_log:
+                audit_log.stop()
+                plugin_state.set_audit_log(None)
+            
+            # 写出最后一次速率统计快照
+            rate_stats.stop_snapshots()
+            try:
+                rate_stats.save(self._get_stats_snapshot_path(server))
+            except Exception as e:
+                server.logger.warning(f'[{plugin_id}] 保存速率统计快照失败: {e}')
             
             # 更新状态
             plugin_state.set_loaded(False)
@@ -80,6 +148,19 @@ class PluginLifecycleManager:
         if self.event_handler:
             self.event_handler.handle_server_startup()
     
+    def on_server_stop(self, server: PluginServerInterface):
+        """服务器停止回调，清空在线玩家索引并同步到其它服务器，在限定时间内发出已排队的消息"""
+        player_index.clear()
+        if self.event_handler:
+            self.event_handler.player_list_synced = True
+        config = plugin_state.get_config()
+        ws_service = plugin_state.get_ws_service()
+        # 服务器已无玩家在线，以快照通知其它服务器
+        if ws_service and ws_service.presence:
+            ws_service.presence.publish_snapshot()
+        if config and ws_service and not ws_service.flush(config.shutdown_timeout):
+            server.logger.warning(f'[{config.plugin_id}] 服务器停止时未能在{config.shutdown_timeout}秒内发出全部消息')
+    
     def get_event_handler(self) -> Optional[EventHandler]:
         """获取事件处理器"""
         return self.event_handler
@@ -98,6 +179,75 @@ class PluginLifecycleManager:
         """获取插件统计信息"""
         return plugin_state.get_stats()
     
+    @staticmethod
+    def _log_shutdown_report(server: PluginServerInterface, plugin_id: str, report: dict):
+        """输出优雅关闭的结果，有消息被丢弃或线程未退出时给出警告"""
+        for name, result in report.items():
+            if result['drained'] and not result['threads_alive']:
+                server.logger.info(f'[{plugin_id}] 通道[{name}]已优雅关闭')
+                continue
+            server.logger.warning(
+                f'[{plugin_id}] 通道[{name}]关闭超时: 丢弃{result["dropped"]}条排队消息, '
+                f'{result["unacked"]}条未确认, 未退出的线程: {", ".join(result["threads_alive"]) or "无"}'
+            )
+    
+    @staticmethod
+    def _get_stats_snapshot_path(server: PluginServerInterface) -> str:
+        """速率统计快照文件路径"""
+        return os.path.join(server.get_data_folder(), 'rate_stats.json')
+    
+    def _background_startup(self, server: PluginServerInterface, config: GRUniChatConfig, ws_service):
+        """后台启动：恢复速率统计快照，host模式下启动本地中继，再建立WebSocket连接"""
+        try:
+            # 恢复速率统计快照，并定期写回
+            stats_path = self._get_stats_snapshot_path(server)
+            rate_stats.load(stats_path)
+            rate_stats.start_snapshots(stats_path, config.stats_snapshot_interval, server.logger)
+            
+            # host模式下先启动本地中继，本实例随后作为普通成员接入
+            if config.relay_mode == 'host':
+                self._start_relay(server, config)
+            
+            # 启动期间插件已被卸载时不再连接
+            if plugin_state.get_ws_service() is not ws_service:
+                return
+            ws_service.start()
+            server.logger.info(f'[{config.plugin_id}] {plugin_state.get_status_summary()}')
+        except Exception as e:
+            server.logger.error(f'[{config.plugin_id}] 后台启动失败: {e}')
+    
+    def _start_relay(self, server: PluginServerInterface, config: GRUniChatConfig):
+        """按需导入并启动本地中继"""
+        from grunichatmcdr.core.relay_channel import resolve_relay_socket
+        from grunichatmcdr.relay.relay_server import RelayServer
+        
+        self.relay_server = RelayServer(config.ws_url, resolve_relay_socket(server, config), config.relay_id, server.logger)
+        self.relay_server.start()
+        plugin_state.set_relay_server(self.relay_server)
+    
+    def _start_history_store(self, server: PluginServerInterface, config: GRUniChatConfig):
+        """按需导入并启动历史记录存储"""
+        from grunichatmcdr.storage.history_store import HistoryStore
+        
+        history_store = HistoryStore(
+            os.path.join(server.get_data_folder(), config.history_file),
+            server.logger,
+            batch_size=config.history_batch_size,
+            flush_interval=config.history_flush_interval,
+            retention_days=config.history_retention_days
+        )
+        history_store.start()
+        plugin_state.set_history_store(history_store)
+        server.logger.info(f'[{config.plugin_id}] 历史记录已启用: {history_store.path}')
+    
+    def _start_audit_log(self, server: PluginServerInterface, config: GRUniChatConfig):
+        """按需导入并启动命令审计日志"""
+        from grunichatmcdr.storage.audit_log import AuditLog
+        
+        audit_log = AuditLog(os.path.join(server.get_data_folder(), config.command_audit_file), server.logger)
+        audit_log.start()
+        plugin_state.set_audit_log(audit_log)
+    
     def _register_event_listeners(self, server: PluginServerInterface):
         """注册事件监听器"""
         if not self.event_handler:
@@ -2,5 +2,6 @@
 消息处理器模块
 """
 from .message_processor import MessageProcessor, MessageSender
+from .game_event_extractor import GameEvent, GameEventExtractor
 
-__all__ = ['MessageProcessor', 'MessageSender']
+__all__ = ['MessageProcessor', 'MessageSender', 'GameEvent', 'GameEventExtractor']
@@ -0,0 +1,177 @@
+"""
+聊天限流与重复消息折叠模块
+每个发送者一个滑动窗口限流；窗口期内的相同消息先暂存，到期后合并为一条 "消息 (xN)" 发出
+发送者状态保存在有上限的LRU中，被淘汰时先发出暂存的重复消息
+"""
+import threading
+import time
+from collections import OrderedDict, deque
+from typing import Callable, Deque, Dict, Optional
+
+# 提交结果
+DECISION_FORWARD = 'forward'    # 立即转发
+DECISION_HELD = 'held'          # 作为重复消息暂存，稍后合并发出
+DECISION_THROTTLED = 'throttled'  # 超过限流，丢弃
+
+
+class _SenderState:
+    """单个发送者的限流与折叠状态"""
+    __slots__ = ('sent_times', 'last_text', 'last_forward', 'repeats')
+
+    def __init__(self):
+        self.sent_times: Deque[float] = deque()
+        self.last_text: Optional[str] = None
+        self.last_forward = 0.0
+        self.repeats = 0
+
+
+class ChatThrottle:
+    """按发送者限流并折叠重复消息"""
+
+    def __init__(self, emit: Callable[[str, str], None], logger, collapse_window: float = 5.0,
+                 rate_limit: int = 5, rate_window: float = 10.0, max_senders: int = 1024):
+        self._emit = emit
+        self._logger = logger
+        self._collapse_window = collapse_window
+        self._rate_limit = rate_limit
+        self._rate_window = rate_window
+        self._max_senders = max(1, max_senders)
+        self._states: 'OrderedDict[str, _SenderState]' = OrderedDict()
+        # 有暂存重复消息的发送者，折叠线程只需检查这些
+        self._held: Dict[str, _SenderState] = {}
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        # 统计
+        self.forwarded = 0
+        self.collapsed = 0
+        self.throttled = 0
+        self.evicted = 0
+
+    def submit(self, sender: str, text: str, now: Optional[float] = None) -> str:
+        """提交一条聊天消息，返回处理结果；需要转发时由调用方自行发送"""
+        now = time.monotonic() if now is None else now
+        flush = None
+        with self._cond:
+            state = self._states.get(sender)
+            if state is None:
+                state = self._states[sender] = _SenderState()
+                if len(self._states) > self._max_senders:
+                    flush = self._evict_oldest()
+            else:
+                self._states.move_to_end(sender)
+
+            # 窗口期内的相同消息：暂存计数，由折叠线程到期后合并发出
+            if (self._collapse_window > 0 and text == state.last_text
+                    and now - state.last_forward < self._collapse_window):
+                state.repeats += 1
+                self._held[sender] = state
+                self.collapsed += 1
+                self._ensure_thread()
+                self._cond.notify()
+                decision = DECISION_HELD
+            else:
+                # 新内容到来前先发出暂存的重复消息，保持顺序
+                if state.repeats:
+                    flush = flush or []
+                    flush.append(self._take_repeats(sender, state))
+                if self._allow(state, now):
+                    state.last_text = text
+                    state.last_forward = now
+                    self.forwarded += 1
+                    decision = DECISION_FORWARD
+                else:
+                    self.throttled += 1
+                    decision = DECISION_THROTTLED
+        if flush:
+            self._emit_all(flush)
+        return decision
+
+    def flush(self):
+        """立即发出所有暂存的重复消息"""
+        with self._cond:
+            pending = [self._take_repeats(sender, state) for sender, state in list(self._held.items())]
+        self._emit_all(pending)
+
+    def stop(self):
+        """发出暂存的重复消息并停止折叠线程"""
+        with self._cond:
+            self._running = False
+            self._cond.notify_all()
+        thread = self._thread
+        if thread and thread is not threading.current_thread():
+            thread.join(timeout=1.0)
+        self._thread = None
+        self.flush()
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._cond:
+            held = sum(state.repeats for state in self._held.values())
+            return {
+                'senders': len(self._states),
+                'forwarded': self.forwarded,
+                'collapsed': self.collapsed,
+                'held': held,
+                'throttled': self.throttled,
+                'evicted': self.evicted,
+            }
+
+    def _allow(self, state: _SenderState, now: float) -> bool:
+        """滑动窗口限流：窗口内已转发条数达到上限时拒绝"""
+        if self._rate_limit <= 0:
+            return True
+        sent_times = state.sent_times
+        cutoff = now - self._rate_window
+        while sent_times and sent_times[0] <= cutoff:
+            sent_times.popleft()
+        if len(sent_times) >= self._rate_limit:
+            return False
+        sent_times.append(now)
+        return True
+
+    def _take_repeats(self, sender: str, state: _SenderState):
+        count = state.repeats
+        state.repeats = 0
+        self._held.pop(sender, None)
+        text = state.last_text if count == 1 else f'{state.last_text} (x{count})'
+        return sender, text
+
+    def _evict_oldest(self):
+        sender, state = self._states.popitem(last=False)
+        self.evicted += 1
+        return [self._take_repeats(sender, state)] if state.repeats else None
+
+    def _emit_all(self, pending):
+        for sender, text in pending:
+            try:
+                self._emit(sender, text)
+            except Exception as e:
+                self._logger.error(f"发送合并消息失败: {sender}: {e}")
+
+    def _ensure_thread(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._running = True
+            self._thread = threading.Thread(target=self._flush_loop, name='GRUniChat-chat-throttle', daemon=True)
+            self._thread.start()
+
+    def _flush_loop(self):
+        """等待最近的折叠窗口到期，发出合并后的重复消息"""
+        while True:
+            with self._cond:
+                if not self._running:
+                    return
+                now = time.monotonic()
+                due = []
+                nearest = None
+                for sender, state in list(self._held.items()):
+                    expires = state.last_forward + self._collapse_window
+                    if expires <= now:
+                        due.append(self._take_repeats(sender, state))
+                        # 合并消息视为一次新的转发，持续刷屏时每个窗口只发出一条
+                        state.last_forward = now
+                    elif nearest is None or expires < nearest:
+                        nearest = expires
+                if not due:
+                    self._cond.wait(None if nearest is None else nearest - now)
+                    continue
+            self._emit_all(due)
@@ -0,0 +1,231 @@
+"""
+游戏日志事件提取模块
+将原版死亡、进度、/me、卡顿警告和服务器生命周期消息模板一次性编译为多模式匹配器，
+每行日志先用 Aho-Corasick 自动机扫描模板中的字面锚点，再只对命中的候选模板做精确捕获
+模板的正则在第一次成为候选时才编译，加载时只计算锚点
+捕获到的玩家名须是在线玩家，"Thread died" 之类的服务端日志不会被当成玩家 Thread 的死亡
+"""
+import re
+from typing import Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from grunichatmcdr.processors.vanilla_templates import (
+    ADVANCEMENT_TEMPLATES,
+    DEATH_TEMPLATES,
+    EMOTE_TEMPLATES,
+    LAG_TEMPLATES,
+    SERVER_TEMPLATES,
+)
+
+# 事件类型
+EVENT_DEATH = 'death'
+EVENT_ADVANCEMENT = 'advancement'
+EVENT_EMOTE = 'emote'
+EVENT_LAG = 'lag'
+EVENT_SERVER = 'server'
+
+_PLACEHOLDER = re.compile(r'%(?:(\d+)\$)?s')
+# 玩家名不含空白字符，其余参数（生物名、物品名、进度名）可能带空格
+_PLAYER_PATTERN = r'(\S+)'
+_ARG_PATTERN = r'(.+?)'
+# 第一个参数不是玩家的事件类型
+_NON_PLAYER_KINDS = (EVENT_LAG, EVENT_SERVER)
+
+
+class GameEvent(NamedTuple):
+    """从日志中提取出的游戏事件"""
+    kind: str
+    key: str
+    player: str
+    args: Tuple[str, ...]
+    raw: str
+
+
+def parse_template(template: str) -> Tuple[List[str], List[int]]:
+    """拆分原版翻译模板，返回 (字面量列表, 各占位符的参数序号)；字面量比占位符多一个
+    %s 按出现顺序编号，%2$s 使用显式序号，序号从1开始"""
+    literals = []
+    arg_order = []
+    last = 0
+    auto_index = 0
+    for match in _PLACEHOLDER.finditer(template):
+        literals.append(template[last:match.start()])
+        if match.group(1):
+            index = int(match.group(1))
+        else:
+            auto_index += 1
+            index = auto_index
+        arg_order.append(index)
+        last = match.end()
+    literals.append(template[last:])
+    return literals, arg_order
+
+
+class _CompiledTemplate:
+    """单个模板的编译结果"""
+    __slots__ = ('kind', 'key', 'pattern', '_regex', 'anchor', 'arg_order', 'literal_len')
+
+    def __init__(self, kind: str, key: str, template: str):
+        self.kind = kind
+        self.key = key
+        literals, arg_order = parse_template(template)
+        parts = []
+        for literal, index in zip(literals, arg_order):
+            parts.append(re.escape(literal))
+            parts.append(_PLAYER_PATTERN if index == 1 else _ARG_PATTERN)
+        parts.append(re.escape(literals[-1]))
+
+        self.pattern = ''.join(parts)
+        self._regex = None
+        self.anchor = max(literals, key=len)
+        self.arg_order = tuple(arg_order)
+        self.literal_len = sum(len(literal) for literal in literals)
+
+    @property
+    def regex(self):
+        regex = self._regex
+        if regex is None:
+            regex = self._regex = re.compile(self.pattern)
+        return regex
+
+    def match(self, line: str) -> Optional[GameEvent]:
+        """对整行做精确匹配，成功时按参数序号整理捕获结果"""
+        match = self.regex.fullmatch(line)
+        if not match:
+            return None
+        args = [''] * len(self.arg_order)
+        for group_value, index in zip(match.groups(), self.arg_order):
+            args[index - 1] = group_value
+        player = args[0] if args and self.kind != EVENT_LAG else ''
+        return GameEvent(self.kind, self.key, player, tuple(args), line)
+
+
+class _AhoCorasick:
+    """Aho-Corasick 多模式字符串匹配自动机"""
+
+    def __init__(self, patterns: List[str]):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[int]] = [[]]
+
+        for pattern_id, pattern in enumerate(patterns):
+            node = 0
+            for char in pattern:
+                next_node = self._goto[node].get(char)
+                if next_node is None:
+                    next_node = len(self._goto)
+                    self._goto[node][char] = next_node
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._output.append([])
+                node = next_node
+            self._output[node].append(pattern_id)
+
+        # 广度优先构建失败指针，并把失败链上的输出合并到当前节点
+        queue = list(self._goto[0].values())
+        while queue:
+            next_queue = []
+            for node in queue:
+                for char, child in self._goto[node].items():
+                    fail = self._fail[node]
+                    while fail and char not in self._goto[fail]:
+                        fail = self._fail[fail]
+                    fail_target = self._goto[fail].get(char, 0)
+                    self._fail[child] = fail_target if fail_target != child else 0
+                    self._output[child] = self._output[child] + self._output[self._fail[child]]
+                    next_queue.append(child)
+            queue = next_queue
+
+    def search(self, text: str) -> List[int]:
+        """返回文本中出现的所有模式编号（可能重复）"""
+        goto = self._goto
+        fail = self._fail
+        output = self._output
+        found: List[int] = []
+        node = 0
+        for char in text:
+            while node and char not in goto[node]:
+                node = fail[node]
+            node = goto[node].get(char, 0)
+            if output[node]:
+                found.extend(output[node])
+        return found
+
+
+class GameEventExtractor:
+    """游戏日志事件提取器
+    player_lookup按名字查找在线玩家并返回原始大小写，找不到时返回None；为None时不校验玩家名"""
+
+    def __init__(self, player_lookup: Optional[Callable[[str], Optional[str]]] = None):
+        self._player_lookup = player_lookup
+        # 匹配了模板但玩家不在线而被忽略的行数
+        self.rejected = 0
+        self._templates: List[_CompiledTemplate] = []
+        for kind, templates in (
+            (EVENT_DEATH, DEATH_TEMPLATES),
+            (EVENT_ADVANCEMENT, ADVANCEMENT_TEMPLATES),
+            (EVENT_EMOTE, EMOTE_TEMPLATES),
+            (EVENT_LAG, LAG_TEMPLATES),
+            (EVENT_SERVER, SERVER_TEMPLATES),
+        ):
+            for key, template in templates.items():
+                self._templates.append(_CompiledTemplate(kind, key, template))
+
+        # 相同锚点的模板共享一个自动机模式，按字面长度降序尝试，保证更具体的模板优先
+        anchors: List[str] = []
+        self._candidates: List[List[_CompiledTemplate]] = []
+        anchor_ids: Dict[str, int] = {}
+        for template in self._templates:
+            anchor_id = anchor_ids.get(template.anchor)
+            if anchor_id is None:
+                anchor_id = len(anchors)
+                anchor_ids[template.anchor] = anchor_id
+                anchors.append(template.anchor)
+                self._candidates.append([])
+            self._candidates[anchor_id].append(template)
+        for candidates in self._candidates:
+            candidates.sort(key=lambda t: t.literal_len, reverse=True)
+
+        self._automaton = _AhoCorasick(anchors)
+
+    @property
+    def template_count(self) -> int:
+        """已编译的模板数量"""
+        return len(self._templates)
+
+    def extract(self, line: str) -> Optional[GameEvent]:
+        """从一行控制台输出中提取事件，未命中任何模板时返回None"""
+        if not line:
+            return None
+        hits = self._automaton.search(line)
+        if not hits:
+            return None
+
+        candidates: List[_CompiledTemplate] = []
+        seen = set()
+        for anchor_id in hits:
+            if anchor_id not in seen:
+                seen.add(anchor_id)
+                candidates.extend(self._candidates[anchor_id])
+        if len(seen) > 1:
+            candidates.sort(key=lambda t: t.literal_len, reverse=True)
+
+        for template in candidates:
+            event = template.match(line)
+            if event:
+                event = self._check_player(event)
+                if event:
+                    return event
+        return None
+
+    def _check_player(self, event: GameEvent) -> Optional[GameEvent]:
+        """校验事件主体是在线玩家，并换成玩家名的原始大小写；不是玩家时返回None"""
+        if self._player_lookup is None or event.kind in _NON_PLAYER_KINDS:
+            return event
+        name = self._player_lookup(event.player)
+        if name is None:
+            self.rejected += 1
+            return None
+        if name != event.player:
+            args = (name,) + event.args[1:]
+            event = event._replace(player=name, args=args)
+        return event
@@ -2,11 +2,13 @@
 消息处理模块
 负责处理不同类型的消息格式化和发送
 """
-from mcdreforged.api.all import *
 from grunichatmcdr.config import GRUniChatConfig
+from grunichatmcdr.core.message import Envelope, build_message
 from grunichatmcdr.core.websocket_service import WebSocketService
-from typing import Optional, Dict, Any
-import time
+from grunichatmcdr.core.outbound_queue import PRIORITY_CHAT, PRIORITY_COMMAND_RESULT, PRIORITY_LIFECYCLE
+from grunichatmcdr.processors.game_event_extractor import GameEvent
+from grunichatmcdr.state.message_trace import TraceRecord, message_trace
+from typing import Optional
 
 
 class MessageProcessor:
@@ -16,30 +18,28 @@ class MessageProcessor:
         self.config = config
         self.logger = logger
     
-    def format_chat_message(self, sender: str, content: str) -> Dict[str, Any]:
+    def format_chat_message(self, sender: str, content: str) -> Envelope:
         """格式化聊天消息"""
-        return {
-            "msg_type": "chat",
-            "sender": sender,
-            "chat_message": f"[{self.config.plugin_id}] {content}",
-            "timestamp": int(time.time())
-        }
+        return build_message(self.config.plugin_id, "chat", sender=sender, chat_message=content)
     
-    def format_event_message(self, event_detail: str) -> Dict[str, Any]:
+    def format_event_message(self, event_detail: str) -> Envelope:
         """格式化事件消息"""
-        return {
-            "msg_type": "event",
-            "event_detail": f"[{self.config.plugin_id}] {event_detail}",
-            "timestamp": int(time.time())
-        }
+        return build_message(self.config.plugin_id, "event", event_detail=event_detail)
     
-    def format_command_message(self, player: str, command: str, result: str) -> Dict[str, Any]:
+    def format_game_event(self, event: GameEvent) -> Envelope:
+        """格式化游戏日志事件：eventDetail为原始日志，结构化字段放在gameEvent中"""
+        envelope = self.format_event_message(event.raw)
+        envelope.set('gameEvent', {
+            'kind': event.kind,
+            'key': event.key,
+            'player': event.player,
+            'args': list(event.args),
+        })
+        return envelope
+    
+    def format_command_message(self, player: str, command: str, result: str) -> Envelope:
         """格式化命令消息"""
-        return {
-            "msg_type": "event",
-            "event_detail": f"[{self.config.plugin_id}] Player {player} executed: {command} -> {result}",
-            "timestamp": int(time.time())
-        }
+        return self.format_event_message(f"Player {player} executed command: {command} -> {result}")
 
 
 class MessageSender:
@@ -60,58 +60,65 @@ class MessageSender:
             self.logger.debug("WebSocket服务未初始化")
             return False
         
-        if not self.ws_service.ws:
-            self.logger.debug("WebSocket连接对象不存在")
-            return False
-        
-        # 使用WebSocket服务自身的连接检查方法
+        # 首次连接建立前的消息由WebSocket服务缓冲，不视为未连接
         try:
-            return (self.ws_service.ws.sock and 
-                    self.ws_service.ws.sock.connected)
+            return self.ws_service.can_send()
         except Exception as e:
             self.logger.debug(f"检查WebSocket连接状态时出错: {e}")
             return False
     
-    def send_chat_message(self, sender: str, content: str) -> bool:
+    def send_chat_message(self, sender: str, content: str, trace: Optional[TraceRecord] = None) -> bool:
         """发送聊天消息"""
         self.logger.info(f"尝试发送聊天消息: {sender}: {content}")
         
         if not self.is_connected():
             self.logger.info("WebSocket未连接，跳过聊天消息发送")
             return False
+        message_trace.mark(trace, 'filtered')
         
         try:
-            self.ws_service.send_message(
-                msg_type="chat",
-                sender=sender,
-                chat_message=content
-            )
+            if not self.ws_service.send_envelope(
+                self.processor.format_chat_message(sender, content),
+                priority=PRIORITY_CHAT,
+                trace=trace
+            ):
+                return False
             self.logger.info(f"聊天消息已发送: {sender}: {content}")
             return True
         except Exception as e:
             self.logger.error(f"发送聊天消息失败: {e}")
             return False
     
-    def send_event_message(self, event_detail: str) -> bool:
+    def send_event_message(self, event_detail: str, priority: int = PRIORITY_LIFECYCLE,
+                           trace: Optional[TraceRecord] = None) -> bool:
         """发送事件消息"""
+        return self._send_event(self.processor.format_event_message(event_detail), priority, trace)
+    
+    def send_game_event(self, event: GameEvent, priority: int = PRIORITY_LIFECYCLE,
+                        trace: Optional[TraceRecord] = None) -> bool:
+        """发送从游戏日志中提取出的事件"""
+        return self._send_event(self.processor.format_game_event(event), priority, trace)
+    
+    def _send_event(self, envelope: Envelope, priority: int, trace: Optional[TraceRecord]) -> bool:
+        event_detail = envelope.body.event_detail
         self.logger.info(f"尝试发送事件消息: {event_detail}")
         
         if not self.is_connected():
             self.logger.info("WebSocket未连接，跳过事件消息发送")
             return False
+        message_trace.mark(trace, 'filtered')
         
         try:
-            self.ws_service.send_message(
-                msg_type="event",
-                event_detail=event_detail
-            )
+            if not self.ws_service.send_envelope(envelope, priority=priority, trace=trace):
+                return False
             self.logger.info(f"事件消息已发送: {event_detail}")
             return True
         except Exception as e:
             self.logger.error(f"发送事件消息失败: {e}")
             return False
     
-    def send_command_result(self, player: str, command: str, result: str) -> bool:
+    def send_command_result(self, player: str, command: str, result: str,
+                            trace: Optional[TraceRecord] = None) -> bool:
         """发送命令结果"""
-        event_detail = f"Player {player} executed command: {command} -> {result}"
-        return self.send_event_message(event_detail)
+        return self._send_event(self.processor.format_command_message(player, command, result),
+                                PRIORITY_COMMAND_RESULT, trace)
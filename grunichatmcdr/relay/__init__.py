@@ -0,0 +1,6 @@
+"""
+本地多路复用中继模块
+"""
+from .relay_server import RelayServer
+
+__all__ = ['RelayServer']
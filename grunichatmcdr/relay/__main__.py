@@ -0,0 +1,32 @@
+"""
+独立运行中继:
+    python -m grunichatmcdr.relay --upstream ws://broker:8765/ws --socket /run/grunichat/relay.sock
+"""
+import argparse
+import logging
+import signal
+import threading
+
+from .relay_server import RelayServer
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GRUniChat local multiplexing relay')
+    parser.add_argument('--upstream', required=True, help='upstream broker WebSocket URL')
+    parser.add_argument('--socket', required=True, help='Unix domain socket path (in a directory only the server user can write)')
+    parser.add_argument('--relay-id', default='relay', help='identifier used in the upstream hello')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(levelname)s] %(message)s')
+    relay = RelayServer(args.upstream, args.socket, args.relay_id, logging.getLogger('grunichat.relay'))
+    stopped = threading.Event()
+    signal.signal(signal.SIGINT, lambda *_: stopped.set())
+    signal.signal(signal.SIGTERM, lambda *_: stopped.set())
+
+    relay.start()
+    stopped.wait()
+    relay.stop()
+
+
+if __name__ == '__main__':
+    main()
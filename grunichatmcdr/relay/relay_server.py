@@ -0,0 +1,396 @@
+"""
+本地中继服务器
+持有唯一的上游WebSocket连接，同机的多个MCDR实例通过Unix域套接字接入
+本地帧格式与WebSocket协议相同，每行一个JSON；实例间的聊天在本地直接转发，不经过广域网往返
+上游连接状态以relay_status帧通知本地实例，上游断开期间无法转发的消息以error帧告知发送实例
+"""
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import websocket
+
+# 记录最近转发到上游的totalId，用于把上游的ack/error送回原发送实例
+_PENDING_LIMIT = 4096
+# 记录最近已在本地广播的totalId，广播器回显同一条消息时不再重复投递
+_LOCAL_SEEN_LIMIT = 4096
+# 上游断开后的重连间隔（秒）
+_RECONNECT_DELAY = 3.0
+# 单行最大长度，超出视为客户端异常并断开
+_MAX_LINE = 1 << 20
+
+
+class _LocalClient:
+    """一个接入中继的本地实例"""
+
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.plugin_id: Optional[str] = None
+        self.lock = threading.Lock()
+
+    def send(self, text: str) -> bool:
+        try:
+            with self.lock:
+                self.sock.sendall(text.encode('utf-8') + b'\n')
+            return True
+        except OSError:
+            return False
+
+    def close(self):
+        try:
+            self.sock.close()
+        except OSError:
+            pass
+
+
+class RelayServer:
+    """Unix域套接字中继"""
+
+    def __init__(self, upstream_url: str, socket_path: str, relay_id: str, logger):
+        self.upstream_url = upstream_url
+        self.socket_path = socket_path
+        self.relay_id = relay_id
+        self.logger = logger
+        self.running = False
+        self._clients: List[_LocalClient] = []
+        self._clients_lock = threading.Lock()
+        self._pending: 'OrderedDict[str, _LocalClient]' = OrderedDict()
+        self._pending_lock = threading.Lock()
+        self._local_seen: 'OrderedDict[str, None]' = OrderedDict()
+        self._local_seen_lock = threading.Lock()
+        self._listener: Optional[socket.socket] = None
+        self._upstream: Optional[websocket.WebSocketApp] = None
+        self._upstream_connected = threading.Event()
+        self._threads: List[threading.Thread] = []
+        self.stats: Dict[str, int] = {
+            'local_delivered': 0,
+            'upstream_sent': 0,
+            'upstream_received': 0,
+            'upstream_dropped': 0,
+            'echo_suppressed': 0,
+        }
+        self._bound = False
+
+    # ---- 生命周期 ----
+
+    def start(self):
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError('当前平台不支持Unix域套接字')
+        self._remove_stale_socket()
+        self._listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self._listener.bind(self.socket_path)
+        self._bound = True
+        self._listener.listen()
+        self.running = True
+        for target, name in ((self._accept_loop, 'accept'), (self._upstream_loop, 'upstream')):
+            thread = threading.Thread(target=target, name=f'GRUniChat-relay-{name}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        self.logger.info(f'[{self.relay_id}] 中继已启动: {self.socket_path} -> {self.upstream_url}')
+
+    def stop(self, timeout: float = 2.0):
+        self.running = False
+        if self._listener:
+            # 先shutdown以唤醒阻塞在accept上的线程
+            try:
+                self._listener.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            try:
+                self._listener.close()
+            except OSError:
+                pass
+        if self._upstream:
+            try:
+                self._upstream.close()
+            except Exception:
+                pass
+        with self._clients_lock:
+            clients = list(self._clients)
+            self._clients.clear()
+        for client in clients:
+            client.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._threads.clear()
+        # 只删除本中继绑定的套接字文件
+        if self._bound:
+            self._bound = False
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+
+    def get_members(self) -> List[str]:
+        with self._clients_lock:
+            return [client.plugin_id for client in self._clients if client.plugin_id]
+
+    def get_stats(self) -> Dict[str, object]:
+        stats: Dict[str, object] = dict(self.stats)
+        stats['members'] = self.get_members()
+        stats['upstream_connected'] = self._upstream_connected.is_set()
+        return stats
+
+    def _remove_stale_socket(self):
+        """套接字文件已存在时先尝试连接：有中继在监听则拒绝启动，无人监听才视为残留文件删除"""
+        if not os.path.exists(self.socket_path):
+            return
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(self.socket_path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            self.logger.info(f'[{self.relay_id}] 删除残留的中继套接字: {self.socket_path}')
+            os.unlink(self.socket_path)
+            return
+        finally:
+            probe.close()
+        raise RuntimeError(f'已有中继在监听 {self.socket_path}')
+
+    # ---- 本地连接 ----
+
+    def _accept_loop(self):
+        while self.running:
+            try:
+                sock, _ = self._listener.accept()
+            except OSError:
+                break
+            client = _LocalClient(sock)
+            with self._clients_lock:
+                self._clients.append(client)
+            thread = threading.Thread(target=self._client_loop, args=(client,), name='GRUniChat-relay-client', daemon=True)
+            thread.start()
+
+    def _client_loop(self, client: _LocalClient):
+        buffer = b''
+        try:
+            while self.running:
+                chunk = client.sock.recv(65536)
+                if not chunk:
+                    break
+                buffer += chunk
+                if len(buffer) > _MAX_LINE and b'\n' not in buffer:
+                    break
+                while b'\n' in buffer:
+                    line, buffer = buffer.split(b'\n', 1)
+                    if line.strip():
+                        self._on_local_frame(client, line.decode('utf-8', errors='replace'))
+        except OSError:
+            pass
+        finally:
+            with self._clients_lock:
+                if client in self._clients:
+                    self._clients.remove(client)
+            client.close()
+            if client.plugin_id:
+                self.logger.info(f'[{self.relay_id}] 本地实例已断开: {client.plugin_id}')
+
+    def _on_local_frame(self, client: _LocalClient, text: str):
+        try:
+            frame = json.loads(text)
+        except ValueError:
+            return
+        msg_type = frame.get('type')
+        total_id = frame.get('totalId', '')
+
+        if msg_type == 'hello':
+            client.plugin_id = frame.get('from')
+            self.logger.info(f'[{self.relay_id}] 本地实例已接入: {client.plugin_id}')
+            client.send(self._make_ack(total_id))
+            client.send(self._make_status())
+            return
+        if msg_type == 'ack':
+            # 本地实例对收到消息的确认由中继消化，不再上传
+            return
+        if msg_type == 'probe':
+            # 时钟探测只发给广播器，确认按totalId送回
+            self._send_upstream(client, total_id, text)
+            return
+
+        target = frame.get('target')
+        local_target = self._find_client(target) if target else None
+        if local_target:
+            # 目标实例就在本机，直接投递
+            self._deliver(local_target, text)
+            client.send(self._make_ack(total_id))
+            return
+
+        if not target:
+            self._broadcast_local(text, exclude=client)
+            self._remember_local(total_id)
+        self._send_upstream(client, total_id, text)
+
+    def _remember_local(self, total_id: str):
+        if not total_id:
+            return
+        with self._local_seen_lock:
+            self._local_seen[total_id] = None
+            while len(self._local_seen) > _LOCAL_SEEN_LIMIT:
+                self._local_seen.popitem(last=False)
+
+    def _seen_locally(self, total_id: str) -> bool:
+        """该消息是否已由本中继在本地广播过（广播器的回显），命中后即移除"""
+        if not total_id:
+            return False
+        with self._local_seen_lock:
+            return self._local_seen.pop(total_id, 0) is None
+
+    def _find_client(self, plugin_id: str) -> Optional[_LocalClient]:
+        with self._clients_lock:
+            for client in self._clients:
+                if client.plugin_id == plugin_id:
+                    return client
+        return None
+
+    def _deliver(self, client: _LocalClient, text: str):
+        if client.send(text):
+            self.stats['local_delivered'] += 1
+
+    def _broadcast_local(self, text: str, exclude: Optional[_LocalClient] = None, exclude_id: Optional[str] = None):
+        with self._clients_lock:
+            targets = [c for c in self._clients
+                       if c is not exclude and c.plugin_id and c.plugin_id != exclude_id]
+        for client in targets:
+            self._deliver(client, text)
+
+    def _notify_members(self, text: str):
+        """向所有已接入的实例发送中继自身的通知，不计入转发统计"""
+        with self._clients_lock:
+            targets = [c for c in self._clients if c.plugin_id]
+        for client in targets:
+            client.send(text)
+
+    def _make_ack(self, total_id: str) -> str:
+        return json.dumps({
+            'from': self.relay_id,
+            'type': 'ack',
+            'status': 'success',
+            'message': 'relayed locally',
+            'totalId': total_id,
+            'timestamp': str(int(time.time() * 1000)),
+        })
+
+    def _make_status(self) -> str:
+        return json.dumps({
+            'from': self.relay_id,
+            'type': 'relay_status',
+            'upstream': self._upstream_connected.is_set(),
+            'timestamp': str(int(time.time() * 1000)),
+        })
+
+    def _make_error(self, total_id: str, reason: str) -> str:
+        return json.dumps({
+            'from': self.relay_id,
+            'type': 'error',
+            'code': 'upstream_unavailable',
+            'error': reason,
+            'totalId': total_id,
+            'timestamp': str(int(time.time() * 1000)),
+        })
+
+    # ---- 上游连接 ----
+
+    def _send_upstream(self, client: _LocalClient, total_id: str, text: str):
+        upstream = self._upstream
+        if not upstream or not self._upstream_connected.is_set():
+            self._reject_upstream(client, total_id, '上游未连接')
+            return
+        if total_id:
+            with self._pending_lock:
+                self._pending[total_id] = client
+                while len(self._pending) > _PENDING_LIMIT:
+                    self._pending.popitem(last=False)
+        try:
+            upstream.send(text)
+            self.stats['upstream_sent'] += 1
+        except Exception as e:
+            if total_id:
+                with self._pending_lock:
+                    self._pending.pop(total_id, None)
+            self._reject_upstream(client, total_id, f'上游发送失败: {e}')
+            self.logger.warning(f'[{self.relay_id}] 上游发送失败: {e}')
+
+    def _reject_upstream(self, client: _LocalClient, total_id: str, reason: str):
+        """无法转发到上游：计数并以error帧告知发送实例，由其归还发送额度并计为失败"""
+        self.stats['upstream_dropped'] += 1
+        if total_id:
+            client.send(self._make_error(total_id, reason))
+
+    def _upstream_loop(self):
+        while self.running:
+            self._upstream = websocket.WebSocketApp(
+                self.upstream_url,
+                on_open=self._on_upstream_open,
+                on_message=self._on_upstream_message,
+                on_close=self._on_upstream_close,
+                on_error=lambda _, error: self.logger.error(f'[{self.relay_id}] 上游错误: {error}')
+            )
+            try:
+                self._upstream.run_forever()
+            except Exception as e:
+                self.logger.error(f'[{self.relay_id}] 上游连接异常: {e}')
+            self._set_upstream_down()
+            if self.running:
+                time.sleep(_RECONNECT_DELAY)
+
+    def _on_upstream_open(self, wsapp):
+        members = self.get_members()
+        wsapp.send(json.dumps({
+            'from': self.relay_id,
+            'type': 'hello',
+            'body': {
+                'sender': self.relay_id,
+                'chatMessage': '',
+                'command': '',
+                'eventDetail': f'[{self.relay_id}] Relay {self.relay_id} connected for {", ".join(members) or "no members"}'
+            },
+            'totalId': str(uuid.uuid4()),
+            'currentTime': str(int(time.time() * 1000)),
+            'relay': True,
+            'members': members,
+        }))
+        self._upstream_connected.set()
+        self.logger.info(f'[{self.relay_id}] 上游连接已建立')
+        self._notify_members(self._make_status())
+
+    def _on_upstream_close(self, wsapp, close_status_code, close_msg):
+        self._set_upstream_down()
+        self.logger.info(f'[{self.relay_id}] 上游连接关闭 code={close_status_code}, msg={close_msg}')
+
+    def _set_upstream_down(self):
+        """标记上游断开，状态变化时通知本地实例"""
+        if self._upstream_connected.is_set():
+            self._upstream_connected.clear()
+            self._notify_members(self._make_status())
+
+    def _on_upstream_message(self, wsapp, text):
+        self.stats['upstream_received'] += 1
+        try:
+            frame = json.loads(text)
+        except ValueError:
+            return
+        msg_type = frame.get('type')
+
+        if msg_type in ('ack', 'error'):
+            with self._pending_lock:
+                client = self._pending.pop(frame.get('totalId', ''), None)
+            if client:
+                self._deliver(client, text)
+            return
+
+        target = frame.get('target')
+        if target:
+            client = self._find_client(target)
+            if client:
+                self._deliver(client, text)
+            return
+        # 本机实例发出的消息在上传时已在本地广播过，广播器回显时不再投递
+        if self._seen_locally(frame.get('totalId', '')):
+            self.stats['echo_suppressed'] += 1
+            return
+        self._broadcast_local(text, exclude_id=frame.get('from'))
@@ -2,5 +2,10 @@
 状态管理模块
 """
 from .plugin_state import PluginState, plugin_state
+from .message_trace import MessageTrace, TraceRecord, message_trace
+from .rate_stats import RateStats, rate_stats
+from .player_index import PlayerIndex, player_index
+from .presence_roster import PresenceRoster, presence_roster
 
-__all__ = ['PluginState', 'plugin_state']
+__all__ = ['PluginState', 'plugin_state', 'MessageTrace', 'TraceRecord', 'message_trace', 'RateStats', 'rate_stats',
+           'PlayerIndex', 'player_index', 'PresenceRoster', 'presence_roster']
@@ -0,0 +1,153 @@
+"""
+消息生命周期追踪模块
+为每条出站消息记录各阶段的单调时间戳，保存在固定大小的环形缓冲区中，默认关闭
+每条消息使用新的记录对象：被挤出缓冲区的消息在发送路径上晚到的标记只会写入它自己的记录，不会污染复用的槽位
+"""
+import json
+import threading
+import time
+from typing import Dict, List, Optional
+
+# 出站消息依次经过的阶段
+STAGES = ('received', 'filtered', 'encoded', 'enqueued', 'written', 'acked')
+_STAGE_INDEX = {stage: index for index, stage in enumerate(STAGES)}
+
+
+class TraceRecord:
+    """单条消息的追踪记录"""
+    __slots__ = ('total_id', 'kind', 'summary', 'wall_time', 'stamps', 'slot')
+
+    def __init__(self, kind: str = '', summary: str = ''):
+        self.total_id: Optional[str] = None
+        self.kind = kind
+        self.summary = summary
+        self.wall_time = time.time()
+        self.stamps: List[Optional[float]] = [None] * len(STAGES)
+        # 在环形缓冲区中的位置
+        self.slot = -1
+
+    @property
+    def last_stage(self) -> Optional[str]:
+        """最后到达的阶段"""
+        for index in range(len(STAGES) - 1, -1, -1):
+            if self.stamps[index] is not None:
+                return STAGES[index]
+        return None
+
+    def stage_latencies(self) -> List[tuple]:
+        """相邻已到达阶段之间的耗时（毫秒）"""
+        result = []
+        previous = None
+        for stage, stamp in zip(STAGES, self.stamps):
+            if stamp is None:
+                continue
+            if previous is not None:
+                result.append((previous[0], stage, (stamp - previous[1]) * 1000))
+            previous = (stage, stamp)
+        return result
+
+    def total_latency(self) -> Optional[float]:
+        """从received到最后到达阶段的总耗时（毫秒）"""
+        reached = [stamp for stamp in self.stamps if stamp is not None]
+        if len(reached) < 2:
+            return None
+        return (reached[-1] - reached[0]) * 1000
+
+    def to_dict(self) -> Dict:
+        first = next((stamp for stamp in self.stamps if stamp is not None), None)
+        return {
+            'totalId': self.total_id,
+            'kind': self.kind,
+            'summary': self.summary,
+            'wallTime': self.wall_time,
+            'stages': {
+                stage: round((stamp - first) * 1000, 3)
+                for stage, stamp in zip(STAGES, self.stamps) if stamp is not None
+            },
+        }
+
+
+class MessageTrace:
+    """消息追踪环形缓冲区"""
+
+    def __init__(self, capacity: int = 1024):
+        self._lock = threading.Lock()
+        self.enabled = False
+        self._allocate(capacity)
+
+    def _allocate(self, capacity: int):
+        self._capacity = max(1, capacity)
+        self._ring: List[Optional[TraceRecord]] = [None] * self._capacity
+        self._next = 0
+        self._count = 0
+        self._by_id: Dict[str, TraceRecord] = {}
+
+    def configure(self, enabled: bool, capacity: int):
+        """按配置开关追踪并调整容量（调整容量会清空已有记录）"""
+        with self._lock:
+            if capacity != self._capacity:
+                self._allocate(capacity)
+            self.enabled = enabled
+
+    def begin(self, kind: str, summary: str = '') -> Optional[TraceRecord]:
+        """开始追踪一条消息，关闭时返回None"""
+        if not self.enabled:
+            return None
+        record = TraceRecord(kind, summary[:80])
+        record.stamps[0] = time.monotonic()
+        with self._lock:
+            evicted = self._ring[self._next]
+            if evicted is not None and evicted.total_id is not None:
+                self._by_id.pop(evicted.total_id, None)
+            record.slot = self._next
+            self._ring[self._next] = record
+            self._next = (self._next + 1) % self._capacity
+            self._count = min(self._count + 1, self._capacity)
+            return record
+
+    @staticmethod
+    def mark(record: Optional[TraceRecord], stage: str):
+        """记录某一阶段的时间戳"""
+        if record is not None:
+            record.stamps[_STAGE_INDEX[stage]] = time.monotonic()
+
+    def bind(self, record: Optional[TraceRecord], total_id: str):
+        """为记录绑定totalId，之后可按ID标记和查询；已被挤出缓冲区的记录不再登记"""
+        if record is None:
+            return
+        with self._lock:
+            record.total_id = total_id
+            if record.slot < self._capacity and self._ring[record.slot] is record:
+                self._by_id[total_id] = record
+
+    def mark_id(self, total_id: str, stage: str):
+        """按totalId记录阶段时间戳，未追踪的消息直接忽略"""
+        if not self.enabled:
+            return
+        with self._lock:
+            record = self._by_id.get(total_id)
+            if record is not None:
+                record.stamps[_STAGE_INDEX[stage]] = time.monotonic()
+
+    def find(self, total_id: str) -> Optional[TraceRecord]:
+        with self._lock:
+            return self._by_id.get(total_id)
+
+    def last(self, count: int) -> List[TraceRecord]:
+        """最近的count条记录，按时间从旧到新"""
+        with self._lock:
+            count = max(0, min(count, self._count))
+            return [self._ring[(self._next - count + i) % self._capacity] for i in range(count)]
+
+    def export_jsonl(self, path: str) -> int:
+        """将所有记录按时间顺序导出为JSON Lines，返回导出条数"""
+        records = self.last(self._capacity)
+        with open(path, 'w', encoding='utf-8') as f:
+            for record in records:
+                f.write(json.dumps(record.to_dict(), ensure_ascii=False))
+                f.write('\n')
+        return len(records)
+
+
+# 全局追踪实例
+message_trace = MessageTrace()
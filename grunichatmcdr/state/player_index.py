@@ -0,0 +1,134 @@
+"""
+在线玩家索引模块
+由player_joined/player_left增量维护的大小写不敏感前缀树，用于在入站聊天中一次扫描解析 @玩家名
+单个位置的匹配长度受玩家名长度上限约束，扫描耗时只与消息长度相关，与在线人数无关
+首次加载时服务器上可能已有玩家，由 list 命令的输出整体填充
+"""
+import re
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+MENTION_MARK = '@'
+# 原版 list 命令的输出（1.13+），list uuids 会在名字后附带 " (uuid)"
+_LIST_PATTERN = re.compile(r'^There are \d+ of a max of \d+ players online:(.*)$')
+_LIST_UUID_SUFFIX = re.compile(r' \([0-9a-fA-F-]+\)$')
+
+
+def _is_name_char(ch: str) -> bool:
+    """Minecraft玩家名只包含字母、数字和下划线"""
+    return ch.isascii() and (ch.isalnum() or ch == '_')
+
+
+def parse_player_list(content: str) -> Optional[List[str]]:
+    """解析 list 命令的输出，返回在线玩家名列表；不是 list 输出时返回None"""
+    match = _LIST_PATTERN.match(content)
+    if match is None:
+        return None
+    names = (_LIST_UUID_SUFFIX.sub('', name.strip()) for name in match.group(1).split(','))
+    return [name for name in names if name]
+
+
+class _Node:
+    __slots__ = ('children', 'name')
+
+    def __init__(self):
+        self.children: Dict[str, '_Node'] = {}
+        # 以该节点结尾的玩家名（保留原始大小写），非结尾节点为None
+        self.name: Optional[str] = None
+
+
+class PlayerIndex:
+    """在线玩家前缀树"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._root = _Node()
+        self._names: Dict[str, str] = {}
+
+    def add(self, name: str):
+        key = name.lower()
+        with self._lock:
+            node = self._root
+            for ch in key:
+                child = node.children.get(ch)
+                if child is None:
+                    child = node.children[ch] = _Node()
+                node = child
+            node.name = name
+            self._names[key] = name
+
+    def remove(self, name: str):
+        key = name.lower()
+        with self._lock:
+            if self._names.pop(key, None) is None:
+                return
+            path = [self._root]
+            for ch in key:
+                path.append(path[-1].children[ch])
+            path[-1].name = None
+            # 自底向上剪掉不再使用的节点
+            for depth in range(len(key), 0, -1):
+                node = path[depth]
+                if node.children or node.name is not None:
+                    break
+                del path[depth - 1].children[key[depth - 1]]
+
+    def replace(self, names: Iterable[str]):
+        """整体替换索引内容（如重载时从旧实例继承）"""
+        with self._lock:
+            self._root = _Node()
+            self._names = {}
+        for name in names:
+            self.add(name)
+
+    def clear(self):
+        self.replace(())
+
+    def names(self) -> List[str]:
+        with self._lock:
+            return sorted(self._names.values(), key=str.lower)
+
+    def get(self, name: str) -> Optional[str]:
+        """按不区分大小写的名字查找在线玩家，返回原始大小写"""
+        return self._names.get(name.lower())
+
+    def __contains__(self, name: str) -> bool:
+        return name.lower() in self._names
+
+    def __len__(self) -> int:
+        return len(self._names)
+
+    def match_at(self, text: str, start: int) -> Optional[Tuple[int, str]]:
+        """从start处匹配最长的在线玩家名，名字之后必须是单词边界，返回 (结束位置, 玩家名)"""
+        node = self._root
+        best = None
+        index = start
+        length = len(text)
+        while index < length:
+            node = node.children.get(text[index].lower())
+            if node is None:
+                break
+            index += 1
+            if node.name is not None and (index == length or not _is_name_char(text[index])):
+                best = (index, node.name)
+        return best
+
+    def scan_mentions(self, text: str) -> List[Tuple[int, int, str]]:
+        """一次扫描找出所有 @玩家名，返回 (起始位置, 结束位置, 玩家名) 列表，起始位置指向@"""
+        mentions = []
+        index = text.find(MENTION_MARK)
+        while index != -1:
+            # @前面紧跟名字字符时视为邮箱等普通文本
+            if index == 0 or not _is_name_char(text[index - 1]):
+                match = self.match_at(text, index + 1)
+                if match is not None:
+                    end, name = match
+                    mentions.append((index, end, name))
+                    index = text.find(MENTION_MARK, end)
+                    continue
+            index = text.find(MENTION_MARK, index + 1)
+        return mentions
+
+
+# 全局在线玩家索引
+player_index = PlayerIndex()
@@ -2,13 +2,17 @@
 插件状态管理模块
 负责管理插件的全局状态和配置
 """
-from mcdreforged.api.all import *
+from mcdreforged.api.types import PluginServerInterface
 from grunichatmcdr.config import GRUniChatConfig
-from grunichatmcdr.core.websocket_service import WebSocketService
-from typing import Optional, Dict, Any
+from grunichatmcdr.state.rate_stats import rate_stats
+from typing import TYPE_CHECKING, Optional, Dict, Any
 import threading
 import time
 
+if TYPE_CHECKING:
+    # 仅用于类型标注，避免与core.websocket_service循环导入
+    from grunichatmcdr.core.websocket_service import WebSocketService
+
 
 class PluginState:
     """插件状态管理器"""
@@ -17,7 +21,11 @@ class PluginState:
         self._lock = threading.RLock()
         self._server: Optional[PluginServerInterface] = None
         self._config: Optional[GRUniChatConfig] = None
-        self._ws_service: Optional[WebSocketService] = None
+        self._ws_service: Optional['WebSocketService'] = None
+        self._history_store = None
+        self._chat_throttle = None
+        self._audit_log = None
+        self._relay_server = None
         self._is_loaded = False
         self._load_time: Optional[float] = None
         self._stats: Dict[str, Any] = {
@@ -47,16 +55,58 @@ class PluginState:
         with self._lock:
             return self._config
     
-    def set_ws_service(self, ws_service: Optional[WebSocketService]):
+    def set_ws_service(self, ws_service: Optional['WebSocketService']):
         """设置WebSocket服务"""
         with self._lock:
             self._ws_service = ws_service
     
-    def get_ws_service(self) -> Optional[WebSocketService]:
+    def get_ws_service(self) -> Optional['WebSocketService']:
         """获取WebSocket服务"""
         with self._lock:
             return self._ws_service
     
+    def set_history_store(self, history_store):
+        """设置历史记录存储（未启用时为None）"""
+        with self._lock:
+            self._history_store = history_store
+    
+    def get_history_store(self):
+        """获取历史记录存储"""
+        with self._lock:
+            return self._history_store
+    
+    def set_chat_throttle(self, chat_throttle):
+        """设置聊天限流器"""
+        with self._lock:
+            self._chat_throttle = chat_throttle
+    
+    def set_audit_log(self, audit_log):
+        """设置命令审计日志（未启用时为None）"""
+        with self._lock:
+            self._audit_log = audit_log
+    
+    def get_audit_log(self):
+        """获取命令审计日志"""
+        with self._lock:
+            return self._audit_log
+    
+    def set_relay_server(self, relay_server):
+        """设置本实例运行的本地中继（非host模式时为None）"""
+        with self._lock:
+            self._relay_server = relay_server
+    
+    def record_audit(self, source: str, total_id: str, command: str, allowed: bool, reason: str):
+        """追加一条命令授权记录，未启用审计日志时忽略"""
+        audit_log = self._audit_log
+        if audit_log:
+            audit_log.append(source, total_id, command, allowed, reason)
+    
+    def record_history(self, direction: str, source: str, sender: str, msg_type: str, content: str):
+        """追加一条历史记录，direction为'out'（MC->WS）或'in'（WS->MC），未启用历史记录时忽略"""
+        history_store = self._history_store
+        if history_store:
+            history_store.append(direction, source, sender, msg_type, content)
+    
     def set_loaded(self, loaded: bool):
         """设置加载状态"""
         with self._lock:
@@ -86,10 +136,7 @@ class PluginState:
     def is_ws_connected(self) -> bool:
         """检查WebSocket连接状态"""
         with self._lock:
-            return (self._ws_service and 
-                    self._ws_service.ws and 
-                    self._ws_service.ws.sock and 
-                    self._ws_service.ws.sock.connected)
+            return bool(self._ws_service and self._ws_service.is_connected())
     
     def increment_messages_sent(self):
         """增加发送消息计数"""
@@ -116,6 +163,19 @@ class PluginState:
             stats['is_loaded'] = self._is_loaded
             stats['is_ws_connected'] = self.is_ws_connected()
             stats['uptime'] = self.get_uptime()
+            stats['outbound'] = self._ws_service.get_queue_stats() if self._ws_service else {}
+            stats['channels'] = self._ws_service.get_channel_health() if self._ws_service else {}
+            stats['connector'] = self._ws_service.get_connector_stats() if self._ws_service else None
+            stats['inbound'] = self._ws_service.get_inbound_stats() if self._ws_service else None
+            stats['clock'] = self._ws_service.get_clock_stats() if self._ws_service else None
+            stats['presence'] = self._ws_service.get_presence_stats() if self._ws_service else None
+            stats['history'] = self._history_store.get_stats() if self._history_store else None
+            stats['throttle'] = self._chat_throttle.get_stats() if self._chat_throttle else None
+            stats['commands'] = self._ws_service.get_command_stats() if self._ws_service else None
+            stats['audit'] = self._audit_log.get_stats() if self._audit_log else None
+            stats['relay'] = self._relay_server.get_stats() if self._relay_server else None
+            stats['rates'] = rate_stats.rates()
+            stats['latencies'] = rate_stats.latencies()
             return stats
     
     def reset_stats(self):
@@ -139,11 +199,19 @@ class PluginState:
             uptime = self.get_uptime()
             uptime_str = f"{uptime:.1f}秒" if uptime else "未知"
             
+            relay_str = ""
+            if self._relay_server:
+                relay = self._relay_server.get_stats()
+                relay_str = (f"中继: {len(relay['members'])}成员/上游{'已连接' if relay['upstream_connected'] else '未连接'}/"
+                             f"上游丢弃{relay['upstream_dropped']} | ")
+            
             return (f"插件状态: 已加载 | "
                    f"ID: {config_id} | "
                    f"WebSocket: {ws_status} | "
+                   f"{relay_str}"
                    f"运行时间: {uptime_str} | "
                    f"消息: {self._stats['messages_sent']}发送/{self._stats['messages_failed']}失败 | "
+                   f"速率(1m): {rate_stats.direction_rate('out'):.2f}/s出 {rate_stats.direction_rate('in'):.2f}/s入 | "
                    f"事件: {self._stats['events_processed']}处理")
 
 
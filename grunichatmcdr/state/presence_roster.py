@@ -0,0 +1,177 @@
+"""
+跨服在线名单模块
+由其它GRUniChat实例的presence消息维护：增量按序号应用，序号不连续时标记为未同步并等待完整快照，
+快照整体替换该服务器的名单；查询只读内存，不需要网络往返
+"""
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+# 增量应用结果
+APPLY_APPLIED = 'applied'
+APPLY_DUPLICATE = 'duplicate'   # 序号不大于已应用的序号，重复或乱序到达
+APPLY_GAP = 'gap'               # 序号跳跃，中间的增量丢失
+APPLY_UNKNOWN = 'unknown'       # 尚无该服务器该实例的快照，无法应用增量
+
+
+class ServerRoster:
+    """单个服务器的在线名单"""
+    __slots__ = ('server', 'epoch', 'seq', 'players', 'updated', 'synced', '_sorted')
+
+    def __init__(self, server: str, epoch: str, seq: int):
+        self.server = server
+        # 发送方实例标识，实例重启后序号从头开始
+        self.epoch = epoch
+        self.seq = seq
+        # 小写名字 -> 原始大小写
+        self.players: Dict[str, str] = {}
+        self.updated = 0.0
+        self.synced = True
+        self._sorted: Optional[Tuple[str, ...]] = None
+
+    def names(self) -> Tuple[str, ...]:
+        """按名字排序的玩家列表，名单变化前重复查询直接复用"""
+        names = self._sorted
+        if names is None:
+            names = self._sorted = tuple(sorted(self.players.values(), key=str.lower))
+        return names
+
+
+class PresenceRoster:
+    """各服务器在线名单的内存缓存"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._servers: Dict[str, ServerRoster] = {}
+        # 小写玩家名 -> 所在服务器，跨服切换时可能短暂同时出现在两个服务器
+        self._locations: Dict[str, Set[str]] = {}
+        self._total = 0
+        # 统计
+        self.applied = 0
+        self.duplicates = 0
+        self.gaps = 0
+        self.snapshots = 0
+
+    def apply_snapshot(self, server: str, epoch: str, seq: int, players: Iterable[str],
+                       now: Optional[float] = None) -> bool:
+        """用完整快照替换服务器的名单，早于已应用序号的快照被忽略"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._servers.get(server)
+            if entry is not None and entry.epoch == epoch and seq < entry.seq:
+                self.duplicates += 1
+                return False
+            if entry is None:
+                entry = self._servers[server] = ServerRoster(server, epoch, seq)
+            else:
+                self._clear(entry)
+                entry.epoch = epoch
+                entry.seq = seq
+            for name in players:
+                self._add(entry, name)
+            entry.updated = now
+            entry.synced = True
+            self.snapshots += 1
+            return True
+
+    def apply_delta(self, server: str, epoch: str, seq: int, joined: Iterable[str], left: Iterable[str],
+                    now: Optional[float] = None) -> str:
+        """按序号应用一条增量；出现缺口时仍然应用并标记为未同步，调用方应请求快照"""
+        now = time.time() if now is None else now
+        with self._lock:
+            entry = self._servers.get(server)
+            if entry is None or entry.epoch != epoch:
+                return APPLY_UNKNOWN
+            if seq <= entry.seq:
+                self.duplicates += 1
+                return APPLY_DUPLICATE
+            result = APPLY_APPLIED if seq == entry.seq + 1 else APPLY_GAP
+            for name in left:
+                self._remove(entry, name)
+            for name in joined:
+                self._add(entry, name)
+            entry.seq = seq
+            entry.updated = now
+            if result == APPLY_GAP:
+                entry.synced = False
+                self.gaps += 1
+            else:
+                self.applied += 1
+            return result
+
+    def remove_server(self, server: str) -> bool:
+        with self._lock:
+            entry = self._servers.pop(server, None)
+            if entry is None:
+                return False
+            self._clear(entry)
+            return True
+
+    def expire(self, ttl: float, now: Optional[float] = None) -> List[str]:
+        """移除超过ttl秒没有更新的服务器，返回被移除的服务器"""
+        now = time.time() if now is None else now
+        with self._lock:
+            expired = [server for server, entry in self._servers.items() if now - entry.updated > ttl]
+            for server in expired:
+                self._clear(self._servers.pop(server))
+        return expired
+
+    def clear(self):
+        with self._lock:
+            self._servers.clear()
+            self._locations.clear()
+            self._total = 0
+
+    def servers(self) -> List[Tuple[str, Tuple[str, ...], bool]]:
+        """按服务器名排序的 (服务器, 玩家列表, 是否已同步)"""
+        with self._lock:
+            return [(server, entry.names(), entry.synced) for server, entry in sorted(self._servers.items())]
+
+    def find(self, name: str) -> List[Tuple[str, str]]:
+        """玩家所在的服务器，返回 (服务器, 原始大小写的玩家名) 列表"""
+        key = name.lower()
+        with self._lock:
+            return [(server, self._servers[server].players[key]) for server in sorted(self._locations.get(key, ()))]
+
+    def get_stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                'servers': len(self._servers),
+                'players': self._total,
+                'applied': self.applied,
+                'duplicates': self.duplicates,
+                'gaps': self.gaps,
+                'snapshots': self.snapshots,
+            }
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _add(self, entry: ServerRoster, name: str):
+        key = name.lower()
+        if key in entry.players:
+            return
+        entry.players[key] = name
+        entry._sorted = None
+        self._locations.setdefault(key, set()).add(entry.server)
+        self._total += 1
+
+    def _remove(self, entry: ServerRoster, name: str):
+        key = name.lower()
+        if entry.players.pop(key, None) is None:
+            return
+        entry._sorted = None
+        servers = self._locations.get(key)
+        if servers is not None:
+            servers.discard(entry.server)
+            if not servers:
+                del self._locations[key]
+        self._total -= 1
+
+    def _clear(self, entry: ServerRoster):
+        for key in list(entry.players):
+            self._remove(entry, key)
+
+
+# 全局跨服在线名单
+presence_roster = PresenceRoster()
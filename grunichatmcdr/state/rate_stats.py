@@ -0,0 +1,257 @@
+"""
+滚动窗口速率与延迟统计模块
+固定宽度的环形桶计数器提供 1m/5m/15m 速率，对数分桶直方图记录延迟分布
+定期快照到插件数据目录，加载时恢复，使速率在重载和重启之间保持连续
+"""
+import json
+import math
+import os
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+BUCKET_WIDTH = 5            # 每个桶覆盖的秒数
+BUCKET_COUNT = 180          # 180 * 5s = 15分钟
+WINDOWS = (60, 300, 900)    # 1m / 5m / 15m
+
+# 直方图：每个2的幂区间再细分为8个子桶，相对误差约 9%
+_SUB_BUCKETS = 8
+# 最小可分辨的延迟（毫秒），更小的值都落入第0桶
+_MIN_LATENCY_MS = 0.01
+
+
+class RollingCounter:
+    """按时间分桶的环形计数器"""
+    __slots__ = ('epochs', 'counts', 'total')
+
+    def __init__(self):
+        self.epochs: List[int] = [-1] * BUCKET_COUNT
+        self.counts: List[int] = [0] * BUCKET_COUNT
+        self.total = 0
+
+    def add(self, now: float, amount: int = 1):
+        epoch = int(now // BUCKET_WIDTH)
+        slot = epoch % BUCKET_COUNT
+        if self.epochs[slot] != epoch:
+            self.epochs[slot] = epoch
+            self.counts[slot] = 0
+        self.counts[slot] += amount
+        self.total += amount
+
+    def rate(self, now: float, window: int) -> float:
+        """最近window秒内的平均每秒次数"""
+        current = int(now // BUCKET_WIDTH)
+        oldest = current - window // BUCKET_WIDTH
+        count = 0
+        for epoch, value in zip(self.epochs, self.counts):
+            if oldest < epoch <= current:
+                count += value
+        return count / window
+
+    def merge(self, other: 'RollingCounter'):
+        """并入另一计数器：同一时间桶的计数相加，各槽保留较新的时间桶"""
+        for slot, (epoch, count) in enumerate(zip(other.epochs, other.counts)):
+            if epoch == self.epochs[slot]:
+                self.counts[slot] += count
+            elif epoch > self.epochs[slot]:
+                self.epochs[slot] = epoch
+                self.counts[slot] = count
+        self.total += other.total
+
+    def to_dict(self) -> Dict:
+        return {'epochs': self.epochs, 'counts': self.counts, 'total': self.total}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'RollingCounter':
+        counter = cls()
+        if len(data.get('epochs', [])) == BUCKET_COUNT and len(data.get('counts', [])) == BUCKET_COUNT:
+            counter.epochs = [int(v) for v in data['epochs']]
+            counter.counts = [int(v) for v in data['counts']]
+        counter.total = int(data.get('total', 0))
+        return counter
+
+
+class LatencyHistogram:
+    """对数分桶的延迟直方图（毫秒）"""
+    __slots__ = ('buckets', 'count', 'max')
+
+    def __init__(self):
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.max = 0.0
+
+    @staticmethod
+    def _index(value: float) -> int:
+        if value <= _MIN_LATENCY_MS:
+            return 0
+        return int(math.log2(value / _MIN_LATENCY_MS) * _SUB_BUCKETS) + 1
+
+    @staticmethod
+    def _upper_bound(index: int) -> float:
+        if index == 0:
+            return _MIN_LATENCY_MS
+        return _MIN_LATENCY_MS * 2 ** (index / _SUB_BUCKETS)
+
+    def observe(self, value: float):
+        index = self._index(value)
+        self.buckets[index] = self.buckets.get(index, 0) + 1
+        self.count += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, p: float) -> Optional[float]:
+        """返回第p百分位所在桶的上界"""
+        if not self.count:
+            return None
+        target = max(1, math.ceil(self.count * p / 100))
+        seen = 0
+        for index in sorted(self.buckets):
+            seen += self.buckets[index]
+            if seen >= target:
+                return min(self._upper_bound(index), self.max)
+        return self.max
+
+    def merge(self, other: 'LatencyHistogram'):
+        for index, count in other.buckets.items():
+            self.buckets[index] = self.buckets.get(index, 0) + count
+        self.count += other.count
+        self.max = max(self.max, other.max)
+
+    def to_dict(self) -> Dict:
+        return {'buckets': {str(k): v for k, v in self.buckets.items()}, 'count': self.count, 'max': self.max}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'LatencyHistogram':
+        histogram = cls()
+        histogram.buckets = {int(k): int(v) for k, v in data.get('buckets', {}).items()}
+        histogram.count = int(data.get('count', 0))
+        histogram.max = float(data.get('max', 0.0))
+        return histogram
+
+
+class RateStats:
+    """按方向和消息类型统计速率，并记录各环节延迟"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, RollingCounter] = {}
+        self._histograms: Dict[str, LatencyHistogram] = {}
+        self._saver: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def record(self, direction: str, msg_type: str, now: Optional[float] = None):
+        """记录一条消息，direction为'out'或'in'"""
+        now = time.time() if now is None else now
+        key = f'{direction}.{msg_type}'
+        with self._lock:
+            counter = self._counters.get(key)
+            if counter is None:
+                counter = self._counters[key] = RollingCounter()
+            counter.add(now)
+
+    def observe(self, name: str, latency_ms: float):
+        """记录一次延迟（毫秒）"""
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = LatencyHistogram()
+            histogram.observe(latency_ms)
+
+    def rates(self, now: Optional[float] = None) -> Dict[str, Tuple[float, ...]]:
+        """各分类的 (1m, 5m, 15m) 每秒速率"""
+        now = time.time() if now is None else now
+        with self._lock:
+            return {key: tuple(counter.rate(now, window) for window in WINDOWS)
+                    for key, counter in sorted(self._counters.items())}
+
+    def direction_rate(self, direction: str, window: int = 60) -> float:
+        """某一方向所有类型合计的每秒速率"""
+        now = time.time()
+        prefix = f'{direction}.'
+        with self._lock:
+            return sum(counter.rate(now, window) for key, counter in self._counters.items() if key.startswith(prefix))
+
+    def latencies(self) -> Dict[str, Dict[str, Optional[float]]]:
+        """各延迟直方图的 p50/p90/p99/max"""
+        with self._lock:
+            return {
+                name: {
+                    'count': histogram.count,
+                    'p50': histogram.percentile(50),
+                    'p90': histogram.percentile(90),
+                    'p99': histogram.percentile(99),
+                    'max': histogram.max,
+                }
+                for name, histogram in sorted(self._histograms.items())
+            }
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'version': 1,
+                'time': time.time(),
+                'counters': {key: counter.to_dict() for key, counter in self._counters.items()},
+                'histograms': {name: histogram.to_dict() for name, histogram in self._histograms.items()},
+            }
+
+    def restore(self, data: Dict):
+        """把快照并入当前统计；快照在后台加载，加载完成前已记录的消息不会被覆盖"""
+        if data.get('version') != 1:
+            return
+        counters = {key: RollingCounter.from_dict(value) for key, value in data.get('counters', {}).items()}
+        histograms = {name: LatencyHistogram.from_dict(value) for name, value in data.get('histograms', {}).items()}
+        with self._lock:
+            for key, counter in counters.items():
+                live = self._counters.get(key)
+                if live is None:
+                    self._counters[key] = counter
+                else:
+                    live.merge(counter)
+            for name, histogram in histograms.items():
+                live = self._histograms.get(name)
+                if live is None:
+                    self._histograms[name] = histogram
+                else:
+                    live.merge(histogram)
+
+    def save(self, path: str):
+        """原子地写出快照"""
+        temp_path = path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.snapshot(), f, separators=(',', ':'))
+        os.replace(temp_path, path)
+
+    def load(self, path: str) -> bool:
+        """从快照恢复，文件不存在或损坏时返回False"""
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                self.restore(json.load(f))
+            return True
+        except (OSError, ValueError, TypeError, AttributeError):
+            return False
+
+    def start_snapshots(self, path: str, interval: float, logger):
+        """启动定期快照线程"""
+        self.stop_snapshots()
+        self._stop = threading.Event()
+        stop = self._stop
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.save(path)
+                except Exception as e:
+                    logger.warning(f'保存速率统计快照失败: {e}')
+
+        self._saver = threading.Thread(target=run, name='GRUniChat-stats-snapshot', daemon=True)
+        self._saver.start()
+
+    def stop_snapshots(self):
+        self._stop.set()
+        if self._saver and self._saver is not threading.current_thread():
+            self._saver.join(timeout=1.0)
+        self._saver = None
+
+
+# 全局速率统计实例
+rate_stats = RateStats()
@@ -0,0 +1,8 @@
+"""
+持久化存储模块
+"""
+from .audit_log import AuditLog
+from .batched_writer import BatchedWriter
+from .history_store import HistoryRecord, HistoryStore
+
+__all__ = ['AuditLog', 'BatchedWriter', 'HistoryRecord', 'HistoryStore']
@@ -0,0 +1,42 @@
+"""
+命令审计日志模块
+每次远程命令授权的结果经有界队列交给后台写线程，按批追加到JSON Lines文件；调用方只做一次非阻塞入队
+"""
+import json
+import time
+
+from .batched_writer import BatchedWriter
+
+
+class AuditLog(BatchedWriter):
+    """只追加的命令审计日志"""
+
+    thread_name = 'GRUniChat-audit-writer'
+
+    def __init__(self, path: str, logger, batch_size: int = 200, flush_interval: float = 1.0,
+                 queue_size: int = 10000):
+        super().__init__(logger, batch_size, flush_interval, queue_size)
+        self.path = path
+
+    def append(self, source: str, total_id: str, command: str, allowed: bool, reason: str) -> bool:
+        """追加一条授权记录（非阻塞），队列已满时丢弃并返回False"""
+        return self._put((time.time(), source, total_id, command, allowed, reason))
+
+    def _write_batch(self, batch: list):
+        lines = []
+        for ts, source, total_id, command, allowed, reason in batch:
+            lines.append(json.dumps({
+                'ts': round(ts, 3),
+                'source': source,
+                'totalId': total_id,
+                'command': command,
+                'decision': 'allow' if allowed else 'deny',
+                'reason': reason,
+            }, ensure_ascii=False))
+        try:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write('\n'.join(lines) + '\n')
+            self.written += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            self.logger.error(f'写入命令审计日志失败: {e}')
@@ -0,0 +1,83 @@
+"""
+批量写入基类
+调用方只做一次非阻塞入队，后台写线程等待第一条记录后尽量凑满一批再交给子类写入；
+停止时放入哨兵唤醒写线程，在超时前写完队列中剩余的记录
+"""
+import queue
+import threading
+from typing import Optional
+
+
+class BatchedWriter:
+    """有界队列 + 后台写线程，子类实现 _write_batch"""
+
+    thread_name = 'GRUniChat-writer'
+
+    def __init__(self, logger, batch_size: int = 200, flush_interval: float = 1.0, queue_size: int = 10000):
+        self.logger = logger
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self._running = False
+        self.written = 0
+        self.dropped = 0
+
+    def start(self):
+        self._running = True
+        self._thread = threading.Thread(target=self._write_loop, name=self.thread_name, daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """停止写线程，尽量在超时前写完队列中的记录"""
+        self._running = False
+        try:
+            # 哨兵None唤醒正在等待记录的写线程，不必等满flush_interval
+            self._queue.put_nowait(None)
+        except queue.Full:
+            pass
+        thread = self._thread
+        if thread:
+            thread.join(timeout)
+        self._thread = None
+
+    def get_stats(self) -> dict:
+        return {
+            'queued': self._queue.qsize(),
+            'written': self.written,
+            'dropped': self.dropped,
+        }
+
+    def _put(self, record: tuple) -> bool:
+        """非阻塞入队，队列已满时丢弃并返回False"""
+        try:
+            self._queue.put_nowait(record)
+            return True
+        except queue.Full:
+            self.dropped += 1
+            return False
+
+    def _write_loop(self):
+        while self._running or not self._queue.empty():
+            batch = self._take_batch()
+            if batch:
+                self._write_batch(batch)
+
+    def _take_batch(self) -> list:
+        """等待第一条记录，再在不阻塞的情况下尽量凑满一批；跳过停止时放入的哨兵"""
+        try:
+            record = self._queue.get(timeout=self.flush_interval)
+        except queue.Empty:
+            return []
+        batch = [] if record is None else [record]
+        while len(batch) < self.batch_size:
+            try:
+                record = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if record is not None:
+                batch.append(record)
+        return batch
+
+    def _write_batch(self, batch: list):
+        raise NotImplementedError
@@ -0,0 +1,153 @@
+"""
+聊天/事件历史存储模块
+双向消息经有界队列交给后台写线程，以WAL模式的SQLite批量提交；调用方只做一次非阻塞入队
+过期记录由写线程分批增量删除，避免一次性大事务
+"""
+import sqlite3
+import time
+from typing import List, NamedTuple, Optional
+
+from .batched_writer import BatchedWriter
+
+DIRECTION_OUT = 'out'   # MC -> WebSocket
+DIRECTION_IN = 'in'     # WebSocket -> MC
+
+_SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS messages ('
+    ' id INTEGER PRIMARY KEY AUTOINCREMENT,'
+    ' ts REAL NOT NULL,'
+    ' direction TEXT NOT NULL,'
+    ' source TEXT NOT NULL,'
+    ' sender TEXT NOT NULL,'
+    ' type TEXT NOT NULL,'
+    ' content TEXT NOT NULL)',
+    'CREATE INDEX IF NOT EXISTS idx_messages_ts ON messages (ts)',
+    # 分页按id倒序，按发送者/来源过滤时沿 (列, id) 索引倒序扫描即可，不必对所有匹配行排序
+    'DROP INDEX IF EXISTS idx_messages_sender',
+    'DROP INDEX IF EXISTS idx_messages_source',
+    'CREATE INDEX IF NOT EXISTS idx_messages_sender_id ON messages (sender COLLATE NOCASE, id)',
+    'CREATE INDEX IF NOT EXISTS idx_messages_source_id ON messages (source, id)',
+)
+
+# 每次清理最多删除的行数
+_RETENTION_CHUNK = 500
+# 两次清理之间的间隔（秒）
+_RETENTION_INTERVAL = 60.0
+
+
+class HistoryRecord(NamedTuple):
+    """一条历史记录"""
+    id: int
+    ts: float
+    direction: str
+    source: str
+    sender: str
+    type: str
+    content: str
+
+
+class HistoryStore(BatchedWriter):
+    """聊天/事件历史存储"""
+
+    thread_name = 'GRUniChat-history-writer'
+
+    def __init__(self, path: str, logger, batch_size: int = 200, flush_interval: float = 1.0,
+                 retention_days: float = 30, queue_size: int = 10000):
+        super().__init__(logger, batch_size, flush_interval, queue_size)
+        self.path = path
+        self.retention = retention_days * 86400 if retention_days > 0 else 0
+        self._conn: Optional[sqlite3.Connection] = None
+        self.purged = 0
+
+    def append(self, direction: str, source: str, sender: str, msg_type: str, content: str) -> bool:
+        """追加一条记录（非阻塞），队列已满时丢弃并返回False"""
+        return self._put((time.time(), direction, source or '', sender or '', msg_type, content or ''))
+
+    def query(self, sender: Optional[str] = None, since: Optional[float] = None,
+              before_id: Optional[int] = None, limit: int = 10) -> List[HistoryRecord]:
+        """按时间倒序分页查询，before_id为上一页最后一条的id"""
+        clauses = []
+        params: list = []
+        if sender:
+            clauses.append('sender = ? COLLATE NOCASE')
+            params.append(sender)
+        if since is not None:
+            clauses.append('ts >= ?')
+            params.append(since)
+        if before_id is not None:
+            clauses.append('id < ?')
+            params.append(before_id)
+        where = f' WHERE {" AND ".join(clauses)}' if clauses else ''
+        sql = f'SELECT id, ts, direction, source, sender, type, content FROM messages{where} ORDER BY id DESC LIMIT ?'
+        params.append(limit)
+
+        conn = self._connect(read_only=True)
+        try:
+            return [HistoryRecord(*row) for row in conn.execute(sql, params)]
+        finally:
+            conn.close()
+
+    def get_stats(self) -> dict:
+        stats = super().get_stats()
+        stats['purged'] = self.purged
+        return stats
+
+    def _connect(self, read_only: bool = False) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=5.0)
+        if not read_only:
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+        return conn
+
+    def _write_loop(self):
+        try:
+            conn = self._connect()
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            conn.commit()
+        except Exception as e:
+            self.logger.error(f'历史记录数据库初始化失败: {e}')
+            return
+
+        self._conn = conn
+        next_purge = time.monotonic() + _RETENTION_INTERVAL
+        try:
+            while self._running or not self._queue.empty():
+                batch = self._take_batch()
+                if batch:
+                    self._write_batch(batch)
+                if self.retention and time.monotonic() >= next_purge:
+                    # 一批删满说明还有积压，尽快继续下一批
+                    purged = self._purge_chunk(conn)
+                    delay = 1.0 if purged >= _RETENTION_CHUNK else _RETENTION_INTERVAL
+                    next_purge = time.monotonic() + delay
+        finally:
+            self._conn = None
+            conn.close()
+
+    def _write_batch(self, batch: list):
+        try:
+            self._conn.executemany(
+                'INSERT INTO messages (ts, direction, source, sender, type, content) VALUES (?, ?, ?, ?, ?, ?)',
+                batch
+            )
+            self._conn.commit()
+            self.written += len(batch)
+        except Exception as e:
+            self.dropped += len(batch)
+            self.logger.error(f'写入历史记录失败: {e}')
+
+    def _purge_chunk(self, conn: sqlite3.Connection) -> int:
+        """删除一批过期记录，返回删除的行数"""
+        try:
+            cursor = conn.execute(
+                'DELETE FROM messages WHERE id IN '
+                '(SELECT id FROM messages WHERE ts < ? ORDER BY ts LIMIT ?)',
+                (time.time() - self.retention, _RETENTION_CHUNK)
+            )
+            conn.commit()
+            self.purged += cursor.rowcount
+            return cursor.rowcount
+        except Exception as e:
+            self.logger.error(f'清理过期历史记录失败: {e}')
+            return 0
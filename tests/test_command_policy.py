@@ -0,0 +1,70 @@
+import logging
+import types
+
+import pytest
+
+from grunichatmcdr.core.command_policy import (
+    REASON_ALLOWED, REASON_MALFORMED, REASON_NOT_ALLOWED, CommandPolicy, canonical_command
+)
+
+
+def make_policy(prefixes, enabled=True, patterns=()):
+    source_policy = types.SimpleNamespace(prefixes=prefixes, patterns=list(patterns), max_concurrent=0,
+                                          rate_limit=0, rate_window=60.0)
+    config = types.SimpleNamespace(command_auth_enabled=enabled, command_policies={'qq': source_policy})
+    return CommandPolicy(config, logging.getLogger('test'))
+
+
+@pytest.mark.parametrize('command', [
+    '/list\nop evil',
+    'list\nop evil',
+    'list\rop evil',
+    'list\top evil',
+    'list\x00op evil',
+    'list\x85op evil',
+    'list op evil',
+])
+def test_control_characters_rejected(command):
+    # 只允许list的来源不能借换行、制表符等在服务端标准输入中拼出第二条命令
+    decision = make_policy(['list']).check('qq', command)
+    assert not decision.allowed
+    assert decision.reason == REASON_MALFORMED
+    assert decision.command is None
+
+
+def test_control_characters_rejected_without_auth():
+    decision = make_policy([], enabled=False).check('qq', 'say hi\nop evil')
+    assert not decision.allowed
+    assert decision.reason == REASON_MALFORMED
+
+
+def test_original_command_without_auth():
+    # 未启用授权时执行原文，不改写已有部署的命令
+    decision = make_policy([], enabled=False).check('qq', '  /say  hello   world ')
+    assert decision == (True, REASON_ALLOWED, '  /say  hello   world ')
+
+
+def test_allowed_command_is_canonical():
+    # 执行的是授权时检查过的形式：首尾空白去掉、连续空格合并，大小写保持原样
+    decision = make_policy(['list']).check('qq', '  /list   UUIDs ')
+    assert decision == (True, REASON_ALLOWED, '/list UUIDs')
+
+
+def test_prefix_still_word_bounded():
+    policy = make_policy(['tp'])
+    assert policy.check('qq', 'tp Steve').allowed
+    assert policy.check('qq', 'tpa Steve').reason == REASON_NOT_ALLOWED
+
+
+def test_canonical_command():
+    assert canonical_command('a  b') == 'a b'
+    assert canonical_command('a\tb') is None
+
+
+def test_patterns_compiled_separately():
+    # 单独合法的正则合并后会出错：全局标志不在开头、反向引用组号错位
+    policy = make_policy([], patterns=['(?i)list', r'(\w+) \1', '(', 'whitelist add \\w+'])
+    assert policy.check('qq', 'LIST').allowed
+    assert policy.check('qq', 'echo echo').allowed
+    assert not policy.check('qq', 'echo other').allowed
+    assert policy.check('qq', 'whitelist add Steve').allowed
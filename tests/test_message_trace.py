@@ -0,0 +1,30 @@
+from grunichatmcdr.state.message_trace import MessageTrace
+
+
+def make_trace(capacity):
+    trace = MessageTrace()
+    trace.configure(True, capacity)
+    return trace
+
+
+def test_late_mark_does_not_touch_newer_record():
+    # 被挤出缓冲区的消息晚到的标记只写入它自己的记录
+    trace = make_trace(2)
+    evicted = trace.begin('chat', 'old')
+    trace.begin('chat', 'b')
+    trace.begin('chat', 'c')
+    trace.mark(evicted, 'encoded')
+    trace.bind(evicted, 'old-id')
+    trace.mark_id('old-id', 'written')
+    assert [record.summary for record in trace.last(2)] == ['b', 'c']
+    assert all(record.stamps[2] is None and record.stamps[4] is None for record in trace.last(2))
+    assert trace.find('old-id') is None
+
+
+def test_eviction_unbinds_total_id():
+    trace = make_trace(1)
+    record = trace.begin('chat', 'a')
+    trace.bind(record, 'a-id')
+    assert trace.find('a-id') is record
+    trace.begin('chat', 'b')
+    assert trace.find('a-id') is None
@@ -0,0 +1,24 @@
+from grunichatmcdr.state.rate_stats import RateStats
+
+
+def test_restore_merges_into_live_counters():
+    # 后台加载快照前已记录的消息不会被快照覆盖
+    now = 1000.0
+    previous = RateStats()
+    for i in range(10):
+        previous.record('out', 'chat', now + i)
+    previous.observe('ack', 5.0)
+
+    stats = RateStats()
+    for i in range(3):
+        stats.record('out', 'chat', now + 10 + i)
+    stats.record('in', 'chat', now + 12)
+    stats.observe('ack', 50.0)
+    stats.restore(previous.snapshot())
+
+    rates = stats.rates(now + 15)
+    assert rates['out.chat'][0] * 60 == 13
+    assert rates['in.chat'][0] * 60 == 1
+    latency = stats.latencies()['ack']
+    assert latency['count'] == 2
+    assert latency['max'] == 50.0
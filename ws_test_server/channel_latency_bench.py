@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+GRUniChat 控制通道延迟基准
+在同一进程内启动本地广播器与模拟的MCDR服务器，广播器持续向插件推送聊天使下行饱和，
+同时每隔一段时间下发一条命令，统计命令从广播器发出到插件执行的延迟分位数；
+分别在单连接与双通道（dual_channel）模式下测量空闲和聊天饱和两种情况
+
+用法:
+    python channel_latency_bench.py [--duration 5] [--interval 0.02] [--chat-chars 400] [--say-cost 0.0002]
+"""
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_server import Broker  # noqa: E402
+from soak_test import FakeServer  # noqa: E402
+
+COMMAND_PREFIX = 'bench '
+CONNECT_TIMEOUT = 5.0
+
+
+class TimedServer(FakeServer):
+    """记录基准命令的执行时刻；say按say_cost模拟MCDR广播聊天的开销"""
+
+    def __init__(self, data_folder, config, say_cost):
+        super().__init__(data_folder, config)
+        self.say_cost = say_cost
+        self.executed_at = {}
+
+    def say(self, text):
+        super().say(text)
+        if self.say_cost:
+            time.sleep(self.say_cost)
+
+    def execute(self, command):
+        super().execute(command)
+        if command.startswith(COMMAND_PREFIX):
+            self.executed_at[command[len(COMMAND_PREFIX):]] = time.perf_counter()
+
+
+def make_config(port, dual_channel):
+    from grunichatmcdr.config import GRUniChatConfig
+
+    config = GRUniChatConfig.get_default()
+    config.ws_url = f'ws://127.0.0.1:{port}/ws'
+    config.plugin_id = 'bench'
+    config.dual_channel = dual_channel
+    # 只测量通道本身：关闭流量控制、输出捕获与其它后台功能
+    config.flow_control = False
+    config.command_result_enabled = False
+    config.presence_enabled = False
+    config.history_enabled = False
+    config.shutdown_timeout = 0.5
+    return config
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class Bench:
+    def __init__(self, args):
+        from grunichatmcdr import grunichatmcdr as entry
+
+        self.args = args
+        self.entry = entry
+        self.broker = Broker('127.0.0.1', args.port, 0, 0.0, verbose=False)
+        self.chat_text = '刷屏' * (args.chat_chars // 2)
+
+    def _wait_connected(self, dual_channel):
+        expected = 2 if dual_channel else 1
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while time.monotonic() < deadline:
+            with self.broker.lock:
+                ready = sum(1 for client in self.broker.clients if client.plugin_id == 'bench')
+            if ready >= expected:
+                return True
+            time.sleep(0.02)
+        return False
+
+    def _flood(self, stop):
+        """尽可能快地向插件推送聊天，套接字缓冲区满时广播器的发送会阻塞"""
+        while not stop.is_set():
+            self.broker.broadcast({
+                'from': 'qq', 'type': 'chat', 'totalId': str(uuid.uuid4()),
+                'body': {'sender': 'flood', 'chatMessage': self.chat_text, 'command': '', 'eventDetail': ''},
+            })
+
+    def _measure(self, server, saturated):
+        """在duration秒内按interval下发命令，返回各命令的延迟（毫秒）"""
+        stop = threading.Event()
+        flooder = None
+        if saturated:
+            flooder = threading.Thread(target=self._flood, args=(stop,), name='bench-flood', daemon=True)
+            flooder.start()
+            time.sleep(0.2)
+        sent = {}
+        deadline = time.monotonic() + self.args.duration
+        index = 0
+        while time.monotonic() < deadline:
+            key = str(index)
+            sent[key] = time.perf_counter()
+            self.broker.broadcast({
+                'from': 'qq', 'type': 'command', 'totalId': str(uuid.uuid4()),
+                'body': {'sender': '', 'chatMessage': '', 'command': f'/{COMMAND_PREFIX}{key}', 'eventDetail': ''},
+            })
+            index += 1
+            time.sleep(self.args.interval)
+        stop.set()
+        # 等待排在聊天之后的命令执行完
+        settle = time.monotonic() + 10.0
+        while len(server.executed_at) < len(sent) and time.monotonic() < settle:
+            time.sleep(0.05)
+        if flooder:
+            flooder.join(5.0)
+        latencies = [(server.executed_at[key] - at) * 1000 for key, at in sent.items() if key in server.executed_at]
+        server.executed_at.clear()
+        return latencies, len(sent)
+
+    def run_mode(self, dual_channel):
+        data_folder = tempfile.mkdtemp(prefix='grunichat-bench-')
+        server = TimedServer(data_folder, make_config(self.args.port, dual_channel), self.args.say_cost)
+        self.entry.on_load(server, None)
+        try:
+            if not self._wait_connected(dual_channel):
+                raise RuntimeError('插件未能连接到本地广播器')
+            results = {}
+            for saturated in (False, True):
+                said = server.said
+                latencies, sent = self._measure(server, saturated)
+                results[saturated] = (latencies, sent, server.said - said)
+            return results
+        finally:
+            self.entry.on_unload(server)
+
+    def run(self):
+        self.broker.start()
+        try:
+            for dual_channel in (False, True):
+                mode = '双通道' if dual_channel else '单连接'
+                for saturated, (latencies, sent, said) in self.run_mode(dual_channel).items():
+                    state = f'聊天饱和(投递{said}条)' if saturated else '空闲'
+                    if not latencies:
+                        print(f'{mode} / {state}: 没有命令在超时前执行（发出{sent}条）')
+                        continue
+                    print(f'{mode} / {state}: 命令{len(latencies)}/{sent}条 延迟 '
+                          f'p50 {percentile(latencies, 0.5):.2f}ms / p95 {percentile(latencies, 0.95):.2f}ms / '
+                          f'p99 {percentile(latencies, 0.99):.2f}ms / 最大 {max(latencies):.2f}ms')
+        finally:
+            self.broker.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GRUniChat control channel latency benchmark')
+    parser.add_argument('--port', type=int, default=8792)
+    parser.add_argument('--duration', type=float, default=5.0, help='seconds of commands per measurement')
+    parser.add_argument('--interval', type=float, default=0.02, help='seconds between commands')
+    parser.add_argument('--chat-chars', type=int, default=400, help='length of each flooding chat message')
+    parser.add_argument('--say-cost', type=float, default=0.0002, help='simulated seconds per in-game say')
+    parser.add_argument('--verbose', action='store_true', help='show plugin logs')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    Bench(args).run()
+
+
+if __name__ == '__main__':
+    main()
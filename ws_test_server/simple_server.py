@@ -0,0 +1,401 @@
+# -*- coding: utf-8 -*-
+"""
+GRUniChat 本地测试广播器
+仅依赖标准库，实现插件所需的最小WebSocket服务端：转发消息、回复ack，并支持信用额度流量控制与时钟探测
+可注入故障（丢弃消息、重置连接、慢速读取、重启）以测试插件的重连与资源回收
+
+用法:
+    python simple_server.py [--host 127.0.0.1] [--port 8765] [--window 32] [--ack-delay 0] [--clock-skew 0]
+                            [--drop-rate 0] [--reset-rate 0] [--slow-read 0] [--seed N]
+
+控制台命令:
+    test    向所有客户端发送一条测试聊天消息
+    restart 断开所有客户端并重新监听，模拟广播器重启
+    exit    退出服务器
+    其它    作为符合协议格式的JSON消息广播给所有客户端
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import socket
+import struct
+import sys
+import threading
+import time
+import uuid
+from collections import deque
+
+_GUID = '258EAFA5-E914-47DA-95CA-C5AB0DC85B11'
+OP_TEXT = 0x1
+OP_CLOSE = 0x8
+OP_PING = 0x9
+OP_PONG = 0xA
+
+
+def _recv_exact(sock, size):
+    data = b''
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if not chunk:
+            raise ConnectionError('connection closed')
+        data += chunk
+    return data
+
+
+def read_frame(sock):
+    """读取一个（可能分片的）消息，返回 (opcode, payload)"""
+    payload = b''
+    first_opcode = None
+    while True:
+        header = _recv_exact(sock, 2)
+        fin = header[0] & 0x80
+        opcode = header[0] & 0x0F
+        masked = header[1] & 0x80
+        length = header[1] & 0x7F
+        if length == 126:
+            length = struct.unpack('!H', _recv_exact(sock, 2))[0]
+        elif length == 127:
+            length = struct.unpack('!Q', _recv_exact(sock, 8))[0]
+        mask = _recv_exact(sock, 4) if masked else b''
+        data = _recv_exact(sock, length)
+        if masked:
+            data = bytes(b ^ mask[i % 4] for i, b in enumerate(data))
+        if opcode >= 0x8:
+            # 控制帧可以夹在分片之间，直接返回
+            return opcode, data
+        if first_opcode is None:
+            first_opcode = opcode
+        payload += data
+        if fin:
+            return first_opcode, payload
+
+
+def encode_frame(opcode, payload):
+    """编码一个不带掩码的服务端帧"""
+    header = bytes([0x80 | opcode])
+    length = len(payload)
+    if length < 126:
+        header += bytes([length])
+    elif length < 1 << 16:
+        header += bytes([126]) + struct.pack('!H', length)
+    else:
+        header += bytes([127]) + struct.pack('!Q', length)
+    return header + payload
+
+
+def handshake(sock):
+    """完成HTTP升级握手，返回请求路径"""
+    request = b''
+    while b'\r\n\r\n' not in request:
+        chunk = sock.recv(4096)
+        if not chunk:
+            raise ConnectionError('connection closed during handshake')
+        request += chunk
+    lines = request.split(b'\r\n\r\n', 1)[0].decode('latin-1').split('\r\n')
+    headers = {}
+    for line in lines[1:]:
+        if ':' in line:
+            key, value = line.split(':', 1)
+            headers[key.strip().lower()] = value.strip()
+    accept = base64.b64encode(hashlib.sha1((headers['sec-websocket-key'] + _GUID).encode()).digest()).decode()
+    sock.sendall((
+        'HTTP/1.1 101 Switching Protocols\r\n'
+        'Upgrade: websocket\r\n'
+        'Connection: Upgrade\r\n'
+        f'Sec-WebSocket-Accept: {accept}\r\n\r\n'
+    ).encode())
+    return lines[0].split(' ')[1] if ' ' in lines[0] else '/'
+
+
+class Client:
+    """一个已连接的客户端"""
+
+    def __init__(self, broker, sock, address):
+        self.broker = broker
+        self.sock = sock
+        self.address = address
+        self.plugin_id = None
+        self.channel = None
+        # 客户端在hello中声明的窗口，None表示不限制
+        self.window = None
+        self.in_flight = set()
+        self.pending = deque()
+        self.lock = threading.Lock()
+        self.send_lock = threading.Lock()
+
+    @property
+    def name(self):
+        suffix = f'/{self.channel}' if self.channel else ''
+        return f'{self.plugin_id or self.address}{suffix}'
+
+    def send_raw(self, text):
+        with self.send_lock:
+            self.sock.sendall(encode_frame(OP_TEXT, text.encode('utf-8')))
+
+    def deliver(self, frame):
+        """按客户端额度投递，额度不足时排队"""
+        with self.lock:
+            if self.window is not None and len(self.in_flight) >= self.window:
+                self.pending.append(frame)
+                return
+            self._send_tracked(frame)
+
+    def release(self, total_id):
+        """收到客户端ack后归还额度并补发排队的消息"""
+        with self.lock:
+            self.in_flight.discard(total_id)
+            while self.pending and (self.window is None or len(self.in_flight) < self.window):
+                self._send_tracked(self.pending.popleft())
+
+    def _send_tracked(self, frame):
+        if self.window is not None:
+            self.in_flight.add(frame['totalId'])
+        # 转发时附带广播器发出时刻，供插件计算下行延迟
+        frame = dict(frame, timestamp=self.broker.timestamp())
+        self.send_raw(json.dumps(frame, ensure_ascii=False))
+
+
+class Broker:
+    """最小化的消息广播器"""
+
+    def __init__(self, host, port, window, ack_delay, clock_skew=0.0,
+                 drop_rate=0.0, reset_rate=0.0, slow_read=0.0, seed=None, verbose=True):
+        self.host = host
+        self.port = port
+        self.window = window
+        self.ack_delay = ack_delay
+        # 模拟广播器时钟与插件主机不同步（毫秒）
+        self.clock_skew = clock_skew
+        # 故障注入：按概率丢弃收到的消息（不确认也不转发）、按概率在收到消息后重置连接、每次读取前等待
+        self.drop_rate = drop_rate
+        self.reset_rate = reset_rate
+        self.slow_read = slow_read
+        self.random = random.Random(seed)
+        self.faults = {'dropped': 0, 'reset': 0, 'restarts': 0}
+        self.verbose = verbose
+        self.clients = []
+        self.lock = threading.Lock()
+        self.server_sock = None
+        self.running = False
+        self.listening = threading.Event()
+
+    def serve_forever(self):
+        self.server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_sock.bind((self.host, self.port))
+        self.server_sock.listen()
+        self.running = True
+        self.listening.set()
+        self.log(f'[broker] listening on ws://{self.host}:{self.port}/ws (window={self.window})')
+        while self.running:
+            try:
+                sock, address = self.server_sock.accept()
+            except OSError:
+                break
+            threading.Thread(target=self._handle, args=(sock, address), daemon=True).start()
+
+    def start(self):
+        """在后台线程中监听，返回时已可以接受连接"""
+        self.listening.clear()
+        threading.Thread(target=self.serve_forever, name='broker-accept', daemon=True).start()
+        self.listening.wait(5)
+
+    def restart(self, downtime=0.0):
+        """模拟广播器重启：断开所有客户端并停止监听，downtime秒后重新监听"""
+        self.shutdown()
+        self.faults['restarts'] += 1
+        time.sleep(downtime)
+        self.start()
+
+    def log(self, text):
+        if self.verbose:
+            print(text)
+
+    def _inject(self, rate):
+        return rate > 0 and self.random.random() < rate
+
+    def timestamp(self):
+        """广播器时钟的毫秒时间戳"""
+        return str(int(time.time() * 1000 + self.clock_skew))
+
+    def shutdown(self):
+        self.running = False
+        self.listening.clear()
+        if self.server_sock:
+            try:
+                # 仅close不会唤醒阻塞在accept上的线程，端口也不会释放
+                self.server_sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.server_sock.close()
+        with self.lock:
+            clients = list(self.clients)
+        for client in clients:
+            try:
+                client.sock.sendall(encode_frame(OP_CLOSE, struct.pack('!H', 1001)))
+                client.sock.close()
+            except OSError:
+                pass
+
+    def broadcast(self, frame, exclude=None):
+        with self.lock:
+            targets = [c for c in self.clients if c is not exclude and c.plugin_id]
+        for client in targets:
+            # 双通道客户端只在对应通道接收：聊天与事件走bulk，其余走control
+            if client.channel:
+                wanted = 'bulk' if frame.get('type') in ('chat', 'event') else 'control'
+                if client.channel != wanted:
+                    continue
+            try:
+                client.deliver(frame)
+            except OSError:
+                pass
+
+    def _ack(self, client, total_id, received=None):
+        if self.ack_delay:
+            time.sleep(self.ack_delay)
+        ack = {
+            'type': 'ack',
+            'status': 'success',
+            'message': 'ok',
+            'totalId': total_id,
+            'timestamp': self.timestamp(),
+        }
+        if received:
+            ack['receiveTime'] = received
+        if self.window:
+            ack['window'] = self.window
+        client.send_raw(json.dumps(ack))
+
+    def _handle(self, sock, address):
+        client = Client(self, sock, address)
+        try:
+            handshake(sock)
+            with self.lock:
+                self.clients.append(client)
+            while True:
+                opcode, payload = read_frame(sock)
+                if opcode == OP_CLOSE:
+                    with client.send_lock:
+                        sock.sendall(encode_frame(OP_CLOSE, payload[:2]))
+                    break
+                if opcode == OP_PING:
+                    with client.send_lock:
+                        sock.sendall(encode_frame(OP_PONG, payload))
+                    continue
+                if opcode != OP_TEXT:
+                    continue
+                if self._inject(self.reset_rate):
+                    # 不发送关闭帧，以RST直接断开
+                    self.faults['reset'] += 1
+                    sock.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                    break
+                self._on_frame(client, payload.decode('utf-8'), self.timestamp())
+                if self.slow_read:
+                    time.sleep(self.slow_read)
+        except (ConnectionError, OSError, KeyError):
+            pass
+        finally:
+            with self.lock:
+                if client in self.clients:
+                    self.clients.remove(client)
+            try:
+                sock.close()
+            except OSError:
+                pass
+            self.log(f'[broker] {client.name} disconnected')
+
+    def _on_frame(self, client, text, received):
+        try:
+            frame = json.loads(text)
+        except ValueError:
+            self.log(f'[broker] invalid json from {client.name}')
+            return
+        msg_type = frame.get('type')
+        total_id = frame.get('totalId', '')
+
+        if msg_type == 'hello':
+            client.plugin_id = frame.get('from')
+            client.channel = frame.get('channel')
+            if 'window' in frame:
+                client.window = max(1, int(frame['window']))
+            self.log(f'[broker] hello from {client.name} (window={client.window})')
+            self._ack(client, total_id, received)
+            return
+        if msg_type == 'ack':
+            client.release(total_id)
+            return
+        if msg_type == 'probe':
+            # 时钟探测只回复收到与回复时刻，不转发
+            self._ack(client, total_id, received)
+            return
+
+        if self._inject(self.drop_rate):
+            self.faults['dropped'] += 1
+            return
+
+        body = frame.get('body', {})
+        self.log(f"[broker] {client.name} {msg_type}: "
+                 f"{body.get('chatMessage') or body.get('command') or body.get('eventDetail')}")
+        self._ack(client, total_id, received)
+        self.broadcast(frame, exclude=client)
+
+
+def make_test_message():
+    return {
+        'from': 'simple_server',
+        'type': 'chat',
+        'body': {
+            'sender': 'Tester',
+            'chatMessage': 'Hello from simple_server!',
+            'command': '',
+            'eventDetail': '',
+        },
+        'totalId': str(uuid.uuid4()),
+        'currentTime': str(int(time.time() * 1000)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GRUniChat local stand-in broker')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--window', type=int, default=32, help='advertised window, 0 to disable flow control')
+    parser.add_argument('--ack-delay', type=float, default=0.0, help='seconds to wait before each ack')
+    parser.add_argument('--clock-skew', type=float, default=0.0, help='milliseconds added to broker timestamps')
+    parser.add_argument('--drop-rate', type=float, default=0.0, help='probability of silently dropping a received message')
+    parser.add_argument('--reset-rate', type=float, default=0.0, help='probability of resetting the connection on a message')
+    parser.add_argument('--slow-read', type=float, default=0.0, help='seconds to wait after reading each message')
+    parser.add_argument('--seed', type=int, default=None, help='random seed for fault injection')
+    args = parser.parse_args()
+
+    broker = Broker(args.host, args.port, args.window, args.ack_delay, args.clock_skew,
+                    args.drop_rate, args.reset_rate, args.slow_read, args.seed)
+    broker.start()
+
+    for line in sys.stdin:
+        line = line.strip()
+        if not line:
+            continue
+        if line == 'exit':
+            break
+        if line == 'test':
+            broker.broadcast(make_test_message())
+            continue
+        if line == 'restart':
+            broker.restart()
+            continue
+        try:
+            frame = json.loads(line)
+        except ValueError:
+            print('[broker] input must be "test", "exit" or a JSON message')
+            continue
+        frame.setdefault('totalId', str(uuid.uuid4()))
+        broker.broadcast(frame)
+    broker.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+GRUniChat 长时间运行（soak）测试
+在同一进程内启动注入故障的本地广播器与模拟的MCDR服务器，以压缩的时间反复执行重连、断开/连接、改名、
+插件重载和广播器重启，并在每轮之间收发聊天、玩家进出与命令；结束时检查插件线程数、打开的文件描述符和
+tracemalloc统计的内存增长是否有界，超出上限时以非零状态退出
+
+用法:
+    python soak_test.py [--cycles 2000] [--drop-rate 0.05] [--reset-rate 0.02] [--slow-read 0] [--seed 1]
+                        [--max-thread-growth 0] [--max-fd-growth 4] [--max-memory-growth 2.0]
+"""
+import argparse
+import collections
+import gc
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+import types
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from simple_server import Broker, make_test_message  # noqa: E402
+
+# 插件线程统一使用的名称前缀
+THREAD_PREFIX = 'GRUniChat-'
+# 开始计量前的预热轮数，让缓存、连接器和延迟导入的模块先达到稳定状态
+WARMUP_CYCLES = 50
+# 等待连接建立与线程退出的最长时间（秒）
+CONNECT_TIMEOUT = 3.0
+SETTLE_TIMEOUT = 5.0
+
+
+class FakeSource:
+    """命令来源，回复内容直接丢弃"""
+
+    def reply(self, message):
+        pass
+
+
+class FakeServer:
+    """只实现插件用到的PluginServerInterface方法"""
+
+    def __init__(self, data_folder, config):
+        self.logger = logging.getLogger('soak')
+        self.data_folder = data_folder
+        self.config = config
+        self.said = 0
+        self.executed = 0
+
+    def load_config_simple(self, target_class=None, **kwargs):
+        return self.config
+
+    def save_config_simple(self, config, **kwargs):
+        pass
+
+    def get_data_folder(self):
+        return self.data_folder
+
+    def is_server_startup(self):
+        return False
+
+    def register_command(self, node):
+        pass
+
+    def register_event_listener(self, event, callback):
+        pass
+
+    def say(self, text):
+        self.said += 1
+
+    def tell(self, player, text):
+        self.said += 1
+
+    def execute(self, command):
+        self.executed += 1
+
+    def execute_command(self, command, source=None):
+        self.executed += 1
+
+
+def plugin_threads():
+    return sorted(t.name for t in threading.enumerate() if t.name.startswith(THREAD_PREFIX))
+
+
+def open_fds():
+    """当前进程打开的文件描述符数，不支持的平台返回None"""
+    try:
+        return len(os.listdir('/proc/self/fd'))
+    except OSError:
+        return None
+
+
+def make_config(port, data_folder):
+    from grunichatmcdr.config import GRUniChatConfig
+
+    config = GRUniChatConfig.get_default()
+    config.ws_url = f'ws://127.0.0.1:{port}/ws'
+    config.plugin_id = 'soak'
+    # 压缩时间：缩短所有定时行为
+    config.shutdown_timeout = 0.3
+    config.flow_control = True
+    config.flow_ack_timeout = 0.5
+    config.command_result_enabled = True
+    config.command_result_timeout = 0.2
+    config.command_result_idle = 0.05
+    config.chat_collapse_window = 0.2
+    config.chat_rate_limit = 5
+    config.presence_enabled = True
+    config.presence_snapshot_interval = 0.5
+    config.presence_ttl = 1.5
+    config.stats_snapshot_interval = 0.5
+    config.standby_socket = True
+    config.history_enabled = True
+    config.history_flush_interval = 0.1
+    config.trace_enabled = True
+    return config
+
+
+class Soak:
+    def __init__(self, args):
+        from grunichatmcdr import grunichatmcdr as entry
+
+        self.args = args
+        self.entry = entry
+        self.random = random.Random(args.seed)
+        self.broker = Broker('127.0.0.1', args.port, 32, 0.0, drop_rate=args.drop_rate, reset_rate=args.reset_rate,
+                             slow_read=args.slow_read, seed=args.seed, verbose=False)
+        self.data_folder = tempfile.mkdtemp(prefix='grunichat-soak-')
+        self.server = FakeServer(self.data_folder, make_config(args.port, self.data_folder))
+        self.counts = {}
+
+    @property
+    def service(self):
+        from grunichatmcdr.state.plugin_state import plugin_state
+        return plugin_state.get_ws_service()
+
+    def wait_connected(self):
+        deadline = time.monotonic() + CONNECT_TIMEOUT
+        while time.monotonic() < deadline:
+            service = self.service
+            if service and service.is_connected():
+                return True
+            time.sleep(0.01)
+        return False
+
+    def traffic(self):
+        """模拟一轮游戏内外的消息往来"""
+        handler = self.entry.lifecycle_manager.get_event_handler()
+        if handler is None:
+            return
+        player = f'Player{self.random.randrange(20)}'
+        handler.handle_player_joined(player, None)
+        handler.handle_info(types.SimpleNamespace(
+            is_player=True, player=player, is_from_server=False, content=f'hello {uuid.uuid4().hex[:6]}'
+        ))
+        self.broker.broadcast(make_test_message())
+        self.broker.broadcast({
+            'from': 'peer', 'type': 'command', 'body': {'command': '/list'}, 'totalId': str(uuid.uuid4()),
+        })
+        handler.handle_player_left(player)
+
+    def cycle(self, index):
+        action = self.random.choice(('reconnect', 'reconnect', 'connect', 'rename', 'reload'))
+        if index and index % 100 == 0:
+            action = 'broker_restart'
+        self.counts[action] = self.counts.get(action, 0) + 1
+        service = self.service
+        if action == 'reconnect':
+            service.reconnect()
+        elif action == 'connect':
+            service.disconnect()
+            service.connect(FakeSource(), self.server.config.ws_url)
+        elif action == 'rename':
+            service.rename(FakeSource(), f'soak{index % 3}', self.server)
+        elif action == 'reload':
+            self.entry.on_unload(self.server)
+            self.entry.on_load(self.server, self.entry)
+        else:
+            self.broker.restart()
+            self.service.reconnect()
+        if self.wait_connected():
+            self.traffic()
+        else:
+            self.counts['not_connected'] = self.counts.get('not_connected', 0) + 1
+
+    def settle(self, expected):
+        """等待插件线程回落到expected个以内"""
+        deadline = time.monotonic() + SETTLE_TIMEOUT
+        while len(plugin_threads()) > expected and time.monotonic() < deadline:
+            time.sleep(0.05)
+
+    def measure(self):
+        gc.collect()
+        return len(plugin_threads()), open_fds(), tracemalloc.get_traced_memory()[0]
+
+    def run(self):
+        args = self.args
+        self.broker.start()
+        self.entry.on_load(self.server, None)
+        self.entry.on_server_startup(self.server)
+        self.wait_connected()
+
+        for index in range(WARMUP_CYCLES):
+            self.cycle(index)
+        tracemalloc.start(10)
+        # 预热前创建的对象不在tracemalloc的统计内，重载一次让每次加载都会新建的对象（事件提取器、渲染缓存等）计入基线
+        self.entry.on_unload(self.server)
+        self.entry.on_load(self.server, self.entry)
+        self.wait_connected()
+        self.traffic()
+        base_threads, base_fds, base_memory = self.measure()
+        base_names = collections.Counter(plugin_threads())
+        base_snapshot = tracemalloc.take_snapshot()
+        peak_threads = base_threads
+        started = time.monotonic()
+        print(f'基线: 插件线程{base_threads} / 文件描述符{base_fds} / 内存{base_memory / 1024:.0f}KiB')
+
+        for index in range(WARMUP_CYCLES, WARMUP_CYCLES + args.cycles):
+            self.cycle(index)
+            peak_threads = max(peak_threads, len(plugin_threads()))
+            if (index - WARMUP_CYCLES + 1) % args.report_every == 0:
+                threads, fds, memory = self.measure()
+                print(f'[{index - WARMUP_CYCLES + 1}/{args.cycles}] 插件线程{threads} / 文件描述符{fds} / '
+                      f'内存{memory / 1024:.0f}KiB / 耗时{time.monotonic() - started:.0f}s')
+
+        self.settle(base_threads)
+        threads, fds, memory = self.measure()
+        extra_threads = collections.Counter(plugin_threads()) - base_names
+        snapshot = tracemalloc.take_snapshot()
+        self.entry.on_unload(self.server)
+        self.broker.shutdown()
+
+        print(f'操作: {self.counts}')
+        print(f'广播器故障: {self.broker.faults}')
+        failures = []
+        if threads - base_threads > args.max_thread_growth:
+            failures.append(f'插件线程增加{threads - base_threads}: {", ".join(extra_threads.elements()) or "-"}')
+        if base_fds is not None and fds - base_fds > args.max_fd_growth:
+            failures.append(f'文件描述符增加{fds - base_fds}')
+        growth = (memory - base_memory) / 1024 / 1024
+        if growth > args.max_memory_growth:
+            failures.append(f'内存增加{growth:.2f}MiB')
+            for stat in snapshot.compare_to(base_snapshot, 'lineno')[:10]:
+                print(f'  {stat}')
+        print(f'结束: 插件线程{threads}（峰值{peak_threads}） / 文件描述符{fds} / 内存增长{growth:.2f}MiB')
+        for failure in failures:
+            print(f'失败: {failure}')
+        return not failures
+
+
+def main():
+    parser = argparse.ArgumentParser(description='GRUniChat soak test')
+    parser.add_argument('--cycles', type=int, default=2000)
+    parser.add_argument('--port', type=int, default=8791)
+    parser.add_argument('--drop-rate', type=float, default=0.05)
+    parser.add_argument('--reset-rate', type=float, default=0.02)
+    parser.add_argument('--slow-read', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--max-thread-growth', type=int, default=0, help='allowed growth of plugin threads')
+    parser.add_argument('--max-fd-growth', type=int, default=4, help='allowed growth of open file descriptors')
+    parser.add_argument('--max-memory-growth', type=float, default=2.0, help='allowed tracemalloc growth in MiB')
+    parser.add_argument('--report-every', type=int, default=100)
+    parser.add_argument('--verbose', action='store_true', help='show plugin logs')
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.CRITICAL)
+    sys.exit(0 if Soak(args).run() else 1)
+
+
+if __name__ == '__main__':
+    main()